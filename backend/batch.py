@@ -0,0 +1,66 @@
+import os
+import sys
+import logging
+import argparse
+from typing import List
+from src.database.database import engine
+from src.database.database_migrations import migrate_schema
+from src.utilities.api_utilities import ubc_grades_client
+from src.utilities.batch_utilities import (BatchInputError, BatchItem, TranscriptBatch, create_batch_executor,
+                                           read_zip_items, BATCH_EXECUTOR, BATCH_MAX_WORKERS, MANIFEST_FILENAME)
+
+def collect_items(paths: List[str]) -> List[BatchItem]:
+    """
+    Reads the transcripts to convert from PDF files, zip archives and directories of PDF files.
+    """
+    items = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(".pdf"):
+                    with open(os.path.join(path, name), "rb") as f:
+                        items.append(BatchItem(name, f.read()))
+        elif path.lower().endswith(".zip"):
+            with open(path, "rb") as f:
+                items += read_zip_items(f.read())
+        else:
+            with open(path, "rb") as f:
+                items.append(BatchItem(os.path.basename(path), f.read()))
+    return items
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Generate unofficial transcripts for many transcript PDFs at once.")
+    parser.add_argument("inputs", nargs="+", help="Transcript PDFs, zip archives of them, or directories of them")
+    parser.add_argument("-o", "--output", default="transcripts.zip", help="The zip archive to write the results to")
+    parser.add_argument("-w", "--workers", type=int, default=BATCH_MAX_WORKERS, help="The number of worker processes")
+    parser.add_argument("--executor", choices=["process", "thread"], default=BATCH_EXECUTOR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+
+    try:
+        items = collect_items(args.inputs)
+    except (OSError, BatchInputError) as e:
+        print(f"Failed to read the inputs: {e}", file=sys.stderr)
+        return 2
+
+    migrate_schema(engine)
+    executor = create_batch_executor(args.executor, args.workers)
+    batch = TranscriptBatch(items, executor)
+    try:
+        with open(args.output, "wb") as f:
+            for chunk in batch.iter_zip():
+                f.write(chunk)
+    finally:
+        executor.shutdown()
+        ubc_grades_client.close()
+
+    failed = [entry for entry in batch.manifest if entry["status"] != "ok"]
+    print(f"Converted {len(batch.manifest) - len(failed)} of {len(batch.manifest)} transcripts into {args.output}")
+    for entry in failed:
+        print(f"  {entry['input']}: {entry['error']}")
+    print(f"See {MANIFEST_FILENAME} in the archive for details")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+import os
+import sys
+import json
+import platform
+from typing import Dict, List
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+def _lower_is_better(metric: str) -> bool:
+    return not metric.endswith("_per_second")
+
+def save_baseline(name: str, results: Dict[str, float], settings: Dict) -> str:
+    """
+    Saves benchmark results as the baseline `name`, along with the machine they were measured on.
+
+    Returns:
+        str: The path of the baseline file.
+    """
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    path = os.path.join(BASELINE_DIR, f"{name}.json")
+    baseline = {
+        "machine": {"python": sys.version.split()[0], "platform": platform.platform(), "cpus": os.cpu_count()},
+        "settings": settings,
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+    return path
+
+def compare_with_baseline(name: str, results: Dict[str, float], tolerance: float) -> List[str]:
+    """
+    Prints the results next to the baseline `name` and returns the metrics that regressed.
+
+    A metric regressed if it is more than `tolerance` (e.g. 0.2 for 20%) worse than its baseline value.
+    Metrics ending in "_per_second" are better when higher, all others when lower.
+
+    Returns:
+        List[str]: The regressed metrics.
+    """
+    path = os.path.join(BASELINE_DIR, f"{name}.json")
+    with open(path) as f:
+        baseline = json.load(f)
+
+    print(f"Compared with {path} (measured on {baseline['machine']['platform']}, {baseline['machine']['cpus']} CPUs)")
+    print(f"{'metric':<40} {'baseline':>12} {'current':>12} {'change':>8}")
+    regressions = []
+    for metric, value in results.items():
+        expected = baseline["results"].get(metric)
+        if not expected:
+            print(f"{metric:<40} {'-':>12} {value:>12.6g} {'new':>8}")
+            continue
+        change = value / expected - 1
+        worse = change > tolerance if _lower_is_better(metric) else change < -tolerance
+        if worse:
+            regressions.append(metric)
+        print(f"{metric:<40} {expected:>12.6g} {value:>12.6g} {change:>+7.0%}{' !' if worse else ''}")
+    return regressions
@@ -0,0 +1,54 @@
+"""
+Compares the template HTML builder with the previous string concatenation builder.
+
+Run from the backend directory:
+    python -m benchmarks.bench_html
+"""
+import timeit
+from types import SimpleNamespace
+from src.utilities.html_utilities import create_html_string_for_transcript
+from src.utilities.parser_utilities import iter_course_rows
+from .synthetic import generate_transcript_pages
+
+def legacy_create_html_string_for_transcript(transcript) -> str:
+    # The builder as it was before the templates, with the stylesheet and table head shortened
+    courses_html = ""
+    for session, course_list in transcript.courses.items():
+        courses_html += f"<tr><td colspan='11'><b>Session: {session}</b></td></tr>"
+        for course in course_list:
+            course_code = f"{course.subject} {course.code}"
+            courses_html += f"""
+                <tr>
+                    <td>{course.term}</td>
+                    <td>{course_code}</td>
+                    <td>{course.credit}</td>
+                    <td>{course.title}</td>
+                    <td>{course.num_grade}</td>
+                    <td>{course.letter_grade}</td>
+                    <td>{course.average}</td>
+                    <td>{course.year}</td>
+                    <td>{course.standing}</td>
+                </tr>"""
+    return f"""<!DOCTYPE html><html><head><title>Transcript</title><style>table {{ width: 100%; }}</style></head>
+        <body><h1>Transcript</h1><p>Name: {transcript.student_given_name} {transcript.student_surname}</p>
+        <p>ID: {transcript.student_number}</p><table>{courses_html}</table></body></html>"""
+
+def build_transcript(course_count: int):
+    # Only the attributes read by the HTML builders, so the benchmark does not need a database
+    courses = {}
+    for course in iter_course_rows(generate_transcript_pages(course_count)):
+        courses.setdefault(course.session, []).append(course)
+    return SimpleNamespace(student_surname="Doe", student_given_name="Jane", student_number="12345678", courses=courses)
+
+def main():
+    print(f"{'courses':>8} {'legacy (us)':>12} {'template (us)':>14} {'us/course':>10}")
+    for course_count in (10, 50, 200, 1000, 5000):
+        transcript = build_transcript(course_count)
+        number = max(1, 20000 // course_count)
+        legacy_time = min(timeit.repeat(lambda: legacy_create_html_string_for_transcript(transcript), number=number, repeat=5)) / number
+        template_time = min(timeit.repeat(lambda: create_html_string_for_transcript(transcript), number=number, repeat=5)) / number
+        print(f"{course_count:>8} {legacy_time * 1e6:>12.1f} {template_time * 1e6:>14.1f} "
+              f"{template_time * 1e6 / course_count:>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Compares the course row grammar with the previous per-line re.match and word count parser.
+
+Run from the backend directory:
+    python -m benchmarks.bench_parser
+"""
+import re
+import timeit
+from typing import Dict, List
+from src.utilities.course_utilities import Course
+from src.utilities.parser_utilities import iter_course_rows
+from .synthetic import generate_transcript_pages
+
+def legacy_parse_course_data(pages: List[str]) -> Dict[str, List[Course]]:
+    # The parser as it was before the course row grammar, minus the title lookups
+    lines_list = []
+    for page in pages:
+        for line in page.split("\n"):
+            lines_list.append(line)
+
+    courses = {}
+    for line in lines_list:
+        if re.match(r"^[A-Z]{4} \d{3}[A-Z]?", line):
+            w = line.split()
+            match len(w):
+                case 11:
+                    course = Course(w[5], w[2], w[6], w[0], w[1], w[9], "", w[3], w[4], w[10], w[8], "")
+                case 10:
+                    course = Course(w[3], w[2], w[4], w[0], w[1], w[7], "", "", "", "n/a", w[6], w[9])
+                case 9:
+                    course = Course(w[3], w[2], "", w[0], w[1], w[6], "", "", "", "n/a", w[5], w[8])
+                case 8:
+                    course = Course(w[3], w[2], w[4], w[0], w[1], "", "", "", "", "", w[6], w[7])
+                case 6:
+                    course = Course(w[3], w[2], "", w[0], w[1], "", "", "", "", "", w[5], "CIP")
+                case _:
+                    course = None
+            if course:
+                courses.setdefault(course.session, []).append(course)
+    return courses
+
+def grammar_parse_course_data(pages: List[str]) -> Dict[str, List[Course]]:
+    courses = {}
+    for course in iter_course_rows(pages):
+        courses.setdefault(course.session, []).append(course)
+    return courses
+
+def main():
+    print(f"{'courses':>8} {'legacy (us)':>12} {'grammar (us)':>13} {'speedup':>8}")
+    for course_count in (10, 25, 50, 100, 200):
+        pages = generate_transcript_pages(course_count)
+
+        legacy = legacy_parse_course_data(pages)
+        grammar = grammar_parse_course_data(pages)
+        assert legacy == grammar, "Parsers disagree"
+
+        number = max(1, 20000 // course_count)
+        legacy_time = min(timeit.repeat(lambda: legacy_parse_course_data(pages), number=number, repeat=5)) / number
+        grammar_time = min(timeit.repeat(lambda: grammar_parse_course_data(pages), number=number, repeat=5)) / number
+        print(f"{course_count:>8} {legacy_time * 1e6:>12.1f} {grammar_time * 1e6:>13.1f} {legacy_time / grammar_time:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmarks each stage of transcript generation on synthetic transcript PDFs.
+
+Title resolution runs against a temporary SQLite database and a local stub UBCGrades server, cold
+(every title fetched from the stub), from the database, from the shared course catalog index, and
+from the in-process cache.
+
+Run from the backend directory:
+    python -m benchmarks.bench_stages
+    python -m benchmarks.bench_stages --save-baseline
+    python -m benchmarks.bench_stages --compare
+"""
+import sys
+import time
+import timeit
+import argparse
+from typing import Callable, Dict, List
+from .baseline import compare_with_baseline, save_baseline
+from .environment import configure_environment
+from .synthetic import generate_transcript_pdf
+
+BASELINE_NAME = "stages"
+
+def measure(run: Callable[[], object], repeat: int, setup: Callable[[], object] = None) -> float:
+    """
+    Returns the fastest time of `run` in seconds out of `repeat` measurements.
+
+    Without `setup`, each measurement loops `run` for at least 0.2s like timeit does, so fast stages are
+    not dominated by timer noise. With `setup`, it is called untimed before every single run.
+    """
+    if setup is None:
+        timer = timeit.Timer(run)
+        number, _ = timer.autorange()
+        return min(timer.repeat(repeat=repeat, number=number)) / number
+
+    durations = []
+    for _ in range(repeat):
+        setup()
+        start = time.perf_counter()
+        run()
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, nargs="+", default=[20, 100, 400], help="Transcript sizes in course rows")
+    parser.add_argument("--repeat", type=int, default=5, help="Measurements per stage, the fastest is reported")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="Seconds each stub UBCGrades response is delayed")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Save the results as baselines/{BASELINE_NAME}.json")
+    parser.add_argument("--compare", action="store_true", help="Compare the results with the saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before a stage counts as regressed")
+    args = parser.parse_args()
+
+    configure_environment(api_latency=args.api_latency)
+
+    # Imported after the environment is configured, since these read it at import time
+    from src.database import database_models
+    from src.database.database_migrations import migrate_schema
+    from src.database.database import engine, SessionLocal
+    from src.database.database_cache import course_title_cache
+    from src.database.database_index import course_catalog_index
+    from src.utilities.html_utilities import create_html_string_for_transcript
+    from src.utilities.pdf_utilities import PdfUtilities
+    from src.utilities.render_utilities import DirectPdfRenderer, WeasyPrintRenderer
+    from src.utilities.transcript_utilities import TranscriptParser
+
+    migrate_schema(engine)
+    db = SessionLocal()
+
+    renderers = {"render_direct": DirectPdfRenderer()}
+    try:
+        renderers["render_weasyprint"] = WeasyPrintRenderer()
+    except Exception as e:
+        print(f"Skipping the WeasyPrint render stage: {e!r}", file=sys.stderr)
+
+    def forget_titles():
+        course_title_cache.clear()
+        db.query(database_models.Courses).delete()
+        db.commit()
+        course_catalog_index.build(db)
+
+    results: Dict[str, float] = {}
+    stages: List[str] = []
+    for course_count in args.courses:
+        pdf = generate_transcript_pdf(course_count)
+        pages = PdfUtilities.extract_text_from_pdf(pdf)
+        transcript = TranscriptParser(None, pages).parse(resolve_titles=False)
+        resolver = TranscriptParser(db, [])
+
+        timings = {
+            "extract": measure(lambda: PdfUtilities.extract_text_from_pdf(pdf), args.repeat),
+            "extract_layout": measure(lambda: list(PdfUtilities.iter_pages_from_pdf(pdf, engine="layout")), args.repeat),
+            "parse": measure(lambda: TranscriptParser(None, pages).parse(resolve_titles=False), args.repeat),
+            "titles_api": measure(lambda: resolver.resolve_course_titles(transcript.courses), args.repeat,
+                                  setup=forget_titles),
+            "titles_db": measure(lambda: resolver.resolve_course_titles(transcript.courses), args.repeat,
+                                 setup=course_title_cache.clear),
+        }
+        course_catalog_index.build(db)
+        timings["titles_index"] = measure(lambda: resolver.resolve_course_titles(transcript.courses), args.repeat,
+                                          setup=course_title_cache.clear)
+        course_title_cache.warm(db)
+        timings["titles_cache"] = measure(lambda: resolver.resolve_course_titles(transcript.courses), args.repeat)
+        timings["html"] = measure(lambda: create_html_string_for_transcript(transcript), args.repeat)
+        for name, renderer in renderers.items():
+            renderer.render(transcript)
+            timings[name] = measure(lambda: renderer.render(transcript), args.repeat)
+
+        for stage, seconds in timings.items():
+            if stage not in stages:
+                stages.append(stage)
+            results[f"{stage}[{course_count}]_seconds"] = seconds
+
+    db.close()
+
+    print(f"{'stage':<18}" + "".join(f"{f'{count} courses (ms)':>20}" for count in args.courses))
+    for stage in stages:
+        cells = (results.get(f"{stage}[{count}]_seconds") for count in args.courses)
+        print(f"{stage:<18}" + "".join(f"{seconds * 1e3:>20.3f}" if seconds is not None else f"{'-':>20}" for seconds in cells))
+
+    settings = {"courses": args.courses, "repeat": args.repeat, "api_latency": args.api_latency}
+    if args.save_baseline:
+        print(f"Saved baseline to {save_baseline(BASELINE_NAME, results, settings)}")
+    if args.compare:
+        regressions = compare_with_baseline(BASELINE_NAME, results, args.tolerance)
+        if regressions:
+            print(f"Regressed: {', '.join(regressions)}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
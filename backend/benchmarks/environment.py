@@ -0,0 +1,30 @@
+import os
+import tempfile
+from http.server import ThreadingHTTPServer
+from .stub_ubcgrades import start_stub_server
+
+def configure_environment(api_latency: float = 0.0, rendered_pdf_cache: bool = False) -> ThreadingHTTPServer:
+    """
+    Points the app at a fresh SQLite database and a local stub UBCGrades server.
+
+    Must be called before anything under `src.database` or `src.main` is imported, since those read
+    their configuration at import time.
+
+    Args:
+        api_latency (float): The number of seconds each stub UBCGrades response is delayed.
+        rendered_pdf_cache (bool): Whether to keep the rendered PDF cache, which otherwise hides the cost of repeated uploads.
+
+    Returns:
+        ThreadingHTTPServer: The stub UBCGrades server.
+    """
+    server = start_stub_server(api_latency)
+    directory = tempfile.mkdtemp(prefix="transcript-benchmark-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'benchmark.db')}"
+    os.environ["UBC_GRADES_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ.setdefault("OFFICIAL_TRANSCRIPT_FEE", "0")
+    os.environ["COURSE_CATALOG_PATH"] = ""
+    os.environ["COURSE_INDEX_PATH"] = os.path.join(directory, "course-catalog.index")
+    if not rendered_pdf_cache:
+        os.environ["RENDERED_PDF_CACHE_DIR"] = ""
+        os.environ["RENDERED_PDF_CACHE_MEMORY_SIZE"] = "0"
+    return server
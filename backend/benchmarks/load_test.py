@@ -0,0 +1,133 @@
+"""
+Sends concurrent transcript generation requests and reports throughput and latency percentiles.
+
+By default the FastAPI app is run in-process against a temporary SQLite database and a local stub
+UBCGrades server. With --url, a running server is load tested instead.
+
+Run from the backend directory:
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --requests 500 --concurrency 16 --distinct 50
+    python -m benchmarks.load_test --url http://localhost:8000
+    python -m benchmarks.load_test --format json
+    python -m benchmarks.load_test --save-baseline
+    python -m benchmarks.load_test --compare
+"""
+import os
+import sys
+import math
+import time
+import asyncio
+import argparse
+from collections import Counter
+from typing import Dict, List
+import httpx
+from .baseline import compare_with_baseline, save_baseline
+from .environment import configure_environment
+from .synthetic import generate_transcript_pdf
+
+BASELINE_NAME = "load"
+ENDPOINT = "/generate-unofficial-transcript"
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """
+    Returns the nearest-rank percentile of already sorted values.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+async def run_load(client: httpx.AsyncClient, uploads: List[bytes], requests: int, concurrency: int,
+                   output_format: str = "pdf") -> Dict:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    next_request = iter(range(requests))
+
+    async def worker():
+        for index in next_request:
+            data = uploads[index % len(uploads)]
+            start = time.perf_counter()
+            try:
+                response = await client.post(ENDPOINT, params={"format": output_format},
+                                             files={"file": ("transcript.pdf", data, "application/pdf")})
+                statuses[response.status_code] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+                continue
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "elapsed": elapsed,
+        "statuses": statuses,
+        "results": {
+            "throughput_per_second": len(latencies) / elapsed,
+            "p50_seconds": percentile(latencies, 0.50),
+            "p95_seconds": percentile(latencies, 0.95),
+            "p99_seconds": percentile(latencies, 0.99),
+        },
+    }
+
+async def main_async(args) -> Dict:
+    uploads = [generate_transcript_pdf(args.courses, seed=seed) for seed in range(args.distinct)]
+    timeout = httpx.Timeout(args.timeout)
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=timeout) as client:
+            return await run_load(client, uploads, args.requests, args.concurrency, args.format)
+
+    configure_environment(api_latency=args.api_latency, rendered_pdf_cache=args.rendered_pdf_cache)
+    # Imported after the environment is configured, since it reads it at import time
+    from src.main import app
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(app=app, base_url="http://load-test", timeout=timeout) as client:
+            return await run_load(client, uploads, args.requests, args.concurrency, args.format)
+
+def baseline_name(output_format: str) -> str:
+    return BASELINE_NAME if output_format == "pdf" else f"{BASELINE_NAME}-{output_format}"
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="The total number of requests")
+    parser.add_argument("--concurrency", type=int, default=8, help="The number of requests in flight at once")
+    parser.add_argument("--courses", type=int, default=50, help="Course rows per synthetic transcript")
+    parser.add_argument("--distinct", type=int, default=20, help="The number of distinct transcripts uploaded in rotation")
+    parser.add_argument("--format", choices=("pdf", "html", "json", "csv"), default="pdf",
+                        help="The requested output format, each format has its own baseline")
+    parser.add_argument("--url", help="Load test a running server instead of the in-process app")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="Seconds each stub UBCGrades response is delayed")
+    parser.add_argument("--rendered-pdf-cache", action="store_true", help="Keep the rendered PDF cache enabled")
+    parser.add_argument("--timeout", type=float, default=60, help="The per-request timeout in seconds")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Save the results as baselines/{BASELINE_NAME}.json")
+    parser.add_argument("--compare", action="store_true", help="Compare the results with the saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed change before a metric counts as regressed")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    results = report["results"]
+
+    print(f"Requests: {args.requests} Concurrency: {args.concurrency} Elapsed: {report['elapsed']:.2f}s")
+    print("Responses: " + " ".join(f"{status}: {count}" for status, count in sorted(report["statuses"].items(), key=str)))
+    print(f"Throughput: {results['throughput_per_second']:.1f} requests/s")
+    print(f"Latency p50: {results['p50_seconds'] * 1e3:.1f}ms p95: {results['p95_seconds'] * 1e3:.1f}ms "
+          f"p99: {results['p99_seconds'] * 1e3:.1f}ms")
+
+    settings = {key: value for key, value in vars(args).items() if key not in ("save_baseline", "compare", "tolerance")}
+    settings["render_backend"] = os.getenv("PDF_RENDER_BACKEND", "weasyprint")
+    if args.save_baseline:
+        print(f"Saved baseline to {save_baseline(baseline_name(args.format), results, settings)}")
+    if args.compare:
+        regressions = compare_with_baseline(baseline_name(args.format), results, args.tolerance)
+        if regressions:
+            print(f"Regressed: {', '.join(regressions)}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StubUBCGradesHandler(BaseHTTPRequestHandler):
+    """
+    Answers UBCGrades course requests with made-up titles.
+
+    Course code 999 does not exist and gets a 404. Every response is delayed by the server's `latency`
+    to approximate the round trip to the real API.
+    """
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, body):
+        content = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        # e.g. /v3/course-statistics/UBCV/MATH/100 or /v3/courses/UBCV/MATH
+        parts = self.path.strip("/").split("/")
+        if len(parts) == 4 and parts[1] == "courses":
+            self._send_json([{"course": "100", "detail": "", "course_title": f"{parts[3]} Stub Course"}])
+        elif len(parts) >= 5 and parts[-1] != "999":
+            self._send_json({"course_title": f"{parts[-2]} {parts[-1]} Stub Course", "average": 72.5})
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+def start_stub_server(latency: float = 0.0) -> ThreadingHTTPServer:
+    """
+    Starts a stub UBCGrades server on a free local port, on a daemon thread.
+
+    Args:
+        latency (float): The number of seconds each response is delayed.
+
+    Returns:
+        ThreadingHTTPServer: The running server. Its port is `server.server_address[1]`.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubUBCGradesHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    threading.Thread(target=server.serve_forever, name="stub-ubcgrades", daemon=True).start()
+    return server
@@ -0,0 +1,106 @@
+import random
+from typing import List
+from src.utilities.render_utilities import DirectPdfRenderer, write_pdf
+
+SUBJECTS = ["CPEN", "CPSC", "MATH", "PHYS", "ENGL", "WRDS", "APSC", "ELEC", "STAT", "CHEM"]
+LETTER_GRADES = ["A+", "A", "A-", "B+", "B", "B-", "C+", "C", "C-", "D", "F"]
+
+# The columns of the course table and the x position each one starts at on the generated PDF
+COLUMNS = ["Course", "Section", "Grade", "Letter", "Session", "Term", "Program", "Year", "Credits", "Class Avg", "Standing"]
+COLUMN_POSITIONS = [40, 95, 135, 170, 205, 250, 280, 325, 355, 395, 445]
+
+def generate_course_rows(course_count: int, seed: int = 0) -> List[List[str]]:
+    """
+    Generates course rows in every shape handled by the transcript parser, one cell per column.
+
+    Roughly 70% of the rows are graded, the rest are split between pass/fail (with and without term),
+    withdrawn and in-progress rows. Cells a row does not have are empty.
+
+    Args:
+        course_count (int): The number of course rows.
+        seed (int): The random seed, so runs are reproducible.
+
+    Returns:
+        List[List[str]]: The cells of each course row, in transcript order.
+    """
+    rng = random.Random(seed)
+    rows = []
+    for i in range(course_count):
+        subject = rng.choice(SUBJECTS)
+        code = f"{rng.randint(100, 499)}{rng.choice(['', '', '', 'B'])}"
+        section = f"{rng.randint(101, 110)}"
+        session = f"{2018 + i // 10}W"
+        term = str(rng.randint(1, 2))
+        year = str(1 + i // 10)
+        course = f"{subject} {code}"
+        shape = rng.random()
+        if shape < 0.7:
+            grade = str(rng.randint(50, 100))
+            letter = rng.choice(LETTER_GRADES)
+            rows.append([course, section, grade, letter, session, term, "BASC", year,
+                         rng.choice(["3.0", "4.0"]), str(rng.randint(60, 85)), ""])
+        elif shape < 0.8:
+            rows.append([course, section, "", "", session, term, "BASC", year, "3.0", "-", "P"])
+        elif shape < 0.85:
+            rows.append([course, section, "", "", session, "", "BASC", year, "0.0", "-", "P"])
+        elif shape < 0.92:
+            rows.append([course, section, "", "", session, term, "BASC", year, "", "", "W"])
+        else:
+            rows.append([course, section, "", "", session, "", "BASC", year, "", "", ""])
+    return rows
+
+def generate_course_lines(course_count: int, seed: int = 0) -> List[str]:
+    """
+    Generates the course rows of `generate_course_rows` the way pdfplumber extracts them as text.
+    """
+    return [" ".join(cell for cell in row if cell) for row in generate_course_rows(course_count, seed)]
+
+def _header_rows() -> List[List[str]]:
+    return [["The University of British Columbia"], ["Grade Summary"], ["Name:Doe, Jane #:12345678"], COLUMNS]
+
+def generate_transcript_pages(course_count: int, courses_per_page: int = 40, seed: int = 0) -> List[str]:
+    """
+    Generates the extracted text of a UBC-style transcript, the way pdfplumber returns it.
+
+    Args:
+        course_count (int): The number of course rows.
+        courses_per_page (int): The number of course rows on each page.
+        seed (int): The random seed, so runs are reproducible.
+
+    Returns:
+        List[str]: The text of each page.
+    """
+    return ["\n".join(" ".join(cell for cell in row if cell) for row in page)
+            for page in _iter_page_rows(course_count, courses_per_page, seed)]
+
+def _iter_page_rows(course_count: int, courses_per_page: int, seed: int):
+    rows = generate_course_rows(course_count, seed)
+    for start in range(0, max(course_count, 1), courses_per_page):
+        yield _header_rows() + rows[start:start + courses_per_page] + [["Page footer"]]
+
+def generate_transcript_pdf(course_count: int, courses_per_page: int = 40, seed: int = 0) -> bytes:
+    """
+    Generates a UBC-style transcript PDF with one text line per row of `generate_transcript_pages`.
+
+    The cells of the course table start at the fixed x position of their column, like on a real transcript.
+
+    Args:
+        course_count (int): The number of course rows.
+        courses_per_page (int): The number of course rows on each page.
+        seed (int): The random seed, so runs are reproducible.
+
+    Returns:
+        bytes: The content of the PDF.
+    """
+    width, height, margin, leading = 612, 792, 40, 14
+    contents = []
+    for page in _iter_page_rows(course_count, courses_per_page, seed):
+        commands = []
+        for i, row in enumerate(page):
+            y = height - margin - i * leading
+            # Rows with a single cell are free text starting at the left margin
+            positions = COLUMN_POSITIONS if len(row) == len(COLUMNS) else [margin]
+            commands += [f"BT /F1 9 Tf {x} {y} Td ({DirectPdfRenderer._escape(cell)}) Tj ET"
+                         for x, cell in zip(positions, row) if cell]
+        contents.append("\n".join(commands))
+    return write_pdf(contents, width, height)
@@ -0,0 +1,52 @@
+import sys
+import logging
+import argparse
+from src.database.database import engine, SessionLocal
+from src.database.database_catalog import fetch_subject_catalogs, import_catalog, load_catalog_file, COURSE_CATALOG_BATCH_SIZE
+from src.database.database_index import course_catalog_index
+from src.database.database_migrations import migrate_schema
+from src.utilities.api_utilities import ubc_grades_client
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Import course titles into the courses table.")
+    parser.add_argument("files", nargs="*", help="JSON or CSV course catalogs with subject, code and title")
+    parser.add_argument("-s", "--subject", action="append", default=[],
+                        help="Fetch every course of a subject from UBCGrades. Can be repeated.")
+    parser.add_argument("--batch-size", type=int, default=COURSE_CATALOG_BATCH_SIZE,
+                        help="The number of courses written per transaction")
+    args = parser.parse_args()
+
+    if not args.files and not args.subject:
+        parser.error("Give at least one catalog file or --subject")
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+
+    titles = {}
+    try:
+        for path in args.files:
+            titles.update(load_catalog_file(path))
+    except (OSError, ValueError) as e:
+        print(f"Failed to read course catalog: {e}", file=sys.stderr)
+        return 2
+
+    try:
+        titles.update(fetch_subject_catalogs(args.subject))
+    finally:
+        ubc_grades_client.close()
+
+    migrate_schema(engine)
+    db = SessionLocal()
+    try:
+        count = import_catalog(db, titles, batch_size=args.batch_size)
+        # Running servers pick up the rebuilt index without a restart
+        indexed = course_catalog_index.build(db)
+    finally:
+        db.close()
+
+    print(f"Imported {count} courses")
+    if indexed is not None:
+        print(f"Indexed {indexed} courses in {course_catalog_index.path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
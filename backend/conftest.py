@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# Settings that the modules under test read at import time. The tests never touch these paths.
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'transcript-tests.db')}")
+os.environ.setdefault("OFFICIAL_TRANSCRIPT_FEE", "0")
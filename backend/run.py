@@ -1,4 +1,45 @@
+"""
+Starts the API server.
+
+    python run.py                          Development server that reloads on code changes
+    python run.py --workers 4              Production server: imports and warms up once, then forks workers
+    python run.py --import-report          Prints the slowest imports of the app
+    python run.py --import-report --max-import-time 1.5
+                                           Also fails if importing the app takes longer than 1.5s
+"""
+import sys
+import argparse
 import uvicorn
 
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, help="Run the production server with this many worker processes")
+    parser.add_argument("--import-report", action="store_true", help="Print the slowest imports of the app and exit")
+    parser.add_argument("--top", type=int, default=20, help="The number of modules in the import report")
+    parser.add_argument("--max-import-time", type=float, help="Seconds importing the app may take before the report fails")
+    args = parser.parse_args()
+
+    if args.import_report:
+        from src.utilities.startup_utilities import import_time_report
+
+        total, report = import_time_report("src.main", args.top)
+        print(report)
+        if args.max_import_time is not None and total > args.max_import_time:
+            print(f"Importing the app took {total:.2f}s, more than {args.max_import_time:.2f}s")
+            return 1
+        return 0
+
+    if args.workers:
+        from src.main import app, warm_up
+        from src.utilities.startup_utilities import PreforkServer
+
+        PreforkServer(app, args.host, args.port, args.workers, warm_up=warm_up).run()
+        return 0
+
+    uvicorn.run("src.main:app", host=args.host, port=args.port, reload=True)
+    return 0
+
 if __name__ == "__main__":
-    uvicorn.run("src.main:app", host="0.0.0.0", port=8000, reload=True)
+    sys.exit(main())
@@ -0,0 +1,131 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+from . import database_models
+
+load_dotenv()
+
+COURSE_TITLE_CACHE_SIZE = int(os.getenv("COURSE_TITLE_CACHE_SIZE", 20000))
+COURSE_TITLE_CACHE_TTL = float(os.getenv("COURSE_TITLE_CACHE_TTL", 24 * 60 * 60))
+
+CourseKey = Tuple[str, str]
+
+class CourseTitleCache:
+    """
+    A bounded, process-wide LRU cache of course titles keyed by (subject, code).
+
+    Entries expire `ttl` seconds after they were stored. When the cache is full the least recently
+    used entry is evicted.
+
+    Attributes:
+        max_size (int): The maximum number of cached titles.
+        ttl (float): The number of seconds a title stays valid.
+    """
+    def __init__(self, max_size: int = COURSE_TITLE_CACHE_SIZE, ttl: float = COURSE_TITLE_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[CourseKey, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _lookup(self, key: CourseKey, now: float) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        title, expires_at = entry
+        if expires_at <= now:
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return title
+
+    def _store(self, key: CourseKey, title: str, now: float):
+        self._entries[key] = (title, now + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, subject: str, code: str) -> Optional[str]:
+        with self._lock:
+            return self._lookup((subject, code), time.monotonic())
+
+    def get_many(self, keys: Iterable[CourseKey]) -> Tuple[Dict[CourseKey, str], List[CourseKey]]:
+        """
+        Looks up several courses at once.
+
+        Args:
+            keys (Iterable[Tuple[str, str]]): The (subject, code) pairs to look up.
+
+        Returns:
+            Tuple[Dict[Tuple[str, str], str], List[Tuple[str, str]]]: The cached titles and the keys that were not cached.
+        """
+        found = {}
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                title = self._lookup(key, now)
+                if title is None:
+                    missing.append(key)
+                else:
+                    found[key] = title
+
+        return found, missing
+
+    def put(self, subject: str, code: str, title: str):
+        with self._lock:
+            self._store((subject, code), title, time.monotonic())
+
+    def put_many(self, titles: Dict[CourseKey, str]):
+        now = time.monotonic()
+        with self._lock:
+            for key, title in titles.items():
+                self._store(key, title, now)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def warm(self, db: Session) -> int:
+        """
+        Loads up to `max_size` course titles from the courses table.
+
+        Args:
+            db (Session): The database session.
+
+        Returns:
+            int: The number of titles loaded.
+        """
+        rows = db.query(database_models.Courses.subject, database_models.Courses.code, database_models.Courses.title) \
+            .filter(database_models.Courses.title.isnot(None)) \
+            .limit(self.max_size).all()
+        self.put_many({(subject, code): title for subject, code, title in rows})
+        logging.info(f"Warmed course title cache with {len(rows)} courses")
+        return len(rows)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+course_title_cache = CourseTitleCache()
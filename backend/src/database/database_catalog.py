@@ -0,0 +1,116 @@
+import os
+import csv
+import json
+import logging
+from typing import Dict, Iterable, List, Tuple
+from dotenv import load_dotenv
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from src.utilities.api_utilities import fetch_subject_course_titles
+from . import database_crud
+from .database_cache import course_title_cache
+
+load_dotenv()
+
+# A JSON or CSV course catalog imported at startup, if set
+COURSE_CATALOG_PATH = os.getenv("COURSE_CATALOG_PATH", "")
+COURSE_CATALOG_BATCH_SIZE = int(os.getenv("COURSE_CATALOG_BATCH_SIZE", 500))
+
+CourseKey = Tuple[str, str]
+
+def _parse_record(record: Dict) -> Tuple[CourseKey, str]:
+    if not isinstance(record, dict):
+        raise ValueError(f"Course catalog record must be an object: {record!r}")
+    # Accepts both our own column names and the ones of a UBCGrades course dump
+    subject = record.get("subject")
+    code = record.get("code") or f"{record.get('course') or ''}{record.get('detail') or ''}"
+    title = record.get("title") or record.get("course_title")
+    if not subject or not code or not title:
+        raise ValueError(f"Course catalog record needs a subject, code and title: {record}")
+    # JSON catalogs may hold numeric codes, e.g. 100
+    return (str(subject).strip().upper(), str(code).strip().upper()), str(title).strip()
+
+def load_catalog_file(path: str) -> Dict[CourseKey, str]:
+    """
+    Reads a course catalog from a JSON or CSV file.
+
+    A JSON catalog is a list of objects and a CSV catalog has a header row. Each record has a `subject`,
+    a `code` and a `title` (e.g. MATH, 100, Differential Calculus with Applications).
+
+    Args:
+        path (str): The path of the .json or .csv file.
+
+    Returns:
+        Dict[Tuple[str, str], str]: The course titles keyed by (subject, code).
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".json"):
+            records = json.load(f)
+            if not isinstance(records, list):
+                raise ValueError(f"JSON course catalog must be a list of objects: {path}")
+        elif path.lower().endswith(".csv"):
+            records = list(csv.DictReader(f))
+        else:
+            raise ValueError(f"Course catalog must be a .json or .csv file: {path}")
+
+    return dict(_parse_record(record) for record in records)
+
+def fetch_subject_catalogs(subjects: Iterable[str]) -> Dict[CourseKey, str]:
+    """
+    Fetches the titles of every course of the given subjects from UBCGrades, one request per subject.
+
+    Args:
+        subjects (Iterable[str]): The subject codes (e.g. ['MATH', 'CPSC']).
+
+    Returns:
+        Dict[Tuple[str, str], str]: The course titles keyed by (subject, code). Subjects that could not be fetched are left out.
+    """
+    titles = {}
+    for subject in subjects:
+        fetched = fetch_subject_course_titles(subject.upper())
+        if fetched is None:
+            logging.error(f"Failed to fetch course catalog of subject {subject}")
+            continue
+        titles.update(fetched)
+    return titles
+
+def import_catalog(db: Session, titles: Dict[CourseKey, str], batch_size: int = COURSE_CATALOG_BATCH_SIZE) -> int:
+    """
+    Upserts a course catalog into the courses table and the course title cache.
+
+    Courses are written `batch_size` at a time, one transaction per batch.
+
+    Args:
+        db (Session): The database session.
+        titles (Dict[Tuple[str, str], str]): The course titles keyed by (subject, code).
+        batch_size (int): The number of courses written per transaction.
+
+    Returns:
+        int: The number of courses imported.
+    """
+    items: List[Tuple[CourseKey, str]] = list(titles.items())
+    for start in range(0, len(items), batch_size):
+        database_crud.upsert_course_titles(db, dict(items[start:start + batch_size]))
+        db.commit()
+
+    course_title_cache.put_many(titles)
+    logging.info(f"Imported course catalog with {len(items)} courses")
+    return len(items)
+
+def preload_catalog(db: Session, path: str = COURSE_CATALOG_PATH) -> int:
+    """
+    Imports the course catalog at `path` at startup. Does nothing if no path is configured.
+
+    Returns:
+        int: The number of courses imported.
+    """
+    if not path:
+        return 0
+
+    try:
+        return import_catalog(db, load_catalog_file(path))
+    except (OSError, ValueError, SQLAlchemyError) as e:
+        # A broken catalog must not keep the server from starting, titles are still resolved on demand
+        db.rollback()
+        logging.error(f"Failed to import course catalog. Path: {path} Error: {e}")
+        return 0
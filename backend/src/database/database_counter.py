@@ -0,0 +1,138 @@
+import os
+import time
+import logging
+import threading
+from typing import Dict, Optional
+from dotenv import load_dotenv
+from . import database_crud
+from src.utilities.metrics_utilities import span
+from .database import AsyncSessionLocal, SessionLocal
+
+load_dotenv()
+
+USAGE_COUNTER_FLUSH_INTERVAL = float(os.getenv("USAGE_COUNTER_FLUSH_INTERVAL", 5))
+USAGE_COUNTER_READ_TTL = float(os.getenv("USAGE_COUNTER_READ_TTL", 5))
+
+class UsageCounter:
+    """
+    Counts generated transcripts in memory and adds them to the database in batches.
+
+    `increment()` only bumps an in-memory counter. A background thread adds the accumulated count to the
+    total with one atomic update every `flush_interval` seconds, and `shutdown()` flushes whatever is
+    left. Reads are served from a copy of the stored total that is refreshed at most every `read_ttl`
+    seconds, plus the count that has not been flushed yet. Neither path takes a row lock.
+
+    The counter must live in the process that serves requests, since counts held by a worker process
+    would be lost when it exits.
+
+    Attributes:
+        flush_interval (float): The number of seconds between flushes.
+        read_ttl (float): The number of seconds a read of the stored total is reused.
+    """
+    def __init__(self, flush_interval: float = USAGE_COUNTER_FLUSH_INTERVAL, read_ttl: float = USAGE_COUNTER_READ_TTL):
+        self.flush_interval = flush_interval
+        self.read_ttl = read_ttl
+        self._pending = 0
+        self._stored: Optional[float] = None
+        self._stored_expires_at = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread = None
+        self.flushes = 0
+        self.flush_failures = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="usage-counter", daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def increment(self, count: int = 1):
+        with self._lock:
+            self._pending += count
+
+    def flush(self) -> int:
+        """
+        Adds the accumulated count to the stored total.
+
+        Returns:
+            int: The number of transcripts flushed. On failure the count is kept for the next flush and 0 is returned.
+        """
+        with self._lock:
+            count, self._pending = self._pending, 0
+        if count == 0:
+            return 0
+
+        db = SessionLocal()
+        try:
+            with span("usage_counter_flush"):
+                database_crud.add_total_used_counts(db, count)
+        except Exception:
+            logging.exception(f"Failed to flush usage counter. Count: {count}")
+            with self._lock:
+                self._pending += count
+                self.flush_failures += 1
+            return 0
+        finally:
+            db.close()
+
+        with self._lock:
+            if self._stored is not None:
+                self._stored += count
+            self.flushes += 1
+        return count
+
+    def _needs_refresh(self) -> bool:
+        return self._stored is None or self._stored_expires_at <= time.monotonic()
+
+    def _total(self, stored: Optional[float] = None) -> float:
+        with self._lock:
+            if stored is not None:
+                self._stored = stored
+                self._stored_expires_at = time.monotonic() + self.read_ttl
+            return self._stored + self._pending
+
+    def get_total(self) -> float:
+        """
+        Returns the total number of generated transcripts, including the ones not flushed yet.
+        """
+        if not self._needs_refresh():
+            return self._total()
+
+        db = SessionLocal()
+        try:
+            return self._total(database_crud.get_total_used_counts(db))
+        finally:
+            db.close()
+
+    async def get_total_async(self) -> float:
+        """
+        Same as `get_total`, reading the stored total without blocking the event loop.
+        """
+        if not self._needs_refresh():
+            return self._total()
+
+        async with AsyncSessionLocal() as db:
+            return self._total(await database_crud.get_total_used_counts_async(db))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": self._pending,
+            "flushes": self.flushes,
+            "flush_failures": self.flush_failures,
+        }
+
+usage_counter = UsageCounter()
@@ -1,45 +1,260 @@
+from typing import TYPE_CHECKING, Dict, Iterable, Tuple
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from src.utilities.api_utilities import fetch_course_title
+from src.utilities.api_utilities import fetch_course_title, fetch_course_titles, fetch_course_titles_async
+from src.utilities.metrics_utilities import span, COURSE_TITLE_LOOKUPS
 from . import database_models
+from .database_cache import course_title_cache
+from .database_index import course_catalog_index
+from .database_migrations import has_course_key
 
-def get_total_used_counts(db: Session) -> float:
-    instance = db.query(database_models.History) \
-        .with_for_update(of=database_models.History) \
-        .filter(database_models.History.name == "total_used_counts").first()
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
 
-    if instance:
-        db.commit()
-        return float(instance.value)
-    else:
-        # Add a default row as 0 if there's no 
-        instance = database_models.History(name="total_used_counts", value=0)
-        db.add(instance)
-        db.commit()
-        return 0
+TOTAL_USED_COUNTS = "total_used_counts"
+
+def get_total_used_counts(db: Session) -> float:
+    value = db.query(database_models.History.value) \
+        .filter(database_models.History.name == TOTAL_USED_COUNTS).scalar()
+    return float(value) if value is not None else 0
 
 def get_course_title(db: Session, subject: str, code: str) -> str:
-    instance = db.query(database_models.Courses) \
-        .with_for_update(of=database_models.Courses) \
-        .filter(database_models.Courses.subject == subject and database_models.Courses.code == code).first()
+    with span("get_course_title", source="cache"):
+        title = course_title_cache.get(subject, code)
+    if title is not None:
+        COURSE_TITLE_LOOKUPS.inc(source="cache")
+        return title
 
-    if instance:
-        return str(instance.title)
-    else:
-        title = fetch_course_title(subject=subject, code=code)
-        instance = database_models.Courses(subject=subject, code=code, title=title)
-        db.add(instance)
-        db.commit()
+    with span("get_course_title", source="index"):
+        title = course_catalog_index.get(subject, code)
+    if title is not None:
+        COURSE_TITLE_LOOKUPS.inc(source="index")
         return title
 
-def increment_total_requests(db: Session):
-    instance = db.query(database_models.History) \
-        .with_for_update(of=database_models.History) \
-        .filter(database_models.History.id == 1).first()
+    with span("get_course_title", source="db"):
+        instance = db.query(database_models.Courses) \
+            .filter(database_models.Courses.subject == subject, database_models.Courses.code == code).first()
 
-    if instance:
-        instance.value += 1
+    # A row without a title is refetched, so the title is stored once UBCGrades has it
+    if instance and instance.title is not None:
+        COURSE_TITLE_LOOKUPS.inc(source="db")
+        title = instance.title
     else:
-        instance = database_models.History(name="total_used_counts", value=1)
-        db.add(instance)
+        with span("get_course_title", source="api"):
+            title = fetch_course_title(subject=subject, code=code)
+            if title is None:
+                COURSE_TITLE_LOOKUPS.inc(source="missing")
+                return ""
+            upsert_course_titles(db, {(subject, code): title})
+            db.commit()
+        COURSE_TITLE_LOOKUPS.inc(source="api")
+
+    course_title_cache.put(subject, code, title)
+    return title
+
+def get_course_titles(db: Session, courses: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], str]:
+    """
+    Resolves the titles of many courses at once.
+
+    Cached courses are served from the in-process cache, then from the shared course catalog index, and
+    the rest are loaded with a single query.
+    Unknown courses are fetched from UBCGrades concurrently and stored in a single transaction. Courses whose
+    title could not be fetched are left out.
+    Stored courses without a title are fetched again, as if they were unknown.
+    Courses that another request stored meanwhile are updated rather than inserted twice.
+
+    Args:
+        db (Session): The database session.
+        courses (Iterable[Tuple[str, str]]): The (subject, code) pairs to resolve. Duplicates are ignored.
+
+    Returns:
+        Dict[Tuple[str, str], str]: The course titles keyed by (subject, code).
+    """
+    with span("get_course_title", source="cache"):
+        titles, uncached = course_title_cache.get_many(set(courses))
+    COURSE_TITLE_LOOKUPS.inc(len(titles), source="cache")
+    if not uncached:
+        return titles
+
+    with span("get_course_title", source="index"):
+        indexed, uncached = course_catalog_index.get_many(uncached)
+    COURSE_TITLE_LOOKUPS.inc(len(indexed), source="index")
+    titles.update(indexed)
+    if not uncached:
+        return titles
+
+    with span("get_course_title", source="db"):
+        instances = db.query(database_models.Courses) \
+            .filter(tuple_(database_models.Courses.subject, database_models.Courses.code).in_(uncached)).all()
+    stored = {(instance.subject, instance.code): instance.title for instance in instances if instance.title is not None}
+    COURSE_TITLE_LOOKUPS.inc(len(stored), source="db")
+    course_title_cache.put_many(stored)
+    titles.update(stored)
+
+    missing = [key for key in uncached if key not in titles]
+    if missing:
+        with span("get_course_title", source="api"):
+            fetched = {key: title for key, title in fetch_course_titles(missing).items() if title is not None}
+            if fetched:
+                upsert_course_titles(db, fetched)
+                db.commit()
+        COURSE_TITLE_LOOKUPS.inc(len(fetched), source="api")
+        COURSE_TITLE_LOOKUPS.inc(len(missing) - len(fetched), source="missing")
+        course_title_cache.put_many(fetched)
+        titles.update(fetched)
+
+    return titles
+
+def _upsert_statement(dialect: str, titles: Dict[Tuple[str, str], str]):
+    """
+    Builds an `INSERT ... ON CONFLICT DO UPDATE` of course titles, or returns None if the dialect has none.
+    """
+    if dialect not in ("postgresql", "sqlite"):
+        return None
+
+    rows = [{"subject": subject, "code": code, "title": title} for (subject, code), title in titles.items()]
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    statement = insert(database_models.Courses).values(rows)
+    return statement.on_conflict_do_update(index_elements=["subject", "code"], set_={"title": statement.excluded.title})
+
+def upsert_course_titles(db: Session, titles: Dict[Tuple[str, str], str]):
+    """
+    Inserts or updates many course titles with a single statement. The caller commits.
+
+    Until `migrate_schema` has added the unique (subject, code) key to an existing courses table, the existing
+    rows are updated and the rest inserted instead.
+
+    Args:
+        db (Session): The database session.
+        titles (Dict[Tuple[str, str], str]): The course titles keyed by (subject, code).
+    """
+    if not titles:
+        return
+
+    statement = _upsert_statement(db.get_bind().dialect.name, titles)
+    if statement is not None and has_course_key(db.connection()):
+        db.execute(statement)
+        return
+
+    # Other databases have no portable upsert and an unmigrated table has no conflict target, so update the
+    # existing rows and insert the rest
+    existing = {(instance.subject, instance.code): instance for instance in db.query(database_models.Courses)
+                .filter(tuple_(database_models.Courses.subject, database_models.Courses.code).in_(list(titles))).all()}
+    for key, title in titles.items():
+        if key in existing:
+            existing[key].title = title
+        else:
+            db.add(database_models.Courses(subject=key[0], code=key[1], title=title))
+
+def add_total_used_counts(db: Session, count: int):
+    """
+    Atomically adds to the total used counts with a single `UPDATE ... SET value = value + count`.
+
+    Args:
+        db (Session): The database session.
+        count (int): The number of generated transcripts to add.
+    """
+    result = db.execute(update(database_models.History)
+                        .where(database_models.History.name == TOTAL_USED_COUNTS)
+                        .values(value=database_models.History.value + count))
+    if result.rowcount == 0:
+        # Add the row on first use. If another process added it meanwhile, add to that row instead.
+        db.add(database_models.History(name=TOTAL_USED_COUNTS, value=count))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            add_total_used_counts(db, count)
+        return
 
     db.commit()
+
+def increment_total_requests(db: Session):
+    add_total_used_counts(db, 1)
+
+# Async equivalents of the functions above, for use with an AsyncSession on the event loop
+
+async def get_total_used_counts_async(db: "AsyncSession") -> float:
+    value = await db.scalar(select(database_models.History.value)
+                            .where(database_models.History.name == TOTAL_USED_COUNTS))
+    return float(value) if value is not None else 0
+
+async def get_course_title_async(db: "AsyncSession", subject: str, code: str) -> str:
+    titles = await get_course_titles_async(db, [(subject, code)])
+    return titles.get((subject, code), "")
+
+async def get_course_titles_async(db: "AsyncSession", courses: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], str]:
+    """
+    Same as `get_course_titles`, without blocking the event loop on the database or UBCGrades.
+    """
+    with span("get_course_title", source="cache"):
+        titles, uncached = course_title_cache.get_many(set(courses))
+    COURSE_TITLE_LOOKUPS.inc(len(titles), source="cache")
+    if not uncached:
+        return titles
+
+    with span("get_course_title", source="index"):
+        indexed, uncached = course_catalog_index.get_many(uncached)
+    COURSE_TITLE_LOOKUPS.inc(len(indexed), source="index")
+    titles.update(indexed)
+    if not uncached:
+        return titles
+
+    with span("get_course_title", source="db"):
+        model = database_models.Courses
+        rows = await db.execute(select(model.subject, model.code, model.title)
+                                .where(tuple_(model.subject, model.code).in_(uncached)))
+        stored = {(subject, code): title for subject, code, title in rows if title is not None}
+    COURSE_TITLE_LOOKUPS.inc(len(stored), source="db")
+    course_title_cache.put_many(stored)
+    titles.update(stored)
+
+    missing = [key for key in uncached if key not in titles]
+    if missing:
+        with span("get_course_title", source="api"):
+            fetched = await fetch_course_titles_async(missing)
+            fetched = {key: title for key, title in fetched.items() if title is not None}
+            if fetched:
+                await upsert_course_titles_async(db, fetched)
+                await db.commit()
+        COURSE_TITLE_LOOKUPS.inc(len(fetched), source="api")
+        COURSE_TITLE_LOOKUPS.inc(len(missing) - len(fetched), source="missing")
+        course_title_cache.put_many(fetched)
+        titles.update(fetched)
+
+    return titles
+
+async def upsert_course_titles_async(db: "AsyncSession", titles: Dict[Tuple[str, str], str]):
+    if not titles:
+        return
+
+    statement = _upsert_statement(db.get_bind().dialect.name, titles)
+    if statement is not None and await db.run_sync(lambda session: has_course_key(session.connection())):
+        await db.execute(statement)
+        return
+
+    model = database_models.Courses
+    rows = await db.execute(select(model).where(tuple_(model.subject, model.code).in_(list(titles))))
+    existing = {(instance.subject, instance.code): instance for instance in rows.scalars()}
+    for key, title in titles.items():
+        if key in existing:
+            existing[key].title = title
+        else:
+            db.add(database_models.Courses(subject=key[0], code=key[1], title=title))
+
+async def add_total_used_counts_async(db: "AsyncSession", count: int):
+    result = await db.execute(update(database_models.History)
+                              .where(database_models.History.name == TOTAL_USED_COUNTS)
+                              .values(value=database_models.History.value + count))
+    if result.rowcount == 0:
+        db.add(database_models.History(name=TOTAL_USED_COUNTS, value=count))
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            await add_total_used_counts_async(db, count)
+        return
+
+    await db.commit()
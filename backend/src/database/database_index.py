@@ -0,0 +1,253 @@
+import os
+import mmap
+import time
+import struct
+import logging
+import tempfile
+import threading
+from array import array
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+from src.utilities.file_utilities import make_private_directory
+from . import database_models
+
+load_dotenv()
+
+# An empty value disables the index, course titles are then cached per process instead. The index is only
+# used if its directory is private to the server's user, so other users cannot plant or swap the file.
+COURSE_INDEX_PATH = os.getenv("COURSE_INDEX_PATH", os.path.join(tempfile.gettempdir(), "course-catalog", "courses.index"))
+# How often a process checks whether the index file was replaced
+COURSE_INDEX_CHECK_INTERVAL = float(os.getenv("COURSE_INDEX_CHECK_INTERVAL", 5))
+
+CourseKey = Tuple[str, str]
+
+# Magic, format version and number of courses
+_HEADER = struct.Struct("<4sII")
+_MAGIC = b"CRSX"
+_VERSION = 1
+# One entry of the offset arrays, in the native layout of array("I")
+_OFFSET = struct.Struct("I")
+
+def _encode_key(subject: str, code: str) -> bytes:
+    return f"{subject}\x00{code}".encode()
+
+class _Mapping(NamedTuple):
+    # The open index file and what identifies it on disk
+    mm: mmap.mmap
+    identity: Tuple[int, int, int]
+    count: int
+    key_offsets: memoryview
+    title_offsets: memoryview
+    keys_start: int
+    titles_start: int
+
+class CourseCatalogIndex:
+    """
+    A read-only course catalog in a memory-mapped file, shared by every process of the server.
+
+    The file holds the courses sorted by their encoded (subject, code) key: a header, the offsets of the
+    keys and of the titles as two arrays of unsigned 32-bit integers, then the keys and the titles back to
+    back. A lookup is a binary search over the keys read straight from the mapping. The operating system
+    keeps one copy of the file in its page cache for all processes, so the catalog costs no memory per
+    worker and needs no warm-up.
+
+    `build` writes a new file next to the old one and swaps it in with `os.replace`. Processes notice the
+    new file within `check_interval` seconds and map it, while lookups still in progress finish on the old
+    mapping.
+
+    The file uses the machine's native byte order and is meant to be built on the machine that reads it.
+
+    Attributes:
+        path (str): The path of the index file, or an empty string to disable the index.
+        check_interval (float): The number of seconds between checks for a replaced index file.
+    """
+    def __init__(self, path: str = COURSE_INDEX_PATH, check_interval: float = COURSE_INDEX_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._mapping: Optional[_Mapping] = None
+        self._private: Optional[bool] = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        mapping = self._current()
+        return mapping.count if mapping is not None else 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def _usable(self) -> bool:
+        # The directory is created, or checked, on first use rather than on import
+        if not self.path:
+            return False
+        if self._private is None:
+            self._private = make_private_directory(os.path.dirname(os.path.abspath(self.path)))
+        return self._private
+
+    def _open(self) -> Optional[_Mapping]:
+        try:
+            with open(self.path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                if stat.st_size < _HEADER.size:
+                    return None
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+
+        magic, version, count = _HEADER.unpack_from(mm)
+        offsets_size = (count + 1) * 4
+        if magic != _MAGIC or version != _VERSION:
+            mm.close()
+            logging.error(f"Ignoring course catalog index with an unknown format. Path: {self.path}")
+            return None
+        keys_start = _HEADER.size + 2 * offsets_size
+        # The last offset of each array is the total length of the keys and of the titles
+        if stat.st_size < keys_start or stat.st_size < keys_start \
+                + _OFFSET.unpack_from(mm, _HEADER.size + count * 4)[0] \
+                + _OFFSET.unpack_from(mm, _HEADER.size + offsets_size + count * 4)[0]:
+            mm.close()
+            logging.error(f"Ignoring truncated course catalog index. Path: {self.path}")
+            return None
+
+        view = memoryview(mm)
+        key_offsets = view[_HEADER.size:_HEADER.size + offsets_size].cast("I")
+        title_offsets = view[_HEADER.size + offsets_size:_HEADER.size + 2 * offsets_size].cast("I")
+        return _Mapping(mm, (stat.st_ino, stat.st_mtime_ns, stat.st_size), count, key_offsets, title_offsets,
+                        keys_start, keys_start + key_offsets[count])
+
+    def _current(self) -> Optional[_Mapping]:
+        if not self._usable():
+            return None
+
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return self._mapping
+
+        with self._lock:
+            if now - self._checked_at >= self.check_interval:
+                self._checked_at = now
+                try:
+                    stat = os.stat(self.path)
+                    identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+                except FileNotFoundError:
+                    identity = None
+                if identity is None:
+                    self._mapping = None
+                elif self._mapping is None or self._mapping.identity != identity:
+                    # The old mapping is closed once the lookups still using it are done with it
+                    self._mapping = self._open()
+            return self._mapping
+
+    @staticmethod
+    def _search(mapping: _Mapping, key: bytes) -> Optional[str]:
+        mm, key_offsets, keys_start = mapping.mm, mapping.key_offsets, mapping.keys_start
+        low, high = 0, mapping.count
+        while low < high:
+            middle = (low + high) // 2
+            if mm[keys_start + key_offsets[middle]:keys_start + key_offsets[middle + 1]] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low == mapping.count or mm[keys_start + key_offsets[low]:keys_start + key_offsets[low + 1]] != key:
+            return None
+        titles_start, title_offsets = mapping.titles_start, mapping.title_offsets
+        return mm[titles_start + title_offsets[low]:titles_start + title_offsets[low + 1]].decode()
+
+    def get(self, subject: str, code: str) -> Optional[str]:
+        mapping = self._current()
+        title = self._search(mapping, _encode_key(subject, code)) if mapping is not None else None
+        if title is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return title
+
+    def get_many(self, keys: Iterable[CourseKey]) -> Tuple[Dict[CourseKey, str], List[CourseKey]]:
+        """
+        Looks up several courses at once.
+
+        Args:
+            keys (Iterable[Tuple[str, str]]): The (subject, code) pairs to look up.
+
+        Returns:
+            Tuple[Dict[Tuple[str, str], str], List[Tuple[str, str]]]: The indexed titles and the keys that were not indexed.
+        """
+        mapping = self._current()
+        if mapping is None:
+            keys = list(keys)
+            self.misses += len(keys)
+            return {}, keys
+
+        found = {}
+        missing = []
+        for key in keys:
+            title = self._search(mapping, _encode_key(*key))
+            if title is None:
+                missing.append(key)
+            else:
+                found[key] = title
+        self.hits += len(found)
+        self.misses += len(missing)
+        return found, missing
+
+    def build(self, db: Session) -> Optional[int]:
+        """
+        Writes every course title of the courses table to a new index file and swaps it in.
+
+        Args:
+            db (Session): The database session.
+
+        Returns:
+            int: The number of indexed courses, or None if the index is disabled, its directory is not
+                private or it could not be written.
+        """
+        if not self._usable():
+            return None
+
+        rows = db.query(database_models.Courses.subject, database_models.Courses.code, database_models.Courses.title) \
+            .filter(database_models.Courses.title.isnot(None)).all()
+        entries = sorted({_encode_key(subject, code): title.encode() for subject, code, title in rows}.items())
+
+        key_offsets, title_offsets = array("I", [0]), array("I", [0])
+        for key, title in entries:
+            key_offsets.append(key_offsets[-1] + len(key))
+            title_offsets.append(title_offsets[-1] + len(title))
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            # Written to a temporary file first so other processes never map a partial index
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(_HEADER.pack(_MAGIC, _VERSION, len(entries)))
+                    f.write(key_offsets.tobytes())
+                    f.write(title_offsets.tobytes())
+                    f.write(b"".join(key for key, _ in entries))
+                    f.write(b"".join(title for _, title in entries))
+                os.replace(temp_path, self.path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+        except OSError:
+            logging.exception(f"Failed to write course catalog index. Path: {self.path}")
+            return None
+
+        with self._lock:
+            self._mapping = self._open()
+            self._checked_at = time.monotonic()
+        logging.info(f"Built course catalog index with {len(entries)} courses. Path: {self.path}")
+        return len(entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+course_catalog_index = CourseCatalogIndex()
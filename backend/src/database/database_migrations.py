@@ -0,0 +1,104 @@
+import logging
+from typing import Dict, List, Tuple
+from sqlalchemy import Index, delete, inspect, select
+from sqlalchemy.engine import Connection, Engine, URL
+from . import database_models
+
+COURSE_KEY_COLUMNS = {"subject", "code"}
+COURSE_KEY_INDEX = "uq_courses_subject_code"
+DELETE_BATCH_SIZE = 500
+
+# Whether the courses table of each database has its unique (subject, code) key
+_course_key_ready: Dict[Tuple, bool] = {}
+
+def _database_key(url: URL) -> Tuple:
+    # The sync and async engines of one database differ only in their driver
+    return url.get_backend_name(), url.host, url.port, url.database
+
+def _find_course_key(connection: Connection) -> bool:
+    inspector = inspect(connection)
+    if not inspector.has_table(database_models.Courses.__tablename__):
+        return False
+
+    table = database_models.Courses.__tablename__
+    return any(set(constraint["column_names"]) == COURSE_KEY_COLUMNS
+               for constraint in inspector.get_unique_constraints(table)) \
+        or any(index["unique"] and set(index["column_names"]) == COURSE_KEY_COLUMNS
+               for index in inspector.get_indexes(table))
+
+def has_course_key(connection: Connection) -> bool:
+    """
+    Returns whether the courses table has the unique (subject, code) key that course title upserts conflict on.
+
+    Tables created before the key was added do not have it until `migrate_schema` has run. The answer is
+    looked up once per database.
+
+    Args:
+        connection (Connection): A connection to the database.
+
+    Returns:
+        bool: Whether `INSERT ... ON CONFLICT (subject, code)` can be used.
+    """
+    key = _database_key(connection.engine.url)
+    ready = _course_key_ready.get(key)
+    if ready is None:
+        ready = _course_key_ready[key] = _find_course_key(connection)
+    return ready
+
+def _duplicate_course_ids(connection: Connection) -> List[int]:
+    # Of the rows of each course, the first one with a title is kept
+    courses = database_models.Courses
+    kept: Dict[Tuple[str, str], Tuple[int, str]] = {}
+    duplicates = []
+    for id, subject, code, title in connection.execute(
+            select(courses.id, courses.subject, courses.code, courses.title).order_by(courses.id)):
+        if subject is None or code is None:
+            continue
+        previous = kept.get((subject, code))
+        if previous is None:
+            kept[(subject, code)] = (id, title)
+        elif previous[1] is None and title is not None:
+            duplicates.append(previous[0])
+            kept[(subject, code)] = (id, title)
+        else:
+            duplicates.append(id)
+    return duplicates
+
+def add_course_key(engine: Engine) -> int:
+    """
+    Adds the unique (subject, code) key to a courses table that was created without it.
+
+    Duplicate rows of a course are deleted first, keeping its first row that has a title. Does nothing if
+    the table already has the key.
+
+    Args:
+        engine (Engine): The database engine.
+
+    Returns:
+        int: The number of duplicate rows deleted.
+    """
+    with engine.begin() as connection:
+        if _find_course_key(connection):
+            _course_key_ready[_database_key(engine.url)] = True
+            return 0
+
+        duplicates = _duplicate_course_ids(connection)
+        for start in range(0, len(duplicates), DELETE_BATCH_SIZE):
+            connection.execute(delete(database_models.Courses)
+                               .where(database_models.Courses.id.in_(duplicates[start:start + DELETE_BATCH_SIZE])))
+        Index(COURSE_KEY_INDEX, database_models.Courses.subject, database_models.Courses.code, unique=True) \
+            .create(connection)
+
+    _course_key_ready[_database_key(engine.url)] = True
+    logging.info(f"Added unique key to the courses table. Duplicate rows deleted: {len(duplicates)}")
+    return len(duplicates)
+
+def migrate_schema(engine: Engine):
+    """
+    Creates the missing tables and brings the existing ones up to date with the models.
+
+    Args:
+        engine (Engine): The database engine.
+    """
+    database_models.Base.metadata.create_all(bind=engine)
+    add_course_key(engine)
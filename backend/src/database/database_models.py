@@ -1,8 +1,12 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Float, Integer, LargeBinary, String, Text, UniqueConstraint
 from .database import Base
 
 class Courses(Base):
     __tablename__ = "courses"
+    __table_args__ = (
+        # Also serves as the index of the (subject, code) lookups and the conflict target of upserts
+        UniqueConstraint("subject", "code", name="uq_courses_subject_code"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     subject = Column(String)
@@ -16,6 +20,25 @@ class History(Base):
     name = Column(String, unique=True, index=True)
     value = Column(Integer)
 
+class Jobs(Base):
+    # Kept in the database, so every server worker can answer a poll for a job another worker accepted
+    __tablename__ = "jobs"
+
+    id = Column(String(32), primary_key=True)
+    status = Column(String(16), nullable=False)
+    created_at = Column(Float, nullable=False)
+    finished_at = Column(Float, index=True)
+    filename = Column(String)
+    error = Column(String)
+    pdf = Column(LargeBinary)
+
+class Profiles(Base):
+    __tablename__ = "profiles"
+
+    id = Column(String(32), primary_key=True)
+    created_at = Column(Float, nullable=False, index=True)
+    profile = Column(Text, nullable=False)
+
 
 
 
@@ -0,0 +1,84 @@
+import time
+import uuid
+from typing import TYPE_CHECKING, Optional
+from sqlalchemy import delete, select, update
+from sqlalchemy.engine import Row
+from src.utilities.metrics_utilities import METRICS_PROFILE_MAX_STORED
+from . import database_models
+from .database import AsyncSessionLocal
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+# The columns of a job without its PDF, which is only loaded to download it
+_JOB_COLUMNS = (database_models.Jobs.id, database_models.Jobs.status, database_models.Jobs.created_at,
+                database_models.Jobs.finished_at, database_models.Jobs.filename, database_models.Jobs.error)
+
+async def insert_job(db: "AsyncSession", job_id: str, status: str, created_at: float):
+    db.add(database_models.Jobs(id=job_id, status=status, created_at=created_at))
+
+async def update_job(db: "AsyncSession", job_id: str, **values):
+    await db.execute(update(database_models.Jobs).where(database_models.Jobs.id == job_id).values(**values))
+
+async def get_job(db: "AsyncSession", job_id: str, with_pdf: bool = False) -> Optional[Row]:
+    """
+    Looks up a job by its ID.
+
+    Args:
+        db (AsyncSession): The database session.
+        job_id (str): The job ID.
+        with_pdf (bool): Whether to load the generated PDF too.
+
+    Returns:
+        Optional[Row]: The job's columns, or None if it does not exist.
+    """
+    columns = _JOB_COLUMNS + (database_models.Jobs.pdf,) if with_pdf else _JOB_COLUMNS
+    return (await db.execute(select(*columns).where(database_models.Jobs.id == job_id))).first()
+
+async def delete_finished_jobs(db: "AsyncSession", finished_before: float, keep: int) -> int:
+    """
+    Deletes the jobs that finished before `finished_before`, then the oldest finished jobs beyond `keep`.
+
+    Returns:
+        int: The number of jobs deleted.
+    """
+    jobs = database_models.Jobs
+    deleted = (await db.execute(delete(jobs).where(jobs.finished_at <= finished_before))).rowcount
+    oldest_kept = (await db.execute(select(jobs.finished_at).where(jobs.finished_at.isnot(None))
+                                    .order_by(jobs.finished_at.desc()).offset(keep).limit(1))).scalar()
+    if oldest_kept is not None:
+        deleted += (await db.execute(delete(jobs).where(jobs.finished_at <= oldest_kept))).rowcount
+    return deleted
+
+class ProfileStore:
+    """
+    Keeps the most recent request profiles in the database so they can be downloaded after the request.
+
+    The profile of a request is stored by the server worker that served it, and any worker can serve its
+    download.
+
+    Attributes:
+        max_size (int): The number of profiles kept.
+    """
+    def __init__(self, max_size: int = METRICS_PROFILE_MAX_STORED):
+        self.max_size = max_size
+
+    async def put(self, profile: str) -> str:
+        profile_id = uuid.uuid4().hex
+        profiles = database_models.Profiles
+        async with AsyncSessionLocal() as db:
+            db.add(profiles(id=profile_id, created_at=time.time(), profile=profile))
+            await db.flush()
+            oldest_kept = (await db.execute(select(profiles.created_at).order_by(profiles.created_at.desc())
+                                            .offset(self.max_size).limit(1))).scalar()
+            if oldest_kept is not None:
+                await db.execute(delete(profiles).where(profiles.created_at <= oldest_kept))
+            await db.commit()
+        return profile_id
+
+    async def get(self, profile_id: str) -> Optional[str]:
+        async with AsyncSessionLocal() as db:
+            return (await db.execute(select(database_models.Profiles.profile)
+                                     .where(database_models.Profiles.id == profile_id))).scalar()
+
+profile_store = ProfileStore()
@@ -1,17 +1,32 @@
 import os
 import sys
 import logging
+from contextlib import asynccontextmanager
+from typing import List, Optional
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import Depends, FastAPI, File, UploadFile, BackgroundTasks
-from fastapi.responses import JSONResponse, FileResponse
-from sqlalchemy.orm import Session
-from src.utilities.transcript_utilities import Transcript, TranscriptParser
-from src.database.database import engine, SessionLocal
-from src.database import database_models, database_crud
-from src.utilities.pdf_utilities import PdfUtilities
-
-app = FastAPI()
+from fastapi import FastAPI, File, Header, Query, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from src.database.database import engine, SessionLocal, dispose_async_engine
+from src.database.database_cache import course_title_cache
+from src.database.database_catalog import preload_catalog
+from src.database.database_counter import usage_counter
+from src.database.database_index import course_catalog_index
+from src.database.database_migrations import migrate_schema
+from src.database.database_results import profile_store
+from src.utilities.api_utilities import ubc_grades_client
+from src.utilities.batch_utilities import (BatchAdmission, BatchInputError, BatchItem, TranscriptBatch,
+                                           TranscriptBatchResponse, create_batch_executor, read_zip_items,
+                                           BATCH_MAX_FILES, BATCH_MAX_UPLOAD_SIZE)
+from src.utilities.cache_utilities import rendered_pdf_cache
+from src.utilities.export_utilities import OUTPUT_FORMATS, iter_transcript_output, negotiate_output_format
+from src.utilities.history_utilities import transcript_history
+from src.utilities.job_utilities import TranscriptJobQueue, JobStatus
+from src.utilities.metrics_utilities import registry, METRICS_PROFILING_ENABLED
+from src.utilities.pdf_utilities import PdfUtilities, UploadTooLargeError, MAX_UPLOAD_SIZE
+from src.utilities.pipeline_utilities import TranscriptPipelineExecutor, QueueFullError
+from src.utilities.render_utilities import transcript_renderer
+from src.utilities.request_utilities import MULTIPART_OVERHEAD, RequestSizeLimitMiddleware, RequestTooLargeError
 
 # Logger
 logging.basicConfig(encoding='utf-8',
@@ -21,12 +36,76 @@ logging.basicConfig(encoding='utf-8',
                         logging.FileHandler("app.log"),
                         logging.StreamHandler(sys.stdout)
                     ])
-logging.info("Server started")
 
 load_dotenv()
 
 OFFICIAL_TRANSCRIPT_FEE = float(os.getenv("OFFICIAL_TRANSCRIPT_FEE"))
 
+pipeline_executor = TranscriptPipelineExecutor()
+# Created at startup, since a process pool must not be shared by pre-forked workers
+batch_executor = None
+job_queue = TranscriptJobQueue(pipeline_executor)
+batch_admission = BatchAdmission()
+
+SERVICE_STATE = registry.gauge("transcript_service_state", "Queue depths and cache sizes of the service.", ["name"])
+
+# Set once warm_up() has run. Pre-forked workers inherit it and skip what their parent already did.
+_warmed_up = False
+
+def warm_up():
+    """
+    Runs the part of startup that is safe to run before forking workers.
+
+    Creates or migrates the schema, imports the course catalog, builds the shared course catalog index (or warms the
+    course title cache when the index is disabled), imports the PDF extractor and, when rendering
+    in-process, builds the PDF renderer. No threads or processes are started and no database connection is
+    left open, so forked workers inherit the warmed state without sharing anything they must not.
+    """
+    global _warmed_up
+    if _warmed_up:
+        return
+
+    migrate_schema(engine)
+    db = SessionLocal()
+    try:
+        preload_catalog(db)
+        if course_catalog_index.build(db) is None:
+            course_title_cache.warm(db)
+    finally:
+        db.close()
+
+    PdfUtilities.preload()
+    if transcript_renderer.processes == 0:
+        transcript_renderer.start()
+
+    engine.dispose()
+    _warmed_up = True
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global batch_executor
+    warm_up()
+    # Starts the render processes. An in-process renderer was already built by warm_up()
+    transcript_renderer.start()
+    pipeline_executor.start()
+    batch_executor = create_batch_executor()
+    usage_counter.start()
+    job_queue.start()
+    logging.info("Server started")
+
+    yield
+
+    await job_queue.shutdown()
+    await dispose_async_engine()
+    pipeline_executor.shutdown()
+    batch_executor.shutdown()
+    PdfUtilities.shutdown()
+    transcript_renderer.shutdown()
+    ubc_grades_client.close()
+    usage_counter.shutdown()
+
+app = FastAPI(lifespan=lifespan)
+
 origins = [
     "http://localhost:3000",
     "http://localhost:8000",
@@ -40,7 +119,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-database_models.Base.metadata.create_all(bind=engine)
+app.add_middleware(
+    RequestSizeLimitMiddleware,
+    limits={
+        "/generate-unofficial-transcript": MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD,
+        "/generate-unofficial-transcripts": BATCH_MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD,
+    },
+    default_limit=MULTIPART_OVERHEAD,
+)
+
+@app.exception_handler(RequestTooLargeError)
+async def handle_request_too_large(request, e: RequestTooLargeError):
+    return JSONResponse(content={"error": f"Request is larger than {e.max_size} bytes"}, status_code=413)
 
 def get_db():
     db = SessionLocal()
@@ -50,25 +140,147 @@ def get_db():
         db.close()
 
 @app.get("/total-student-money-saved")
-def get_total_student_money_saved(db: Session = Depends(get_db)):
-    total_student_money_saved =  database_crud.get_total_used_counts(db) * OFFICIAL_TRANSCRIPT_FEE
+async def get_total_student_money_saved():
+    total_student_money_saved = await usage_counter.get_total_async() * OFFICIAL_TRANSCRIPT_FEE
     logging.info(f"Returning total student money saved. Value: {total_student_money_saved}")
     return total_student_money_saved
 
+@app.get("/pipeline-status")
+def get_pipeline_status():
+    return {**pipeline_executor.stats(), "course_title_cache": course_title_cache.stats(),
+            "course_catalog_index": course_catalog_index.stats(), "rendered_pdf_cache": rendered_pdf_cache.stats(),
+            "renderer": transcript_renderer.stats(),
+            "jobs": job_queue.stats(), "batches": batch_admission.stats(), "usage_counter": usage_counter.stats(),
+            "transcript_history": transcript_history.stats()}
+
+@app.get("/metrics")
+def get_metrics():
+    # Point-in-time values are copied into gauges when scraped
+    pipeline_stats = pipeline_executor.stats()
+    SERVICE_STATE.set(pipeline_stats["in_flight"], name="pipeline_in_flight")
+    SERVICE_STATE.set(pipeline_stats["queue_depth"], name="pipeline_queue_depth")
+    SERVICE_STATE.set(job_queue.pending, name="jobs_pending")
+    SERVICE_STATE.set(len(course_title_cache), name="course_title_cache_size")
+    SERVICE_STATE.set(len(course_catalog_index), name="course_catalog_index_entries")
+    SERVICE_STATE.set(rendered_pdf_cache.stats()["memory_entries"], name="rendered_pdf_cache_entries")
+    SERVICE_STATE.set(usage_counter.stats()["pending"], name="usage_counter_pending")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/generate-unofficial-transcript")
-async def generate_unofficial_transcript(background_tasks: BackgroundTasks, db: Session = Depends(get_db), file: UploadFile = File(...)):
+async def generate_unofficial_transcript(file: UploadFile = File(...), mode: str = Query("sync", regex="^(sync|async)$"),
+                                        profile: bool = False,
+                                        output_format: Optional[str] = Query(None, alias="format",
+                                                                             regex=f"^({'|'.join(OUTPUT_FORMATS)})$"),
+                                        accept: Optional[str] = Header(None)):
     if not file.filename.lower().endswith(".pdf"):
         return JSONResponse(content={"error": "File is not a PDF"}, status_code=400)
+    if profile and (not METRICS_PROFILING_ENABLED or mode == "async"):
+        return JSONResponse(content={"error": "Profiling is disabled or not supported in async mode"}, status_code=400)
+
+    # The format query parameter takes precedence over the Accept header
+    output_format = output_format or negotiate_output_format(accept)
+    if output_format is None:
+        return JSONResponse(content={"error": f"Acceptable formats: {', '.join(output.media_type for output in OUTPUT_FORMATS.values())}"},
+                            status_code=406)
+    output = OUTPUT_FORMATS[output_format]
+    if mode == "async" and not output.rendered:
+        return JSONResponse(content={"error": "Async mode only generates PDFs"}, status_code=400)
+
+    try:
+        data = await PdfUtilities.read_upload(file)
+    except UploadTooLargeError as e:
+        return JSONResponse(content={"error": f"File is larger than {e.max_size} bytes"}, status_code=413)
+
+    if mode == "async":
+        try:
+            job = await job_queue.submit(data)
+        except QueueFullError as e:
+            return JSONResponse(content={"error": "Server is busy. Please try again later."}, status_code=503,
+                                headers={"Retry-After": str(e.retry_after)})
+        return JSONResponse(content=job.to_dict(), status_code=202, headers={"Location": f"/jobs/{job.id}"})
+
+    try:
+        result = await pipeline_executor.run(data, profile=profile, output_format=output_format)
+    except QueueFullError as e:
+        return JSONResponse(content={"error": "Server is busy. Please try again later."}, status_code=503,
+                            headers={"Retry-After": str(e.retry_after)})
+
+    headers = {"Content-Disposition": f"attachment; filename={result.filename}", "Vary": "Accept"}
+    if result.profile is not None:
+        headers["X-Profile-Id"] = await profile_store.put(result.profile)
+
+    if result.transcript is not None:
+        # Built and sent as it is iterated, a session at a time, without ever holding the whole document
+        return StreamingResponse(iter_transcript_output(result.transcript, output_format), media_type=output.media_type,
+                                 headers=headers)
+
+    # Response sets Content-Length from the body
+    return Response(content=result.pdf, media_type=output.media_type, headers=headers)
+
+@app.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str):
+    profile = await profile_store.get(profile_id)
+    if profile is None:
+        return JSONResponse(content={"error": "Profile does not exist or has expired"}, status_code=404)
+    return PlainTextResponse(profile)
 
-    pages = await PdfUtilities.extract_text_from_pdf(file)
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await job_queue.get(job_id)
+    if job is None:
+        return JSONResponse(content={"error": "Job does not exist or has expired"}, status_code=404)
 
-    transcript = TranscriptParser(db, pages).parse()
+    content = job.to_dict()
+    if job.status == JobStatus.DONE:
+        content["result_url"] = f"/jobs/{job.id}/result"
+    return content
 
-    file_path = transcript.generate_transcript_pdf()
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    job = await job_queue.get(job_id, with_pdf=True)
+    if job is None:
+        return JSONResponse(content={"error": "Job does not exist or has expired"}, status_code=404)
+    if job.status == JobStatus.FAILED:
+        return JSONResponse(content={"error": job.error}, status_code=500)
+    if job.status != JobStatus.DONE:
+        return JSONResponse(content=job.to_dict(), status_code=409, headers={"Retry-After": "1"})
 
-    response = FileResponse(file_path, headers={"Content-Disposition": f"attachment; filename={transcript.student_given_name}_{transcript.student_surname}_{transcript.student_number}_transcript.pdf"})
-    background_tasks.add_task(PdfUtilities.delete_file, file_path)
+    return Response(content=job.pdf, media_type="application/pdf",
+                    headers={"Content-Disposition": f"attachment; filename={job.filename}"})
+
+@app.post("/generate-unofficial-transcripts")
+async def generate_unofficial_transcripts(files: List[UploadFile] = File(...)):
+    items = []
+    for file in files:
+        filename = file.filename.lower()
+        if filename.endswith(".zip"):
+            try:
+                data = await PdfUtilities.read_upload(file, max_size=BATCH_MAX_UPLOAD_SIZE)
+                # The files of every zip in the request share one size limit
+                items += read_zip_items(data,
+                                        max_total_size=BATCH_MAX_UPLOAD_SIZE - sum(len(item.data) for item in items))
+            except UploadTooLargeError as e:
+                return JSONResponse(content={"error": f"File is larger than {e.max_size} bytes"}, status_code=413)
+            except BatchInputError as e:
+                return JSONResponse(content={"error": str(e)}, status_code=400)
+        elif filename.endswith(".pdf"):
+            try:
+                items.append(BatchItem(file.filename, await PdfUtilities.read_upload(file)))
+            except UploadTooLargeError:
+                # Reported as a failure in the manifest
+                items.append(BatchItem(file.filename, b""))
+        else:
+            return JSONResponse(content={"error": f"File is not a PDF or a zip: {file.filename}"}, status_code=400)
+
+    if len(items) > BATCH_MAX_FILES:
+        return JSONResponse(content={"error": f"Batch has {len(items)} PDF files, the limit is {BATCH_MAX_FILES}"},
+                            status_code=400)
+
+    try:
+        batch_admission.admit()
+    except QueueFullError as e:
+        return JSONResponse(content={"error": "Server is busy. Please try again later."}, status_code=503,
+                            headers={"Retry-After": str(e.retry_after)})
 
-    database_crud.increment_total_requests(db)
-    
-    return response
+    batch = TranscriptBatch(items, batch_executor, admission=batch_admission)
+    return TranscriptBatchResponse(batch, headers={"Content-Disposition": "attachment; filename=transcripts.zip"})
@@ -1,14 +1,303 @@
+import os
+import time
+import random
+import asyncio
 import logging
-import requests
-from typing import Dict
+import threading
+import httpx
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from .metrics_utilities import span
+from .singleflight_utilities import AsyncSingleFlight
 
-UBC_GRADES_URL = "https://ubcgrades.com/api"
+load_dotenv()
+
+# Can be pointed at a local stub server for offline testing
+UBC_GRADES_URL = os.getenv("UBC_GRADES_URL", "https://ubcgrades.com/api")
 UBC_GRADES_VERSION = "v3"
 GRADES = "grades"
 COURSE_STAT = "course-statistics"
+COURSES = "courses"
 UBC_CAMPUS = "UBCV"
+UBC_GRADES_MAX_CONCURRENCY = int(os.getenv("UBC_GRADES_MAX_CONCURRENCY", 8))
+UBC_GRADES_TIMEOUT = float(os.getenv("UBC_GRADES_TIMEOUT", 5))
+UBC_GRADES_RETRIES = int(os.getenv("UBC_GRADES_RETRIES", 2))
+UBC_GRADES_BACKOFF = float(os.getenv("UBC_GRADES_BACKOFF", 0.2))
+UBC_GRADES_BREAKER_THRESHOLD = int(os.getenv("UBC_GRADES_BREAKER_THRESHOLD", 5))
+UBC_GRADES_BREAKER_COOLDOWN = float(os.getenv("UBC_GRADES_BREAKER_COOLDOWN", 30))
+UBC_GRADES_NEGATIVE_TTL = float(os.getenv("UBC_GRADES_NEGATIVE_TTL", 60 * 60))
+UBC_GRADES_NEGATIVE_CACHE_SIZE = int(os.getenv("UBC_GRADES_NEGATIVE_CACHE_SIZE", 10000))
+
+class CircuitBreaker:
+    """
+    Stops calls to a failing service for a cooldown period.
+
+    After `threshold` consecutive failures the breaker opens and `allow()` returns False until
+    `cooldown` seconds have passed. Then a single trial call is let through. A success closes the
+    breaker again and a failure re-opens it.
+
+    Attributes:
+        threshold (int): The number of consecutive failures that opens the breaker.
+        cooldown (float): The number of seconds the breaker stays open.
+    """
+    def __init__(self, threshold: int = UBC_GRADES_BREAKER_THRESHOLD, cooldown: float = UBC_GRADES_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        if self._opened_at is None:
+            return True
+        if self._trial_in_flight or time.monotonic() - self._opened_at < self.cooldown:
+            return False
+        self._trial_in_flight = True
+        return True
+
+    def end_trial(self):
+        """
+        Lets the next trial call through once the current one has ended, whether or not it recorded a result.
+        """
+        self._trial_in_flight = False
 
-def fetch_course_title(subject: str, code: str) -> str:
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self._failures += 1
+        self._trial_in_flight = False
+        if self._opened_at is not None or self._failures >= self.threshold:
+            if self._opened_at is None:
+                logging.error(f"UBCGrades circuit breaker opened after {self._failures} failures")
+            self._opened_at = time.monotonic()
+
+class UBCGradesClient:
+    """
+    An asynchronous, pooled client for the UBCGrades API.
+
+    Requests share one connection pool, are limited to `max_concurrency` at a time, time out after
+    `timeout` seconds and are retried with exponential backoff on transport errors and 5xx/429 responses.
+    A request only holds one of the `max_concurrency` slots while it is sent, not while it backs off.
+    Courses that UBCGrades does not know are remembered for `negative_ttl` seconds so they are not
+    requested again, up to `negative_cache_size` of them with the least recently used evicted first.
+    Concurrent requests for the same path, e.g. the same course on two transcripts generated at once, share
+    a single request.
+
+    The client runs its own event loop on a background thread, so the blocking helpers below can be
+    called from worker threads and processes alike.
+
+    Attributes:
+        base_url (str): The base URL of the API (e.g. 'https://ubcgrades.com/api').
+    """
+    def __init__(self, base_url: str = UBC_GRADES_URL, timeout: float = UBC_GRADES_TIMEOUT,
+                 retries: int = UBC_GRADES_RETRIES, backoff: float = UBC_GRADES_BACKOFF,
+                 max_concurrency: int = UBC_GRADES_MAX_CONCURRENCY, negative_ttl: float = UBC_GRADES_NEGATIVE_TTL,
+                 negative_cache_size: int = UBC_GRADES_NEGATIVE_CACHE_SIZE, breaker: CircuitBreaker = None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_concurrency = max_concurrency
+        self.negative_ttl = negative_ttl
+        self.negative_cache_size = negative_cache_size
+        self.breaker = breaker or CircuitBreaker()
+        # Only touched from the client's event loop thread
+        self._negative_cache: "OrderedDict[str, float]" = OrderedDict()
+        self._in_flight = AsyncSingleFlight()
+        self._client: httpx.AsyncClient = None
+        self._semaphore: asyncio.Semaphore = None
+        self._loop: asyncio.AbstractEventLoop = None
+        self._loop_pid: int = None
+        self._loop_lock = threading.Lock()
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            # A forked worker process inherits the attributes but not the loop thread
+            if self._loop is None or self._loop_pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                self._loop_pid = os.getpid()
+                self._client = None
+                self._in_flight = AsyncSingleFlight()
+                threading.Thread(target=self._loop.run_forever, name="ubcgrades-client", daemon=True).start()
+            return self._loop
+
+    def run(self, coroutine):
+        """
+        Runs a coroutine on the client's event loop and blocks until it finishes.
+        """
+        loop = self._get_loop()
+        future = asyncio.run_coroutine_threadsafe(coroutine, loop)
+        return future.result()
+
+    async def run_async(self, coroutine):
+        """
+        Runs a coroutine on the client's event loop and awaits it from another event loop.
+        """
+        loop = self._get_loop()
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, loop))
+
+    def _ensure_client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def close(self):
+        """
+        Closes the connection pool and stops the client's event loop.
+        """
+        if self._loop is None or self._loop_pid != os.getpid():
+            return
+
+        self.run(self.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
+
+    def _is_negatively_cached(self, path: str) -> bool:
+        expires_at = self._negative_cache.get(path)
+        if expires_at is None:
+            return False
+        if expires_at <= time.monotonic():
+            del self._negative_cache[path]
+            return False
+        self._negative_cache.move_to_end(path)
+        return True
+
+    def _cache_negative(self, path: str):
+        self._negative_cache[path] = time.monotonic() + self.negative_ttl
+        self._negative_cache.move_to_end(path)
+        while len(self._negative_cache) > self.negative_cache_size:
+            self._negative_cache.popitem(last=False)
+
+    async def get_json(self, path: str) -> Optional[Dict]:
+        """
+        Sends a GET request to the API.
+
+        Args:
+            path (str): The path relative to the base URL.
+
+        Returns:
+            Optional[Dict]: The decoded JSON response, or None if the resource does not exist or the request failed.
+        """
+        if self._is_negatively_cached(path):
+            return None
+
+        json_response, _ = await self._in_flight.do(path, lambda: self._get_json(path))
+        return json_response
+
+    async def _get_json(self, path: str) -> Optional[Dict]:
+        self._ensure_client()
+        url = f"{self.base_url}/{path}"
+
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                # Backs off without holding a connection slot, so a failing upstream does not block other requests
+                await asyncio.sleep(self.backoff * (2 ** (attempt - 1)) * (1 + random.random()))
+
+            if not self.breaker.allow():
+                logging.warning(f"UBCGrades circuit breaker is open. Skipped request: {url}")
+                return None
+            # An open breaker only lets its single trial call through
+            is_trial = self.breaker.is_open
+
+            try:
+                try:
+                    async with self._semaphore:
+                        response = await self._client.get(url)
+                except httpx.HTTPError as e:
+                    self.breaker.record_failure()
+                    logging.warning(f"UBCGrades request failed. Attempt: {attempt + 1} Url: {url} Error: {e!r}")
+                    continue
+
+                if response.status_code == 429 or response.status_code >= 500:
+                    self.breaker.record_failure()
+                    logging.warning(f"UBCGrades request failed. Attempt: {attempt + 1} Url: {url} Response: {response}")
+                    continue
+
+                self.breaker.record_success()
+            finally:
+                # A trial call that ended any other way, e.g. cancelled, must not keep the breaker open for good
+                if is_trial:
+                    self.breaker.end_trial()
+
+            if response.status_code == 200:
+                try:
+                    return response.json()
+                except ValueError as e:
+                    logging.error(f"UBCGrades response is not JSON. Url: {url} Error: {e!r}")
+                    return None
+
+            if response.status_code == 404:
+                self._cache_negative(path)
+            logging.error(f"UBCGrades request failed. Url: {url} Response: {response}")
+            return None
+
+        logging.error(f"UBCGrades request failed after {self.retries + 1} attempts. Url: {url}")
+        return None
+
+    async def fetch_course_title(self, subject: str, code: str) -> Optional[str]:
+        with span("fetch_course_title"):
+            json_response = await self.get_json(f"{UBC_GRADES_VERSION}/{COURSE_STAT}/{UBC_CAMPUS}/{subject}/{code}")
+        if json_response is None:
+            return None
+
+        try:
+            title = json_response["course_title"]
+        except (KeyError, TypeError):
+            logging.error(f"UBCGrades response has no course title. {subject} {code}: {json_response!r:.200}")
+            return None
+        logging.info(f"Fetched new course title. {subject} {code}: {title}")
+        return title
+
+    async def fetch_course_titles(self, courses: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Optional[str]]:
+        titles = await asyncio.gather(*(self.fetch_course_title(subject, code) for subject, code in courses))
+        return dict(zip(courses, titles))
+
+    async def fetch_subject_course_titles(self, subject: str) -> Optional[Dict[Tuple[str, str], str]]:
+        json_response = await self.get_json(f"{UBC_GRADES_VERSION}/{COURSES}/{UBC_CAMPUS}/{subject}")
+        if json_response is None:
+            return None
+
+        try:
+            return {(subject, course["course"] + (course.get("detail") or "")): course["course_title"]
+                    for course in json_response}
+        except (KeyError, TypeError, AttributeError):
+            logging.error(f"UBCGrades response has no course titles. Subject: {subject}")
+            return None
+
+    async def fetch_course_title__and_average(self, session: str, subject: str, code: str, section: str) -> Optional[Dict[str, str]]:
+        json_response = await self.get_json(f"{UBC_GRADES_VERSION}/{GRADES}/{UBC_CAMPUS}/{session}/{subject}/{code}/{section}")
+        if json_response is None:
+            return None
+
+        try:
+            return {
+                "title": json_response["course_title"],
+                "average": json_response["average"],
+            }
+        except (KeyError, TypeError):
+            logging.error(f"UBCGrades response has no course title or average. {session} {subject} {code} {section}")
+            return None
+
+ubc_grades_client = UBCGradesClient()
+
+def fetch_course_title(subject: str, code: str) -> Optional[str]:
     """
     Fetch the course title from the UBCGrades API for a given subject and course code.
 
@@ -17,25 +306,50 @@ def fetch_course_title(subject: str, code: str) -> str:
         code (str): The course code (e.g. '100' for MATH 100).
 
     Returns:
-        str: The course title (e.g. 'Differential Calculus with Applications').
+        Optional[str]: The course title (e.g. 'Differential Calculus with Applications'), or None if it could not be fetched.
 
     Raises:
         Logs an error message if the API request fails.
     """
-    
-    url = f"{UBC_GRADES_URL}/{UBC_GRADES_VERSION}/{COURSE_STAT}/{UBC_CAMPUS}/{subject}/{code}"
+    return ubc_grades_client.run(ubc_grades_client.fetch_course_title(subject, code))
 
-    response = requests.get(url=url)
+def fetch_course_titles(courses: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Optional[str]]:
+    """
+    Fetch the titles of several courses from the UBCGrades API concurrently.
 
-    if response.status_code == 200:
-        json_response = response.json()
-        title = json_response["course_title"]
-        logging.info(f"Fetched new course title. {subject} {code}: {title}")
-        return title
-    else:
-        logging.error(f"Failed fetch course title. Please check api_utilities:get_course_title. Response: {response}")
+    Args:
+        courses (List[Tuple[str, str]]): The (subject, code) pairs to fetch (e.g. [('MATH', '100')]).
+
+    Returns:
+        Dict[Tuple[str, str], Optional[str]]: The course titles keyed by (subject, code). The title is None if it could not be fetched.
+    """
+    if not courses:
+        return {}
+
+    return ubc_grades_client.run(ubc_grades_client.fetch_course_titles(courses))
+
+async def fetch_course_titles_async(courses: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Optional[str]]:
+    """
+    Same as `fetch_course_titles`, without blocking the calling event loop.
+    """
+    if not courses:
+        return {}
+
+    return await ubc_grades_client.run_async(ubc_grades_client.fetch_course_titles(courses))
+
+def fetch_subject_course_titles(subject: str) -> Optional[Dict[Tuple[str, str], str]]:
+    """
+    Fetch the titles of every course of a subject from the UBCGrades API with a single request.
+
+    Args:
+        subject (str): The subject code (e.g. 'MATH' for Mathematics).
+
+    Returns:
+        Optional[Dict[Tuple[str, str], str]]: The course titles keyed by (subject, code), or None if they could not be fetched.
+    """
+    return ubc_grades_client.run(ubc_grades_client.fetch_subject_course_titles(subject))
 
-def fetch_course_title__and_average(session: str, subject:str, code: str, section: str) -> Dict[str, str]:
+def fetch_course_title__and_average(session: str, subject:str, code: str, section: str) -> Optional[Dict[str, str]]:
     """
     Fetch course information from the UBCGrades API and return the course title and average.
 
@@ -46,7 +360,7 @@ def fetch_course_title__and_average(session: str, subject:str, code: str, sectio
         section (str): The section code for the course (e.g. '101' for Section 101).
 
     Returns:
-        dict: A dictionary containing the course title and average.
+        dict: A dictionary containing the course title and average, or None if it could not be fetched.
             {
                 "title": str,  # The course title (e.g. 'Differential Calculus with Applications').
                 "average": str,  # The average grade for the course (e.g. 69.0).
@@ -55,15 +369,4 @@ def fetch_course_title__and_average(session: str, subject:str, code: str, sectio
     Raises:
         Logs an error message if the API request fails.
     """
-    url = f"{UBC_GRADES_URL}/{UBC_GRADES_VERSION}/{GRADES}/{UBC_CAMPUS}/{session}/{subject}/{code}/{section}"
-
-    response = requests.get(url=url)
-
-    if response.status_code == 200:
-        json_response = response.json()
-        return {
-            "title": json_response["course_title"],
-            "average": json_response["average"],
-        }
-    else:
-        logging.error(f"Failed fetch course title and average. Please check api_utilities:get_course_title_and_average. Response: {response}")
+    return ubc_grades_client.run(ubc_grades_client.fetch_course_title__and_average(session, subject, code, section))
@@ -0,0 +1,336 @@
+import io
+import os
+import json
+import time
+import logging
+import zipfile
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Tuple
+from dotenv import load_dotenv
+from starlette.responses import StreamingResponse
+from src.database.database import engine, SessionLocal
+from src.database.database_counter import usage_counter
+from .cache_utilities import compute_cache_key, rendered_pdf_cache
+from .pdf_utilities import PdfUtilities, MAX_UPLOAD_SIZE
+from .pipeline_utilities import QueueFullError
+from .render_utilities import create_renderer, transcript_renderer
+from .transcript_utilities import Transcript, TranscriptParser
+
+load_dotenv()
+
+# "process" or "thread"
+BATCH_EXECUTOR = os.getenv("BATCH_EXECUTOR", "process")
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", os.cpu_count() or 1))
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", 500))
+# The size limit of a whole zip upload. Each file in it is still limited to MAX_UPLOAD_SIZE.
+BATCH_MAX_UPLOAD_SIZE = int(os.getenv("BATCH_MAX_UPLOAD_SIZE", 200 * 1024 * 1024))
+# The number of batches converted at once, more are rejected
+BATCH_MAX_CONCURRENT = int(os.getenv("BATCH_MAX_CONCURRENT", 2))
+BATCH_RETRY_AFTER = int(os.getenv("BATCH_RETRY_AFTER", 30))
+
+MANIFEST_FILENAME = "manifest.json"
+
+class BatchInputError(Exception):
+    """
+    Raised when a batch cannot be read, e.g. a corrupt zip or too many files.
+    """
+
+class BatchItem(NamedTuple):
+    name: str
+    data: bytes
+
+def read_zip_items(data: bytes, max_files: int = BATCH_MAX_FILES, max_size: int = MAX_UPLOAD_SIZE,
+                   max_total_size: int = BATCH_MAX_UPLOAD_SIZE) -> List[BatchItem]:
+    """
+    Reads the PDF files of a zip archive.
+
+    Args:
+        data (bytes): The raw bytes of the zip archive.
+        max_files (int): The maximum number of PDF files accepted.
+        max_size (int): The maximum uncompressed size of each PDF file.
+        max_total_size (int): The maximum uncompressed size of all the PDF files that are read.
+
+    Returns:
+        List[BatchItem]: The PDF files of the archive. Oversized files are kept with empty data so they
+            show up as failures in the manifest.
+
+    Raises:
+        BatchInputError: If the archive is not a valid zip, holds too many PDF files or expands to more than
+            `max_total_size` bytes.
+    """
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile as e:
+        raise BatchInputError(f"Not a valid zip file: {e}")
+
+    with archive:
+        entries = [entry for entry in archive.infolist()
+                   if not entry.is_dir() and entry.filename.lower().endswith(".pdf")]
+        if len(entries) > max_files:
+            raise BatchInputError(f"Batch has {len(entries)} PDF files, the limit is {max_files}")
+
+        # The declared sizes are checked before decompressing so an archive cannot expand without bound.
+        # zipfile never decompresses an entry past its declared size.
+        total_size = sum(entry.file_size for entry in entries if entry.file_size <= max_size)
+        if total_size > max_total_size:
+            raise BatchInputError(f"Batch expands to {total_size} bytes, the limit is {max_total_size}")
+
+        return [BatchItem(entry.filename, archive.read(entry) if entry.file_size <= max_size else b"")
+                for entry in entries]
+
+# The renderer of a batch worker process
+_process_renderer = None
+
+def _init_batch_process(backend: str):
+    global _process_renderer
+    # Batch workers never use the database. They must not share the parent's pooled connections.
+    engine.dispose(close=False)
+    _process_renderer = create_renderer(backend)
+
+def create_batch_executor(mode: str = BATCH_EXECUTOR, max_workers: int = BATCH_MAX_WORKERS) -> Executor:
+    """
+    Creates the pool that runs the CPU bound stages of a batch.
+
+    Args:
+        mode (str): "process" to run the stages on worker processes, "thread" to run them on threads.
+        max_workers (int): The number of workers.
+
+    Returns:
+        Executor: The new pool.
+    """
+    if mode == "process":
+        return ProcessPoolExecutor(max_workers=max_workers, initializer=_init_batch_process,
+                                   initargs=(transcript_renderer.backend,))
+    if mode == "thread":
+        return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch")
+    raise ValueError(f"Unknown batch executor mode: {mode}")
+
+def _extract_and_parse(data: bytes) -> Transcript:
+    if not data:
+        raise ValueError(f"File is empty or larger than {MAX_UPLOAD_SIZE} bytes")
+    return TranscriptParser(None, PdfUtilities.iter_pages_from_pdf(data)).parse(resolve_titles=False)
+
+def _render(transcript: Transcript) -> bytes:
+    if _process_renderer is not None:
+        return _process_renderer.render(transcript)
+    return transcript_renderer.render(transcript)
+
+def _timed(function: Callable, argument) -> Tuple[object, float]:
+    # Timed in the worker, so the manifest reports the work on a file rather than its wait for the pool
+    start = time.perf_counter()
+    try:
+        return function(argument), time.perf_counter() - start
+    except Exception as e:
+        # Pickled along with the exception, so failed files report their time too
+        e.batch_seconds = time.perf_counter() - start
+        raise
+
+class BatchAdmission:
+    """
+    Admits at most `max_batches` batches at once and rejects the rest with `QueueFullError`.
+
+    Like the admission queue of the transcript pipeline, this bounds the work waiting on the shared batch
+    pool instead of letting every batch that arrives queue up its files.
+
+    Attributes:
+        max_batches (int): The number of batches converted at once.
+        retry_after (int): The Retry-After value suggested when a batch is rejected.
+    """
+    def __init__(self, max_batches: int = BATCH_MAX_CONCURRENT, retry_after: int = BATCH_RETRY_AFTER):
+        self.max_batches = max(1, max_batches)
+        self.retry_after = retry_after
+        # Batches are released from the threads that stream them
+        self._lock = threading.Lock()
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def admit(self):
+        """
+        Raises:
+            QueueFullError: If `max_batches` batches are already running.
+        """
+        with self._lock:
+            if self._running >= self.max_batches:
+                self._rejected += 1
+                logging.warning(f"Rejected batch request. Running batches: {self._running}")
+                raise QueueFullError(self.retry_after)
+            self._running += 1
+
+    def release(self):
+        with self._lock:
+            self._running -= 1
+            self._completed += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_batches": self.max_batches,
+            "running": self._running,
+            "completed": self._completed,
+            "rejected": self._rejected,
+        }
+
+class _ZipStream:
+    """
+    A write-only file object that hands out whatever zipfile has written since the last call.
+    """
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def write(self, data: bytes) -> int:
+        self._buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+class TranscriptBatch:
+    """
+    Converts many transcripts at once and streams the results back as a zip archive.
+
+    Extraction, parsing and rendering fan out over `executor`, with at most `max_pending` of the batch's
+    jobs submitted at a time, so batches running at once share the pool. Course titles are resolved in the
+    calling process with one database session and the process-wide course title cache, so the whole batch
+    shares them. Each result is added to the archive as soon as it is ready. A file that fails is recorded
+    in the manifest instead of failing the batch.
+
+    Attributes:
+        items (List[BatchItem]): The uploaded transcripts.
+        executor (Executor): The pool the extract/parse and render stages run on.
+        admission (BatchAdmission): The admission that admitted the batch, released by `close()`.
+        max_pending (int): The number of the batch's jobs submitted to the pool at once.
+    """
+    def __init__(self, items: Iterable[BatchItem], executor: Executor, admission: BatchAdmission = None,
+                 max_pending: int = 2 * BATCH_MAX_WORKERS):
+        self.items = list(items)
+        self.executor = executor
+        self.admission = admission
+        self.max_pending = max(1, max_pending)
+        self.manifest: List[Dict] = []
+        self._output_names = set()
+        self._close_lock = threading.Lock()
+
+    def _output_name(self, item_name: str) -> str:
+        stem = os.path.splitext(os.path.basename(item_name))[0] or "transcript"
+        name = f"{stem}_transcript.pdf"
+        index = 1
+        while name in self._output_names:
+            index += 1
+            name = f"{stem}_{index}_transcript.pdf"
+        self._output_names.add(name)
+        return name
+
+    def _record(self, item: BatchItem, seconds: float, output: str = None, error: str = None):
+        self.manifest.append({
+            "input": item.name,
+            "status": "ok" if error is None else "error",
+            "output": output,
+            "error": error,
+            "seconds": round(seconds, 3),
+        })
+
+    def close(self):
+        """
+        Releases the batch's admission. Safe to call more than once and from any thread.
+        """
+        with self._close_lock:
+            admission, self.admission = self.admission, None
+        if admission is not None:
+            admission.release()
+
+    def iter_zip(self) -> Iterator[bytes]:
+        """
+        Runs the batch and yields the zip archive in chunks as files finish.
+
+        Yields:
+            bytes: The next chunk of the zip archive.
+        """
+        stream = _ZipStream()
+        db = SessionLocal()
+        try:
+            with zipfile.ZipFile(stream, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+                for item_name, output, content in self._iter_results(db):
+                    if content is not None:
+                        archive.writestr(f"transcripts/{output}", content)
+                        yield stream.take()
+
+                archive.writestr(MANIFEST_FILENAME, json.dumps(self.manifest, indent=2))
+            yield stream.take()
+        finally:
+            db.close()
+            self.close()
+
+    def _iter_results(self, db) -> Iterator[tuple]:
+        pending: Dict[Future, tuple] = {}
+        items = iter(self.items)
+
+        while True:
+            # A render replaces the parse it follows, so topping up here keeps the batch within max_pending
+            while len(pending) < self.max_pending:
+                item = next(items, None)
+                if item is None:
+                    break
+                start = time.perf_counter()
+                cache_key = compute_cache_key(item.data, transcript_renderer.backend)
+                cached = rendered_pdf_cache.get(cache_key)
+                seconds = time.perf_counter() - start
+                if cached is not None:
+                    output = self._output_name(item.name)
+                    usage_counter.increment()
+                    self._record(item, seconds, output=output)
+                    yield item.name, output, cached.content
+                    continue
+                parsing = self.executor.submit(_timed, _extract_and_parse, item.data)
+                pending[parsing] = ("parse", item, cache_key, seconds)
+
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, item, cache_key, seconds = pending.pop(future)
+                try:
+                    result, stage_seconds = future.result()
+                except Exception as e:
+                    logging.exception(f"Failed to convert transcript in batch. File: {item.name}")
+                    self._record(item, seconds + getattr(e, "batch_seconds", 0.0), error=f"{type(e).__name__}: {e}")
+                    yield item.name, None, None
+                    continue
+
+                seconds += stage_seconds
+                if stage == "parse":
+                    start = time.perf_counter()
+                    TranscriptParser(db, []).resolve_course_titles(result.courses)
+                    seconds += time.perf_counter() - start
+                    rendering = self.executor.submit(_timed, _render, result)
+                    pending[rendering] = ("render", item, (cache_key, result.pdf_filename), seconds)
+                else:
+                    key, filename = cache_key
+                    rendered_pdf_cache.put(key, result, filename)
+                    output = self._output_name(item.name)
+                    usage_counter.increment()
+                    self._record(item, seconds, output=output)
+                    yield item.name, output, result
+
+class TranscriptBatchResponse(StreamingResponse):
+    """
+    Streams the zip archive of a batch and releases the batch's admission however the response ends.
+
+    The cleanup of `iter_zip` only runs once the generator has started, so a client that disconnects before
+    the first chunk, or a send that fails, would otherwise keep the batch admitted for good.
+    """
+    def __init__(self, batch: TranscriptBatch, headers: Dict[str, str] = None):
+        super().__init__(batch.iter_zip(), media_type="application/zip", headers=headers)
+        self.batch = batch
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.batch.close()
@@ -0,0 +1,219 @@
+import os
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+from dotenv import load_dotenv
+from .file_utilities import make_private_directory
+
+load_dotenv()
+
+# Bump whenever a change to parsing or rendering changes the generated PDF
+RENDERER_VERSION = "2"
+
+RENDERED_PDF_CACHE_TTL = float(os.getenv("RENDERED_PDF_CACHE_TTL", 10 * 60))
+RENDERED_PDF_CACHE_MEMORY_SIZE = int(os.getenv("RENDERED_PDF_CACHE_MEMORY_SIZE", 64 * 1024 * 1024))
+RENDERED_PDF_CACHE_DISK_SIZE = int(os.getenv("RENDERED_PDF_CACHE_DISK_SIZE", 512 * 1024 * 1024))
+# An empty value disables the on-disk tier. The tier is only used if the directory is private to the server's user.
+RENDERED_PDF_CACHE_DIR = os.getenv("RENDERED_PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "transcript-cache"))
+
+def compute_cache_key(data: bytes, backend: str) -> str:
+    """
+    Computes the content-addressed cache key of an uploaded transcript.
+
+    The disk tier outlives the process, so the key also covers everything that changes the PDF rendered
+    from the same upload: the renderer version and the render backend.
+
+    Args:
+        data (bytes): The raw bytes of the uploaded transcript PDF.
+        backend (str): The PDF render backend, e.g. "weasyprint".
+
+    Returns:
+        str: The hex digest of the renderer version, the render backend and the uploaded bytes.
+    """
+    digest = hashlib.sha256(f"{RENDERER_VERSION}\x00{backend}\x00".encode())
+    digest.update(data)
+    return digest.hexdigest()
+
+class CachedPdf(NamedTuple):
+    content: bytes
+    filename: str
+
+class RenderedPdfCache:
+    """
+    A two-tier cache of generated transcript PDFs keyed by `compute_cache_key`.
+
+    The memory tier is an LRU bounded by the total size of the cached PDFs. The disk tier is shared by
+    all worker processes and evicts the oldest files once it grows past its size limit. Entries in both
+    tiers expire `ttl` seconds after they were rendered, since they contain student records. For the same
+    reason the disk tier is only used if its directory is private to the server's user. The directory is
+    created by the first `put`.
+
+    Attributes:
+        ttl (float): The number of seconds an entry stays valid.
+        memory_size (int): The maximum number of bytes held in memory.
+        disk_size (int): The maximum number of bytes held on disk.
+        directory (str): The directory of the disk tier, or an empty string to disable it.
+    """
+    def __init__(self, ttl: float = RENDERED_PDF_CACHE_TTL, memory_size: int = RENDERED_PDF_CACHE_MEMORY_SIZE,
+                 disk_size: int = RENDERED_PDF_CACHE_DISK_SIZE, directory: str = RENDERED_PDF_CACHE_DIR):
+        self.ttl = ttl
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.directory = directory
+        self._entries: "OrderedDict[str, Tuple[CachedPdf, float]]" = OrderedDict()
+        self._memory_used = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Whether the directory is private, None until it has been checked
+        self._private: Optional[bool] = None
+
+    def _disk_ready(self, create: bool) -> bool:
+        if not self.directory or self._private is False:
+            return False
+        if self._private is None:
+            if not create and not os.path.lexists(self.directory):
+                return False
+            self._private = make_private_directory(self.directory)
+        return self._private
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.cache")
+
+    def get(self, key: str) -> Optional[CachedPdf]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                cached, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return cached
+                self._evict(key)
+
+        entry = self._read_disk(key, now)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+
+        cached, expires_at = entry
+        self._store_memory(key, cached, expires_at)
+        return cached
+
+    def put(self, key: str, content: bytes, filename: str):
+        cached = CachedPdf(content, filename)
+        self._store_memory(key, cached, time.time() + self.ttl)
+        self._write_disk(key, cached)
+
+    def _evict(self, key: str):
+        cached, _ = self._entries.pop(key)
+        self._memory_used -= len(cached.content)
+
+    def _store_memory(self, key: str, cached: CachedPdf, expires_at: float):
+        if len(cached.content) > self.memory_size:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._evict(key)
+            self._entries[key] = (cached, expires_at)
+            self._memory_used += len(cached.content)
+            while self._memory_used > self.memory_size:
+                self._evict(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _read_disk(self, key: str, now: float) -> Optional[Tuple[CachedPdf, float]]:
+        if not self._disk_ready(create=False):
+            return None
+
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                expires_at = os.fstat(f.fileno()).st_mtime + self.ttl
+                if expires_at <= now:
+                    self._remove_file(path)
+                    return None
+                filename, _, content = f.read().partition(b"\n")
+        except FileNotFoundError:
+            return None
+
+        return CachedPdf(content, filename.decode()), expires_at
+
+    def _write_disk(self, key: str, cached: CachedPdf):
+        if not self._disk_ready(create=True):
+            return
+
+        # Write to a temporary file first so other processes never read a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(cached.filename.encode() + b"\n")
+                f.write(cached.content)
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            logging.exception("Failed to write rendered PDF cache entry")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+
+        self._prune_disk()
+
+    def _prune_disk(self):
+        now = time.time()
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".cache"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime + self.ttl <= now:
+                self._remove_file(entry.path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_size:
+                break
+            self._remove_file(path)
+            total -= size
+            self.evictions += 1
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._memory_used = 0
+        if self._disk_ready(create=False):
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".cache"):
+                    self._remove_file(entry.path)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "memory_entries": len(self._entries),
+            "memory_bytes": self._memory_used,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+rendered_pdf_cache = RenderedPdfCache()
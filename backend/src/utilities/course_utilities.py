@@ -1,18 +1,26 @@
+from dataclasses import dataclass
+
+@dataclass(frozen=True, slots=True)
 class Course:
-    def __init__(self, session, section, term, subject, code, credit, title, num_grade, letter_grade, average, year, standing):
-        self.session = session
-        self.section = section 
-        self.term = term 
-        self.subject = subject 
-        self.code = code 
-        self.credit = credit 
-        self.title = title 
-        self.num_grade = num_grade 
-        self.letter_grade = letter_grade 
-        # self.class_size = class_size # Tricky to get this data while possible, but not so important
-        self.average = average 
-        self.year = year
-        self.standing = standing
+    """
+    A single course row of a transcript.
+
+    Instances are immutable and have no per-instance `__dict__`, which keeps bulk runs over thousands of
+    transcripts small. Use `dataclasses.replace` to derive a changed copy (e.g. with a resolved title).
+    """
+    session: str
+    section: str
+    term: str
+    subject: str
+    code: str
+    credit: str
+    title: str
+    num_grade: str
+    letter_grade: str
+    # class_size: Tricky to get this data while possible, but not so important
+    average: str
+    year: str
+    standing: str
 
     def __str__(self):
         return "Term: {} Code: {} Credit: {} Title: {} Numeric Grade: {} Letter Grade: {} Average: {} Year: {} Standing: {}".format(
@@ -0,0 +1,130 @@
+import io
+import csv
+import json
+from operator import attrgetter
+from typing import Dict, Iterator, NamedTuple, Optional
+from .html_utilities import iter_transcript_html
+from .parser_utilities import COURSE_FIELDS
+
+class OutputFormat(NamedTuple):
+    media_type: str
+    extension: str
+    # Whether the format needs the render stage, the others are built from the parsed transcript
+    rendered: bool
+
+OUTPUT_FORMATS: Dict[str, OutputFormat] = {
+    "pdf": OutputFormat("application/pdf", "pdf", True),
+    "html": OutputFormat("text/html", "html", False),
+    "json": OutputFormat("application/json", "json", False),
+    "csv": OutputFormat("text/csv", "csv", False),
+}
+DEFAULT_OUTPUT_FORMAT = "pdf"
+
+CSV_COLUMNS = ("student_number",) + COURSE_FIELDS
+
+_course_values = attrgetter(*COURSE_FIELDS)
+
+def _media_type_quality(accepted: Dict[str, float], media_type: str) -> float:
+    # The most specific media range that matches wins, as in RFC 9110
+    for media_range in (media_type, media_type.split("/")[0] + "/*", "*/*"):
+        if media_range in accepted:
+            return accepted[media_range]
+    return 0.0
+
+def negotiate_output_format(accept: Optional[str]) -> Optional[str]:
+    """
+    Picks the output format from an Accept header.
+
+    Each format gets the q value of the most specific media range that matches its media type and the
+    format with the highest one is picked. Ties go to the PDF and then to the order of OUTPUT_FORMATS, so
+    clients that accept anything, like axios with its default header, keep getting a PDF. A header that
+    prefers one of the other media types, like a browser's text/html, gets that format.
+
+    Args:
+        accept (Optional[str]): The value of the Accept header.
+
+    Returns:
+        Optional[str]: The name of the format, or None if the header accepts none of them.
+    """
+    if not accept:
+        return DEFAULT_OUTPUT_FORMAT
+
+    accepted: Dict[str, float] = {}
+    for media_range in accept.split(","):
+        media_type, *parameters = (part.strip() for part in media_range.split(";"))
+        quality = 1.0
+        for parameter in parameters:
+            name, _, value = parameter.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted.setdefault(media_type.lower(), quality)
+
+    best, best_quality = None, 0.0
+    for name, output in OUTPUT_FORMATS.items():
+        quality = _media_type_quality(accepted, output.media_type)
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+def iter_transcript_json(transcript) -> Iterator[str]:
+    """
+    Renders the transcript as a JSON document, one session at a time.
+
+    The document holds the student's details and the sessions in transcript order, each with its courses
+    as objects of every Course field.
+
+    Yields:
+        str: The JSON fragments of the document, in order.
+    """
+    student = {
+        "student_surname": transcript.student_surname,
+        "student_given_name": transcript.student_given_name,
+        "student_number": transcript.student_number,
+    }
+    yield f'{{"student": {json.dumps(student)}, "sessions": ['
+    for index, (session, courses) in enumerate(transcript.courses.items()):
+        rows = ", ".join(json.dumps(dict(zip(COURSE_FIELDS, _course_values(course)))) for course in courses)
+        yield f'{", " if index else ""}{{"session": {json.dumps(session)}, "courses": [{rows}]}}'
+    yield "]}"
+
+def iter_transcript_csv(transcript) -> Iterator[str]:
+    """
+    Renders the courses of the transcript as CSV, one session at a time.
+
+    Each row is one course with the student number and every Course field, under a header row of CSV_COLUMNS.
+
+    Yields:
+        str: The CSV fragments of the document, in order.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for courses in transcript.courses.values():
+        writer.writerows((transcript.student_number, *_course_values(course)) for course in courses)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if not transcript.courses:
+        yield buffer.getvalue()
+
+def iter_transcript_output(transcript, output_format: str) -> Iterator[str]:
+    """
+    Renders the transcript in one of the formats that are built without rendering a PDF.
+
+    Args:
+        transcript (Transcript): The parsed transcript with its course titles resolved.
+        output_format (str): "html", "json" or "csv".
+
+    Yields:
+        str: The fragments of the document, in order.
+    """
+    if output_format == "html":
+        return iter_transcript_html(transcript)
+    if output_format == "json":
+        return iter_transcript_json(transcript)
+    if output_format == "csv":
+        return iter_transcript_csv(transcript)
+    raise ValueError(f"Output format is not built from the transcript: {output_format}")
@@ -0,0 +1,30 @@
+import os
+import stat
+import logging
+
+def make_private_directory(path: str) -> bool:
+    """
+    Creates a directory that only the server's user can access, or checks that the existing one is.
+
+    A directory at a predictable path, e.g. under /tmp, may have been created by another local user first,
+    who could then plant or swap the files in it. Such a directory is not used.
+
+    Args:
+        path (str): The path of the directory.
+
+    Returns:
+        bool: Whether the directory is a real directory, not a symlink, owned by the server's user and
+            without any group or other permission bits.
+    """
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        info = os.lstat(path)
+    except OSError:
+        logging.exception(f"Failed to create private directory. Path: {path}")
+        return False
+
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        logging.error(f"Refusing to use a directory that is not private to the server's user. Path: {path} "
+                      f"Owner: {info.st_uid} Mode: {stat.filemode(info.st_mode)}")
+        return False
+    return True
@@ -0,0 +1,157 @@
+import os
+import hmac
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from operator import attrgetter
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from dotenv import load_dotenv
+from .course_utilities import Course
+from .parser_utilities import COURSE_FIELDS
+
+load_dotenv()
+
+# 0 disables incremental re-generation
+TRANSCRIPT_HISTORY_TTL = float(os.getenv("TRANSCRIPT_HISTORY_TTL", 60 * 60))
+TRANSCRIPT_HISTORY_SIZE = int(os.getenv("TRANSCRIPT_HISTORY_SIZE", 1000))
+# Keys student numbers. Defaults to a random secret per process, so keys cannot be matched across restarts.
+TRANSCRIPT_HISTORY_SALT = os.getenv("TRANSCRIPT_HISTORY_SALT", "").encode() or os.urandom(32)
+
+# Every parsed field of a course, i.e. all but the resolved title
+_signature_of = attrgetter(*(field for field in COURSE_FIELDS if field != "title"))
+
+def session_signature(courses: List[Course]) -> Tuple:
+    """
+    Returns what identifies the parsed courses of a session, ignoring their resolved titles.
+    """
+    return tuple(map(_signature_of, courses))
+
+class SessionSnapshot(NamedTuple):
+    signature: Tuple
+    # The courses with their titles resolved
+    courses: Tuple[Course, ...]
+    # The rendered table rows of the session, if it was rendered to HTML in this process
+    html: Optional[str]
+
+class TranscriptHistory:
+    """
+    Remembers the sessions of recently generated transcripts, so that a re-upload with one new session
+    only resolves titles and renders HTML for the sessions that changed.
+
+    Students upload a new transcript every term, which usually adds a single session to the previous
+    one. The sessions of each generated transcript are kept for `ttl` seconds. On the next upload of the
+    same student, every session whose parsed courses are unchanged takes its titled courses and rendered
+    HTML rows from the previous upload and the titles of the other sessions are resolved as usual.
+
+    Snapshots are only kept in memory, hold no student names, and are keyed by an HMAC of the student
+    number with a secret salt rather than the number itself. Each process keeps its own history.
+
+    Attributes:
+        ttl (float): The number of seconds a transcript's sessions are kept, 0 to disable.
+        max_size (int): The number of students kept.
+    """
+    def __init__(self, ttl: float = TRANSCRIPT_HISTORY_TTL, max_size: int = TRANSCRIPT_HISTORY_SIZE,
+                 salt: bytes = TRANSCRIPT_HISTORY_SALT):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._salt = salt
+        self._entries: "OrderedDict[str, Tuple[Dict[str, SessionSnapshot], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.sessions_reused = 0
+        self.sessions_resolved = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_size > 0
+
+    def student_key(self, student_number: str) -> str:
+        return hmac.new(self._salt, student_number.encode(), hashlib.sha256).hexdigest()
+
+    def _get(self, key: str) -> Dict[str, SessionSnapshot]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return {}
+            snapshots, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return {}
+            self._entries.move_to_end(key)
+            return snapshots
+
+    def resolve_course_titles(self, transcript, resolve_course_titles: Callable[[Dict[str, List[Course]]], None]) -> int:
+        """
+        Fills in the course titles of a parsed transcript, reusing the sessions of the student's previous upload.
+
+        Unchanged sessions get the titled courses and, if there are any, the rendered HTML rows of the previous
+        upload. The titles of the other sessions are resolved with `resolve_course_titles`.
+
+        Args:
+            transcript (Transcript): The parsed transcript, without course titles.
+            resolve_course_titles (Callable): Fills in the titles of courses grouped by session, in place.
+
+        Returns:
+            int: The number of sessions reused from the previous upload.
+        """
+        previous = self._get(self.student_key(transcript.student_number)) if self.enabled else {}
+
+        changed = {}
+        for session, courses in transcript.courses.items():
+            snapshot = previous.get(session)
+            if snapshot is not None and snapshot.signature == session_signature(courses):
+                transcript.courses[session] = list(snapshot.courses)
+                if snapshot.html is not None:
+                    transcript.session_html[session] = snapshot.html
+            else:
+                changed[session] = courses
+
+        if changed:
+            resolve_course_titles(changed)
+            # Only replaces existing keys, so the session order is kept
+            transcript.courses.update(changed)
+
+        reused = len(transcript.courses) - len(changed)
+        with self._lock:
+            self.sessions_reused += reused
+            self.sessions_resolved += len(changed)
+        return reused
+
+    def remember(self, transcript):
+        """
+        Keeps the sessions of a generated transcript, along with any HTML rows rendered for it.
+
+        Sessions with a course whose title could not be resolved are not kept, so their titles are resolved
+        again on the next upload.
+        """
+        if not self.enabled:
+            return
+
+        snapshots = {
+            session: SessionSnapshot(session_signature(courses), tuple(courses), transcript.session_html.get(session))
+            for session, courses in transcript.courses.items()
+            if all(course.title for course in courses)
+        }
+        key = self.student_key(transcript.student_number)
+        with self._lock:
+            self._entries[key] = (snapshots, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def forget(self, student_number: str):
+        with self._lock:
+            self._entries.pop(self.student_key(student_number), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "students": len(self._entries),
+            "sessions_reused": self.sessions_reused,
+            "sessions_resolved": self.sessions_resolved,
+        }
+
+transcript_history = TranscriptHistory()
@@ -0,0 +1,100 @@
+from html import escape
+from typing import Iterable, Iterator
+from .course_utilities import Course
+
+TRANSCRIPT_STYLESHEET = """
+table {
+    width: 100%;
+    border-collapse: collapse;
+}
+th, td {
+    border: 1px solid black;
+    padding: 5px;
+    text-align: left;
+}
+th {
+    background-color: #f2f2f2;
+}
+"""
+
+# The static parts of the document are built once at import time
+_HTML_HEAD = (
+    "<!DOCTYPE html><html><head><title>Transcript</title>"
+    f"<style>{TRANSCRIPT_STYLESHEET}</style>"
+    "</head><body><h1>Transcript</h1>"
+)
+# For renderers that apply a pre-parsed TRANSCRIPT_STYLESHEET themselves
+_HTML_HEAD_WITHOUT_STYLESHEET = "<!DOCTYPE html><html><head><title>Transcript</title></head><body><h1>Transcript</h1>"
+_STUDENT_TEMPLATE = "<p>Name: {name}</p><p>ID: {student_id}</p>"
+_TABLE_HEAD = (
+    "<table><tr>"
+    "<th>Term</th><th>Course Code</th><th>Credit</th><th>Title</th><th>Numeric Grade</th>"
+    "<th>Letter Grade</th><th>Average</th><th>Year</th><th>Standing</th>"
+    "</tr>"
+)
+_SESSION_TEMPLATE = "<tr><td colspan='11'><b>Session: {}</b></td></tr>"
+_HTML_TAIL = "</table></body></html>"
+
+# Cells and rows of a session are joined with these control characters, escaped in one pass and only
+# then turned into markup. pdfplumber does not emit them, so they cannot collide with course data.
+_CELL_SEPARATOR = "\x00"
+_ROW_SEPARATOR = "\x01"
+
+def render_session_html(session: str, courses: Iterable[Course]) -> str:
+    """
+    Renders the table rows of one session: a session header followed by one row per course.
+
+    Every field is HTML escaped. The whole session is escaped with a single call instead of one call
+    per field, which keeps the cost per course small and constant.
+    """
+    text = _ROW_SEPARATOR.join(
+        _CELL_SEPARATOR.join((course.term, f"{course.subject} {course.code}", course.credit, course.title,
+                              course.num_grade, course.letter_grade, course.average, course.year, course.standing))
+        for course in courses
+    )
+    rows = escape(text).replace(_CELL_SEPARATOR, "</td><td>").replace(_ROW_SEPARATOR, "</td></tr><tr><td>")
+    return _SESSION_TEMPLATE.format(escape(session)) + (f"<tr><td>{rows}</td></tr>" if text else "")
+
+def iter_transcript_html(transcript, inline_stylesheet: bool = True) -> Iterator[str]:
+    """
+    Renders the transcript as a sequence of HTML fragments, one session at a time.
+
+    Joining the fragments gives the full document. The fragments can also be written out as they are
+    produced without holding the whole document in memory. The rows of each session are taken from, or
+    stored into, the transcript's `session_html` if it has one.
+
+    Args:
+        transcript (Transcript): The transcript object containing the student and course information.
+        inline_stylesheet (bool): Whether to include TRANSCRIPT_STYLESHEET in the document head.
+
+    Yields:
+        str: The HTML fragments of the document, in order.
+    """
+    yield _HTML_HEAD if inline_stylesheet else _HTML_HEAD_WITHOUT_STYLESHEET
+    yield _STUDENT_TEMPLATE.format(
+        name=escape(f"{transcript.student_given_name} {transcript.student_surname}"),
+        student_id=escape(transcript.student_number),
+    )
+    yield _TABLE_HEAD
+    session_html = getattr(transcript, "session_html", None)
+    for session, course_list in transcript.courses.items():
+        fragment = session_html.get(session) if session_html is not None else None
+        if fragment is None:
+            fragment = render_session_html(session, course_list)
+            if session_html is not None:
+                session_html[session] = fragment
+        yield fragment
+    yield _HTML_TAIL
+
+def create_html_string_for_transcript(transcript, inline_stylesheet: bool = True) -> str:
+    """
+    Creates an HTML string representing the provided transcript.
+
+    Args:
+        transcript (Transcript): The transcript object containing the student and course information.
+        inline_stylesheet (bool): Whether to include TRANSCRIPT_STYLESHEET in the document head.
+
+    Returns:
+        str: The HTML string representing the transcript.
+    """
+    return "".join(iter_transcript_html(transcript, inline_stylesheet))
@@ -0,0 +1,229 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from src.database import database_results
+from src.database.database import AsyncSessionLocal
+from .pipeline_utilities import TranscriptPipelineExecutor, QueueFullError, PIPELINE_MAX_WORKERS, PIPELINE_RETRY_AFTER
+
+load_dotenv()
+
+# The number of jobs processed at once. More than the pipeline's workers only makes jobs wait in its queue.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", PIPELINE_MAX_WORKERS))
+# The number of jobs allowed to wait for a worker before new jobs are rejected
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", 256))
+# The number of seconds a finished job and its result are kept
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", 10 * 60))
+# The maximum number of finished jobs kept, the oldest are dropped first
+JOB_MAX_FINISHED = int(os.getenv("JOB_MAX_FINISHED", 1000))
+
+# How long a job worker waits before retrying when the pipeline is saturated by synchronous requests
+_PIPELINE_BUSY_DELAY = 0.5
+
+class JobStatus:
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+class TranscriptJob:
+    """
+    A transcript generation request that is processed in the background.
+
+    Attributes:
+        id (str): The job ID handed to the client.
+        status (str): One of the JobStatus values.
+        created_at (float): When the job was submitted.
+        finished_at (float): When the job finished, or None.
+        pdf (bytes): The generated PDF once the job is done, if it was loaded.
+        filename (str): The download filename of the PDF once the job is done.
+        error (str): Why the job failed, or None.
+    """
+    def __init__(self, data: Optional[bytes], id: str = None, status: str = JobStatus.QUEUED,
+                 created_at: float = None, finished_at: float = None, filename: str = None, error: str = None,
+                 pdf: bytes = None):
+        self.id = id or uuid.uuid4().hex
+        self.status = status
+        self.created_at = created_at if created_at is not None else time.time()
+        self.finished_at = finished_at
+        self.pdf = pdf
+        self.filename = filename
+        self.error = error
+        # Only held by the worker that runs the job, and dropped once the job has run
+        self.data: Optional[bytes] = data
+
+    @classmethod
+    def from_row(cls, row) -> "TranscriptJob":
+        return cls(None, **row._asdict())
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "filename": self.filename,
+            "error": self.error,
+        }
+
+class TranscriptJobQueue:
+    """
+    A queue of transcript jobs, processed by a fixed number of workers on the transcript pipeline.
+
+    Submitting a job returns right away. The job runs in the server process that accepted it, but its status
+    and result are stored in the jobs table, so with several server workers a poll can land on any of them.
+    At most `max_pending` jobs wait for a worker of the process, beyond that `submit` raises
+    `QueueFullError`. Finished jobs are kept for `result_ttl` seconds so their result can be downloaded,
+    and at most `max_finished` of them are kept at once. A job whose process exits before it finishes stays
+    queued or running until it is deleted from the table.
+
+    All methods must be called from the event loop thread.
+
+    Attributes:
+        pipeline (TranscriptPipelineExecutor): The pipeline the jobs run on.
+        workers (int): The number of jobs processed at once.
+        max_pending (int): The number of jobs allowed to wait for a worker.
+        result_ttl (float): The number of seconds a finished job is kept.
+        max_finished (int): The maximum number of finished jobs kept.
+        retry_after (int): The Retry-After value suggested when the queue is full.
+    """
+    def __init__(self, pipeline: TranscriptPipelineExecutor, workers: int = JOB_WORKERS,
+                 max_pending: int = JOB_MAX_PENDING, result_ttl: float = JOB_RESULT_TTL,
+                 max_finished: int = JOB_MAX_FINISHED, retry_after: int = PIPELINE_RETRY_AFTER):
+        self.pipeline = pipeline
+        self.workers = max(1, workers)
+        self.max_pending = max(0, max_pending)
+        self.result_ttl = result_ttl
+        self.max_finished = max_finished
+        self.retry_after = retry_after
+        self._queue: asyncio.Queue = None
+        self._tasks: List[asyncio.Task] = []
+        self._submitted = 0
+        self._rejected = 0
+        self._finished = 0
+        self._expired = 0
+
+    def start(self):
+        if self._tasks:
+            return
+
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        logging.info(f"Transcript job queue started. Workers: {self.workers} Max pending: {self.max_pending}")
+
+    async def shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, data: bytes) -> TranscriptJob:
+        """
+        Queues one uploaded transcript for generation.
+
+        Args:
+            data (bytes): The raw bytes of the uploaded transcript PDF.
+
+        Returns:
+            TranscriptJob: The queued job.
+
+        Raises:
+            QueueFullError: If `max_pending` jobs are already waiting.
+        """
+        self.start()
+
+        if self.pending >= self.max_pending:
+            self._rejected += 1
+            logging.warning(f"Rejected transcript job. Pending jobs: {self.pending}")
+            raise QueueFullError(self.retry_after)
+
+        job = TranscriptJob(data)
+        async with AsyncSessionLocal() as db:
+            await database_results.insert_job(db, job.id, job.status, job.created_at)
+            await db.commit()
+        self._queue.put_nowait(job)
+        self._submitted += 1
+        return job
+
+    async def get(self, job_id: str, with_pdf: bool = False) -> Optional[TranscriptJob]:
+        """
+        Returns a job by its ID, or None if it does not exist or has expired.
+
+        Args:
+            job_id (str): The job ID.
+            with_pdf (bool): Whether to load the generated PDF of a finished job.
+        """
+        async with AsyncSessionLocal() as db:
+            row = await database_results.get_job(db, job_id, with_pdf=with_pdf)
+        if row is None or (row.finished_at is not None and row.finished_at <= time.time() - self.result_ttl):
+            return None
+        return TranscriptJob.from_row(row)
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: TranscriptJob):
+        try:
+            await self._update(job, status=JobStatus.RUNNING)
+            while True:
+                try:
+                    result = await self.pipeline.run(job.data)
+                    break
+                except QueueFullError:
+                    # Synchronous requests are using the whole pipeline, wait for room
+                    await asyncio.sleep(_PIPELINE_BUSY_DELAY)
+            job.pdf, job.filename = result.pdf, result.filename
+            job.status = JobStatus.DONE
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logging.exception(f"Transcript job failed. Job: {job.id}")
+            job.status = JobStatus.FAILED
+            job.error = "Failed to generate the transcript"
+        finally:
+            job.data = None
+
+        job.finished_at = time.time()
+        try:
+            await self._update(job, status=job.status, finished_at=job.finished_at, pdf=job.pdf,
+                               filename=job.filename, error=job.error)
+            await self._expire()
+        except Exception:
+            logging.exception(f"Failed to store transcript job result. Job: {job.id}")
+        job.pdf = None
+        self._finished += 1
+
+    async def _update(self, job: TranscriptJob, **values):
+        job.status = values.get("status", job.status)
+        async with AsyncSessionLocal() as db:
+            await database_results.update_job(db, job.id, **values)
+            await db.commit()
+
+    async def _expire(self):
+        async with AsyncSessionLocal() as db:
+            self._expired += await database_results.delete_finished_jobs(db, time.time() - self.result_ttl,
+                                                                          self.max_finished)
+            await db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        # Counts of this server process, the jobs table is shared by all of them
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "finished": self._finished,
+            "submitted": self._submitted,
+            "rejected": self._rejected,
+            "expired": self._expired,
+        }
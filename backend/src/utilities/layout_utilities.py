@@ -0,0 +1,183 @@
+import re
+import logging
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from .course_utilities import Course
+from .parser_utilities import LayoutPage, iter_course_rows
+
+# The header label of each column of the course table and the Course field the column holds.
+# The course column holds both the subject and the code, "_" marks a column that is not read.
+TABLE_COLUMNS = (
+    ("Course", "course"),
+    ("Section", "section"),
+    ("Grade", "num_grade"),
+    ("Letter", "letter_grade"),
+    ("Session", "session"),
+    ("Term", "term"),
+    ("Program", "_"),
+    ("Year", "year"),
+    ("Credits", "credit"),
+    ("Class", "average"),
+    ("Standing", "standing"),
+)
+HEADER_LABELS = tuple(label for label, _ in TABLE_COLUMNS)
+
+SUBJECT_PATTERN = re.compile(r"^[A-Z]{4}$")
+CODE_PATTERN = re.compile(r"^\d{3}[A-Z]?$")
+
+# Words whose tops are at most this many points apart are on the same line
+LINE_TOLERANCE = 3
+
+HeaderSpans = Tuple[Tuple[int, int], ...]
+
+class ColumnLayout(NamedTuple):
+    """
+    The column boundaries of one transcript template.
+
+    Attributes:
+        fields (Tuple[str, ...]): The Course field of each column, left to right.
+        boundaries (Tuple[float, ...]): The x position between each pair of adjacent columns.
+    """
+    fields: Tuple[str, ...]
+    boundaries: Tuple[float, ...]
+
+    def column_of(self, x: float) -> str:
+        return self.fields[bisect_right(self.boundaries, x)]
+
+@lru_cache(maxsize=64)
+def column_layout(header: HeaderSpans) -> ColumnLayout:
+    """
+    Computes the column boundaries of a template from the horizontal extent of its header labels.
+
+    Each boundary lies halfway between two adjacent labels, so cells are binned correctly whether they are
+    left, right or center aligned under their label. Layouts are cached by the rounded label positions, so
+    they are computed once per template.
+
+    Args:
+        header (Tuple[Tuple[int, int], ...]): The (x0, x1) extent of each header label, left to right.
+
+    Returns:
+        ColumnLayout: The column layout.
+    """
+    boundaries = tuple((left[1] + right[0]) / 2 for left, right in zip(header, header[1:]))
+    return ColumnLayout(tuple(field for _, field in TABLE_COLUMNS), boundaries)
+
+def match_header(words: List[Dict]) -> Optional[HeaderSpans]:
+    """
+    Returns the extent of each header label if the line is the header of the course table.
+
+    Words between two labels (e.g. "Avg" of "Class Avg") extend the label before them.
+    """
+    if not words or words[0]["text"] != HEADER_LABELS[0]:
+        return None
+
+    spans = []
+    for word in words:
+        if len(spans) < len(HEADER_LABELS) and word["text"] == HEADER_LABELS[len(spans)]:
+            spans.append([word["x0"], word["x1"]])
+        else:
+            spans[-1][1] = word["x1"]
+
+    if len(spans) < len(HEADER_LABELS):
+        return None
+    return tuple((round(x0), round(x1)) for x0, x1 in spans)
+
+def group_lines(words: List[Dict]) -> List[List[Dict]]:
+    """
+    Groups words into lines by their vertical position, each line ordered left to right.
+    """
+    lines: List[List[Dict]] = []
+    line_top = None
+    for word in sorted(words, key=lambda word: (word["top"], word["x0"])):
+        if line_top is None or word["top"] - line_top > LINE_TOLERANCE:
+            lines.append([])
+            line_top = word["top"]
+        lines[-1].append(word)
+
+    for line in lines:
+        line.sort(key=lambda word: word["x0"])
+    return lines
+
+def is_course_row(words: List[Dict]) -> bool:
+    return len(words) >= 2 and bool(SUBJECT_PATTERN.match(words[0]["text"])) \
+        and bool(CODE_PATTERN.match(words[1]["text"]))
+
+def course_from_row(words: List[Dict], layout: ColumnLayout) -> Optional[Course]:
+    """
+    Builds a course from the words of a course row by binning each word into its column.
+
+    Fields that a kind of row does not have get the same defaults as the text engine gives them:
+    pass/fail rows have an average of "n/a" and rows without a grade, credits or standing are in progress.
+    """
+    cells: Dict[str, List[str]] = {}
+    for word in words:
+        cells.setdefault(layout.column_of((word["x0"] + word["x1"]) / 2), []).append(word["text"])
+
+    course = cells.get("course", [])
+    if len(course) != 2:
+        return None
+
+    def cell(field: str) -> str:
+        return " ".join(cells.get(field, ()))
+
+    num_grade, credit, standing = cell("num_grade"), cell("credit"), cell("standing")
+    average = cell("average") if num_grade else ("n/a" if credit else "")
+    if not (num_grade or credit or standing):
+        standing = "CIP"
+
+    return Course(session=cell("session"), section=cell("section"), term=cell("term"), subject=course[0],
+                  code=course[1], credit=credit, title="", num_grade=num_grade, letter_grade=cell("letter_grade"),
+                  average=average, year=cell("year"), standing=standing)
+
+def extract_page_layout(page) -> LayoutPage:
+    """
+    Reads the course rows of a pdfplumber page from the positions of its words.
+
+    The words of the page are read once and every word of a course row is binned into the column it
+    lies in, using the boundaries of the course table header. Rows come out as courses directly, without
+    reconstructing the page's text layout, and do not depend on how many words a row has. Rows whose words
+    do not line up with the columns, rows above the header, e.g. the rows of a table continued from the
+    previous page, and pages without a course table header, fall back to parsing the text of their lines
+    like the text engine.
+
+    Args:
+        page (pdfplumber.page.Page): The page.
+
+    Returns:
+        LayoutPage: The text of the lines that are not course rows, and the courses.
+    """
+    layout = None
+    lines = []
+    text_lines = []
+    # The rows above the header are parsed from their text once the page turns out to have a header
+    early_rows = []
+    courses = []
+    for line in group_lines(page.extract_words()):
+        row = " ".join(word["text"] for word in line)
+        lines.append(row)
+        if is_course_row(line):
+            if layout is None:
+                early_rows.append(row)
+                continue
+
+            course = course_from_row(line, layout)
+            if course is None:
+                logging.warning(f"Failed to bin course row, parsing its text instead. {row}")
+                courses.extend(iter_course_rows((row,)))
+            else:
+                courses.append(course)
+            continue
+
+        if layout is None:
+            header = match_header(line)
+            if header is not None:
+                layout = column_layout(header)
+        text_lines.append(row)
+
+    if layout is None:
+        text = "\n".join(lines)
+        return LayoutPage(text, list(iter_course_rows((text,))))
+    if early_rows:
+        courses[:0] = iter_course_rows(("\n".join(early_rows),))
+    return LayoutPage("\n".join(text_lines), courses)
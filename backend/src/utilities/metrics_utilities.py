@@ -0,0 +1,255 @@
+import os
+import sys
+import time
+import threading
+from bisect import bisect_left
+from collections import Counter as StackCounter, OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Lets clients ask for a sampling profile of their request with ?profile=true
+METRICS_PROFILING_ENABLED = os.getenv("METRICS_PROFILING_ENABLED", "false").lower() == "true"
+METRICS_PROFILE_INTERVAL = float(os.getenv("METRICS_PROFILE_INTERVAL", 0.005))
+METRICS_PROFILE_MAX_STORED = int(os.getenv("METRICS_PROFILE_MAX_STORED", 32))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+class Metric:
+    """
+    A named metric with a fixed set of labels, exported in the Prometheus text format.
+
+    Metrics are kept per process. In process pipeline mode the spans that run on pipeline workers are
+    therefore not exported, while the per-stage pipeline timings are, since they are recorded by the
+    serving process.
+
+    Attributes:
+        name (str): The metric name.
+        help (str): The description exported with the metric.
+        labelnames (Tuple[str, ...]): The names of the metric's labels.
+    """
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _format_labels(self, key: LabelValues, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+        return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{self._format_labels(key)} {value}" for key, value in self._values.items()]
+
+    def render(self) -> str:
+        return "\n".join([f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"] + self._samples())
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            # Per-bucket (not cumulative) counts plus the +Inf bucket, the sum and the count
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{self.name}_bucket{self._format_labels(key, (('le', le),))} {cumulative}")
+                lines.append(f"{self.name}_sum{self._format_labels(key)} {total}")
+                lines.append(f"{self.name}_count{self._format_labels(key)} {count}")
+        return lines
+
+class MetricsRegistry:
+    """
+    The metrics of this process.
+    """
+    def __init__(self):
+        self._metrics: "OrderedDict[str, Metric]" = OrderedDict()
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        """
+        Returns every metric in the Prometheus text exposition format.
+        """
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+registry = MetricsRegistry()
+
+SPAN_SECONDS = registry.histogram("transcript_span_seconds",
+                                  "Duration of instrumented calls. Spans nest, e.g. parse includes lazy extraction.",
+                                  ["span", "source"])
+SPANS_IN_FLIGHT = registry.gauge("transcript_spans_in_flight", "Instrumented calls currently running.", ["span"])
+PIPELINE_STAGE_SECONDS = registry.histogram("transcript_pipeline_stage_seconds",
+                                            "Duration of each transcript pipeline stage.", ["stage"])
+PIPELINE_REQUESTS = registry.counter("transcript_pipeline_requests_total",
+                                     "Transcript pipeline requests by outcome.", ["outcome"])
+COURSE_TITLE_LOOKUPS = registry.counter("course_title_lookups_total",
+                                        "Course titles resolved, by where they were found.", ["source"])
+
+@contextmanager
+def span(name: str, source: str = ""):
+    """
+    Times the enclosed block into `transcript_span_seconds` and counts it as in flight while it runs.
+
+    Args:
+        name (str): The span name, usually the name of the instrumented function.
+        source (str): Where the result came from, e.g. "cache", "db" or "api" for title lookups.
+    """
+    SPANS_IN_FLIGHT.inc(span=name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        SPAN_SECONDS.observe(time.perf_counter() - start, span=name, source=source)
+        SPANS_IN_FLIGHT.dec(span=name)
+
+def timed_iter(name: str, iterable: Iterable) -> Iterator:
+    """
+    Wraps a lazy iterable, recording the time spent producing its items as a single span.
+    """
+    iterator = iter(iterable)
+    elapsed = 0.0
+    SPANS_IN_FLIGHT.inc(span=name)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start
+            yield item
+    finally:
+        SPAN_SECONDS.observe(elapsed, span=name, source="")
+        SPANS_IN_FLIGHT.dec(span=name)
+
+class SamplingProfiler:
+    """
+    Samples the call stack of one thread at a fixed interval from a background thread.
+
+    The result is in the collapsed stack format read by flame graph tools: one line per distinct stack,
+    with the frames from outermost to innermost separated by ';' followed by the number of samples.
+
+    Attributes:
+        thread_id (int): The identifier of the sampled thread.
+        interval (float): The number of seconds between samples.
+    """
+    def __init__(self, thread_id: int = None, interval: float = METRICS_PROFILE_INTERVAL):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self._stacks: StackCounter = StackCounter()
+        self._stop = threading.Event()
+        self._thread: threading.Thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> str:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.collapsed()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            self._stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self._stacks.most_common())
+
+@contextmanager
+def profile_current_thread(enabled: bool = True):
+    """
+    Samples the current thread while the block runs.
+
+    Yields:
+        List[str]: A list that holds the collapsed stacks once the block finishes, empty when disabled.
+    """
+    result: List[str] = []
+    if not enabled:
+        yield result
+        return
+
+    profiler = SamplingProfiler()
+    profiler.start()
+    try:
+        yield result
+    finally:
+        result.append(profiler.stop())
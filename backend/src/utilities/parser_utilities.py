@@ -0,0 +1,130 @@
+import re
+import logging
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple
+from .course_utilities import Course
+
+# regex explanation
+# Name:: This part of the pattern matches the exact string "Name:".
+# (.*),: The (.*) part is a capturing group that matches any sequence of characters
+#       (. matches any character, and * means to match the preceding character zero or more times).
+#       The .* is followed by a comma which matches the comma separating the student's surname and given name.
+#       The (.*) in parentheses captures the matched surname.
+# \s+: This part of the pattern matches one or more whitespace characters.
+#       \s matches any whitespace character (including spaces, tabs, and newlines),
+#       and + means to match the preceding character one or more times.
+# (.*): Another capturing group, similar to the one described in surname group.
+#       This one captures the student's given name.
+# \s+#:: This part matches one or more whitespace characters followed by the exact string "#:".
+# (\d+): This part is another capturing group that matches one or more digits (0-9).
+#        \d matches any digit, and + means to match the preceding character one or more times. The (\d+) in parentheses captures the matched student number.
+STUDENT_DATA_PATTERN = re.compile(r"Name:(.*),\s+(.*)\s+#:(\d+)")
+
+# The order of the Course constructor arguments
+COURSE_FIELDS = ("session", "section", "term", "subject", "code", "credit", "title",
+                 "num_grade", "letter_grade", "average", "year", "standing")
+
+# This pattern matches with a line that contains course grade info.
+# If the line contains course grade info, it starts with course code
+# e.g. CPEN 221, WRDS 150B
+COURSE_LINE_PATTERN = re.compile(r"^[A-Z]{4} \d{3}[A-Z]?.*$", re.MULTILINE)
+
+class LayoutPage(NamedTuple):
+    """
+    A page read by the layout extraction engine, with its course rows already parsed.
+
+    Attributes:
+        text (str): The text of the lines that are not course rows, e.g. the student data.
+        courses (List[Course]): The course rows of the page, in order.
+    """
+    text: str
+    courses: List[Course]
+
+def split_page(page) -> Tuple[str, Iterable[Course]]:
+    """
+    Returns the text and the lazily parsed course rows of an extracted page.
+
+    Args:
+        page (str | LayoutPage): The page, as extracted by either extraction engine.
+    """
+    if isinstance(page, LayoutPage):
+        return page
+    return page, iter_course_rows((page,))
+
+class CourseRowShape(NamedTuple):
+    """
+    One layout of a course row on the transcript.
+
+    Attributes:
+        name (str): A short name of the shape.
+        fields (Tuple[str, ...]): The Course field of each column of the row. "_" marks a skipped column.
+        defaults (Dict[str, str]): The values of the Course fields that are not on this kind of row.
+    """
+    name: str
+    fields: Tuple[str, ...]
+    defaults: Dict[str, str]
+
+# Ordered from the most to the least common shape
+COURSE_ROW_SHAPES = (
+    CourseRowShape("non_pass_fail",
+                   ("subject", "code", "section", "num_grade", "letter_grade", "session", "term", "_", "year", "credit", "average"),
+                   {}),
+    CourseRowShape("pass_fail_with_term",
+                   ("subject", "code", "section", "session", "term", "_", "year", "credit", "_", "standing"),
+                   {"average": "n/a"}),
+    CourseRowShape("pass_fail_without_term",
+                   ("subject", "code", "section", "session", "_", "year", "credit", "_", "standing"),
+                   {"average": "n/a"}),
+    CourseRowShape("withdraw",
+                   ("subject", "code", "section", "session", "term", "_", "year", "standing"),
+                   {}),
+    CourseRowShape("in_progress",
+                   ("subject", "code", "section", "session", "_", "year"),
+                   {"standing": "CIP"}),
+)
+
+def _compile_builder(shape: CourseRowShape) -> Tuple[itemgetter, List[str], int]:
+    # The words of a row followed by the shape's defaults are picked into the positional Course arguments
+    # with a single itemgetter call.
+    default_fields = [field for field in COURSE_FIELDS if field not in shape.fields]
+    positions = list(shape.fields) + default_fields
+    arrange = itemgetter(*(positions.index(field) for field in COURSE_FIELDS))
+    defaults = [shape.defaults.get(field, "") for field in default_fields]
+    letter_grade_index = shape.fields.index("letter_grade") if "letter_grade" in shape.fields else None
+    return arrange, defaults, letter_grade_index
+
+# Every shape has a distinct number of columns, so the compiled grammar is keyed by it
+COURSE_ROW_GRAMMAR: Dict[int, Tuple[itemgetter, List[str], int]] = {
+    len(shape.fields): _compile_builder(shape) for shape in COURSE_ROW_SHAPES
+}
+
+def iter_course_rows(pages: Iterable[str]) -> Iterator[Course]:
+    """
+    Lazily parses the course rows of the extracted transcript pages in a single pass.
+
+    Each page is scanned once for course lines. Other lines are skipped by the regex engine without
+    being split or copied.
+
+    Args:
+        pages (Iterable[str]): The extracted text of each page.
+
+    Yields:
+        Course: The parsed courses, in transcript order.
+    """
+    grammar = COURSE_ROW_GRAMMAR
+    for page in pages:
+        for line in COURSE_LINE_PATTERN.findall(page):
+            words = line.split()
+            builder = grammar.get(len(words))
+            if builder is None:
+                logging.error(f"Failed to parse course data. Please check parser_utilities:iter_course_rows. {line}")
+                continue
+
+            arrange, defaults, letter_grade_index = builder
+            if letter_grade_index is not None:
+                letter_grade = words[letter_grade_index]
+                # To log error in case PDF extractor failed to extract letter grade properly (e.g. Ac -or- A*)
+                if len(letter_grade) == 2 and letter_grade[1] not in "+-":
+                    logging.error(f"Failed to parse course letter grade. Please check parser_utilities:iter_course_rows. {letter_grade}")
+
+            yield Course(*arrange(words + defaults))
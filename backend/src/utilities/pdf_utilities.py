@@ -1,6 +1,85 @@
+import io
 import os
+import re
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Union
+from dotenv import load_dotenv
+from . import html_utilities
+from .layout_utilities import extract_page_layout
+from .metrics_utilities import timed_iter
+from .parser_utilities import LayoutPage
 from .transcript_utilities import Transcript
-import pdfplumber
+
+load_dotenv()
+
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", 10 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 64 * 1024))
+
+PDF_EXTRACT_PROCESSES = int(os.getenv("PDF_EXTRACT_PROCESSES", 0))
+PDF_EXTRACT_MIN_PAGES = int(os.getenv("PDF_EXTRACT_MIN_PAGES", 4))
+# "text" parses the rows of each page's extracted text, "layout" bins each page's words into the table columns
+PDF_EXTRACTION_ENGINE = os.getenv("PDF_EXTRACTION_ENGINE", "text")
+PDF_EXTRACTION_ENGINES = ("text", "layout")
+
+# Pages whose raw characters contain neither a course code nor the student name line hold nothing
+# the parser reads. Characters are matched without spaces since those are often not drawn as glyphs.
+RELEVANT_PAGE_PATTERN = re.compile(r"Name:|[A-Z]{4} ?\d{3}")
+
+_extract_executor: ProcessPoolExecutor = None
+_extract_executor_pid: int = None
+_extract_executor_lock = threading.Lock()
+
+def _get_extract_executor() -> Optional[ProcessPoolExecutor]:
+    """
+    Returns the extraction pool of this process, or None in a worker process of another pool.
+
+    Pipeline, batch and render pool workers extract in-process, so they never start a nested pool that
+    nothing shuts down.
+    """
+    global _extract_executor, _extract_executor_pid
+    if multiprocessing.parent_process() is not None:
+        return None
+
+    with _extract_executor_lock:
+        # A forked server worker inherits the parent's pool but not the thread that manages it
+        if _extract_executor is None or _extract_executor_pid != os.getpid():
+            _extract_executor = ProcessPoolExecutor(max_workers=PDF_EXTRACT_PROCESSES)
+            _extract_executor_pid = os.getpid()
+        return _extract_executor
+
+def _shutdown_extract_executor():
+    global _extract_executor
+    with _extract_executor_lock:
+        if _extract_executor is not None and _extract_executor_pid == os.getpid():
+            _extract_executor.shutdown(wait=True)
+        _extract_executor = None
+
+def _extract_page(page, engine: str) -> Union[str, LayoutPage]:
+    chars = "".join(char["text"] for char in page.chars)
+    if not RELEVANT_PAGE_PATTERN.search(chars):
+        return LayoutPage("", []) if engine == "layout" else ""
+    if engine == "layout":
+        return extract_page_layout(page)
+    return page.extract_text()
+
+def _extract_page_range(data: bytes, start: int, stop: int, engine: str) -> List[Union[str, LayoutPage]]:
+    import pdfplumber
+    # pdfplumber page numbers are 1-based
+    with pdfplumber.open(io.BytesIO(data), pages=list(range(start + 1, stop + 1))) as pdf:
+        return [_extract_page(page, engine) for page in pdf.pages]
+
+class UploadTooLargeError(Exception):
+    """
+    Raised when an uploaded file is larger than the configured limit.
+
+    Attributes:
+        max_size (int): The maximum accepted size in bytes.
+    """
+    def __init__(self, max_size: int):
+        super().__init__(f"Uploaded file is larger than {max_size} bytes")
+        self.max_size = max_size
 
 class PdfUtilities:
     """
@@ -8,101 +87,139 @@ class PdfUtilities:
     of the provided transcript.
     """
     @staticmethod
-    async def extract_text_from_pdf(file):
-        # Save the uploaded file temporarily
-        temp_filename = "temp.pdf"
-        with open(temp_filename, "wb") as buffer:
-            buffer.write(await file.read())
+    async def read_upload(file, max_size: int = MAX_UPLOAD_SIZE, chunk_size: int = UPLOAD_CHUNK_SIZE) -> bytes:
+        """
+        Reads an uploaded file into memory in chunks, enforcing an upper bound on its size.
+
+        Args:
+            file (UploadFile): The uploaded file.
+            max_size (int): The maximum number of bytes accepted.
+            chunk_size (int): The number of bytes read per chunk.
 
-        # Extract text from the PDF using pdfplumber
-        with pdfplumber.open(temp_filename) as pdf:
-            pages = [page.extract_text() for page in pdf.pages]
+        Returns:
+            bytes: The content of the uploaded file.
 
-        # Remove the temporary file
-        os.remove(temp_filename)
+        Raises:
+            UploadTooLargeError: If the file is larger than `max_size`.
+        """
+        chunks: List[bytes] = []
+        size = 0
+        while True:
+            chunk = await file.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_size:
+                raise UploadTooLargeError(max_size)
+            chunks.append(chunk)
 
-        return pages
+        return b"".join(chunks)
 
     @staticmethod
-    def create_html_string_for_transcript(transcript: Transcript) -> str:
+    def iter_text_from_pdf(data: bytes) -> Iterator[str]:
         """
-        Creates an HTML string representing the provided transcript.
+        Lazily extracts the text of each page of the provided PDF, in page order.
+
+        Pages are produced one at a time so that parsing can start before the last page is extracted.
+        Pages without any course row or student data are detected from their raw character stream and
+        skipped before pdfplumber's text layout runs; they come out as empty strings. PDFs with at least
+        PDF_EXTRACT_MIN_PAGES pages are split across PDF_EXTRACT_PROCESSES processes when that is set.
+
+        The PDF is read straight from memory, so nothing is written to disk and concurrent calls
+        cannot interfere with each other. This is blocking and is meant to be run on the transcript
+        pipeline's worker pool.
 
         Args:
-            transcript (Transcript): The transcript object containing the student and course information.
+            data (bytes): The raw bytes of the PDF file.
 
-        Returns:
-            str: The HTML string representing the transcript.
+        Yields:
+            str: The extracted text of each page.
         """
+        return PdfUtilities.iter_pages_from_pdf(data, engine="text")
 
-        # Formatting student name and student ID
-        name = f"{transcript.student_given_name} {transcript.student_surname}"
-        student_id = transcript.student_number
-
-        # Formatting courses into HTML table rows
-        courses_html = ""
-        for session, course_list in transcript.courses.items():
-            courses_html += f"<tr><td colspan='11'><b>Session: {session}</b></td></tr>"
-            for course in course_list:
-                course_code = f"{course.subject} {course.code}"  # Combining subject and code
-                courses_html += f"""
-                <tr>
-                    <td>{course.term}</td>
-                    <td>{course_code}</td>
-                    <td>{course.credit}</td>
-                    <td>{course.title}</td>
-                    <td>{course.num_grade}</td>
-                    <td>{course.letter_grade}</td>
-                    <td>{course.average}</td>
-                    <td>{course.year}</td>
-                    <td>{course.standing}</td>
-                </tr>"""
-
-        # Creating the final HTML string
-        html_str = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>Transcript</title>
-                <style>
-                    table {{
-                        width: 100%;
-                        border-collapse: collapse;
-                    }}
-                    th, td {{
-                        border: 1px solid black;
-                        padding: 5px;
-                        text-align: left;
-                    }}
-                    th {{
-                        background-color: #f2f2f2;
-                    }}
-                </style>
-            </head>
-            <body>
-                <h1>Transcript</h1>
-                <p>Name: {name}</p>
-                <p>ID: {student_id}</p>
-                <table>
-                    <tr>
-                        <th>Term</th>
-                        <th>Course Code</th>
-                        <th>Credit</th>
-                        <th>Title</th>
-                        <th>Numeric Grade</th>
-                        <th>Letter Grade</th>
-                        <th>Average</th>
-                        <th>Year</th>
-                        <th>Standing</th>
-                    </tr>
-                    {courses_html}
-                </table>
-            </body>
-            </html>
+    @staticmethod
+    def iter_pages_from_pdf(data: bytes, engine: str = PDF_EXTRACTION_ENGINE) -> Iterator[Union[str, LayoutPage]]:
         """
+        Lazily extracts each page of the provided PDF with the given extraction engine, in page order.
 
-        return html_str
+        The "text" engine yields the text of each page like `iter_text_from_pdf`. The "layout" engine yields
+        a LayoutPage per page, with the course rows read from the word positions. Both can be passed to
+        TranscriptParser.
+
+        Args:
+            data (bytes): The raw bytes of the PDF file.
+            engine (str): "text" or "layout".
+
+        Yields:
+            str | LayoutPage: Each extracted page.
+        """
+        if engine not in PDF_EXTRACTION_ENGINES:
+            raise ValueError(f"Unknown PDF extraction engine: {engine}")
+        return timed_iter(f"extract_{engine}_from_pdf", PdfUtilities._iter_pages(data, engine))
+
+    @staticmethod
+    def preload():
+        """
+        Imports pdfplumber ahead of the first extraction, e.g. before forking server workers.
+        """
+        import pdfplumber  # noqa: F401
+
+    @staticmethod
+    def shutdown():
+        """
+        Stops the page extraction processes of this process, if any were started.
+        """
+        _shutdown_extract_executor()
+
+    @staticmethod
+    def _iter_pages(data: bytes, engine: str) -> Iterator[Union[str, LayoutPage]]:
+        # pdfplumber and pdfminer are imported on first use, since they are slow to import
+        import pdfplumber
+        # BytesIO shares the buffer of an immutable bytes object instead of copying it
+        with pdfplumber.open(io.BytesIO(data)) as pdf:
+            page_count = len(pdf.pages)
+            executor = None
+            if PDF_EXTRACT_PROCESSES > 0 and page_count >= max(2, PDF_EXTRACT_MIN_PAGES):
+                executor = _get_extract_executor()
+            if executor is None:
+                for page in pdf.pages:
+                    yield _extract_page(page, engine)
+                    page.flush_cache()
+                return
+
+        # Contiguous page ranges, one per process, consumed in order
+        chunk_size = -(-page_count // PDF_EXTRACT_PROCESSES)
+        futures = [executor.submit(_extract_page_range, data, start, min(start + chunk_size, page_count), engine)
+                   for start in range(0, page_count, chunk_size)]
+        try:
+            for future in futures:
+                yield from future.result()
+        finally:
+            for future in futures:
+                future.cancel()
 
     @staticmethod
-    def delete_file(file_path: str):
-        os.remove(file_path)
+    def extract_text_from_pdf(data: bytes) -> List[str]:
+        """
+        Extracts the text of every page of the provided PDF.
+
+        Args:
+            data (bytes): The raw bytes of the PDF file.
+
+        Returns:
+            List[str]: The extracted text, one string per page.
+        """
+        return list(PdfUtilities.iter_text_from_pdf(data))
+
+    @staticmethod
+    def create_html_string_for_transcript(transcript: Transcript) -> str:
+        """
+        Creates an HTML string representing the provided transcript.
+
+        Args:
+            transcript (Transcript): The transcript object containing the student and course information.
+
+        Returns:
+            str: The HTML string representing the transcript.
+        """
+        return html_utilities.create_html_string_for_transcript(transcript)
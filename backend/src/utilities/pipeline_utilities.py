@@ -0,0 +1,308 @@
+import os
+import time
+import asyncio
+import logging
+from contextlib import contextmanager
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional
+from dotenv import load_dotenv
+from src.database.database import engine, SessionLocal
+from src.database.database_cache import course_title_cache
+from src.database.database_counter import usage_counter
+from src.database.database_index import course_catalog_index
+from .cache_utilities import compute_cache_key, rendered_pdf_cache
+from .export_utilities import DEFAULT_OUTPUT_FORMAT, OUTPUT_FORMATS
+from .history_utilities import transcript_history
+from .metrics_utilities import PIPELINE_REQUESTS, PIPELINE_STAGE_SECONDS, profile_current_thread
+from .pdf_utilities import PdfUtilities
+from .render_utilities import transcript_renderer
+from .singleflight_utilities import AsyncSingleFlight
+from .transcript_utilities import Transcript, TranscriptParser
+
+load_dotenv()
+
+# "thread" or "process"
+PIPELINE_EXECUTOR = os.getenv("PIPELINE_EXECUTOR", "thread")
+PIPELINE_MAX_WORKERS = int(os.getenv("PIPELINE_MAX_WORKERS", os.cpu_count() or 1))
+PIPELINE_MAX_QUEUE = int(os.getenv("PIPELINE_MAX_QUEUE", 16))
+PIPELINE_RETRY_AFTER = int(os.getenv("PIPELINE_RETRY_AFTER", 5))
+
+PIPELINE_STAGES = ["cache", "extract", "parse", "render"]
+
+class QueueFullError(Exception):
+    """
+    Raised when the transcript pipeline cannot admit another request.
+
+    Attributes:
+        retry_after (int): Suggested number of seconds the client should wait before retrying.
+    """
+    def __init__(self, retry_after: int):
+        super().__init__("Transcript pipeline queue is full")
+        self.retry_after = retry_after
+
+class StageTimer:
+    """
+    Records the wall-clock duration of each named stage of a single pipeline run.
+    """
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - start
+
+    def iter_stage(self, name: str, iterable: Iterable) -> Iterator:
+        """
+        Wraps a lazy iterable, adding the time spent producing its items to the named stage.
+        """
+        iterator = iter(iterable)
+        self.timings.setdefault(name, 0.0)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.timings[name] += time.perf_counter() - start
+            yield item
+
+class PipelineResult(NamedTuple):
+    # None when the requested format is built from the transcript instead
+    pdf: Optional[bytes]
+    filename: str
+    timings: Dict[str, float]
+    # Collapsed stacks of the run, when it was profiled
+    profile: Optional[str] = None
+    # The parsed transcript with its titles resolved, when the requested format is not rendered
+    transcript: Optional[Transcript] = None
+
+def run_transcript_pipeline(data: bytes, profile: bool = False, output_format: str = DEFAULT_OUTPUT_FORMAT,
+                            cache_key: str = None) -> PipelineResult:
+    """
+    Runs the blocking extract -> parse -> render chain for one uploaded transcript.
+
+    Formats that are not rendered (see OUTPUT_FORMATS) stop after parsing and return the transcript, which
+    the caller turns into the response as it is sent.
+
+    A transcript that was rendered recently is served from the rendered PDF cache instead. When the
+    student generated a transcript recently, only the sessions that changed since then have their
+    titles resolved and their HTML rendered.
+
+    This is a module level function so that it can be sent to either a thread or a process pool.
+
+    Args:
+        data (bytes): The raw bytes of the uploaded transcript PDF.
+        profile (bool): Whether to sample the call stacks of the run.
+        output_format (str): The name of the output format.
+        cache_key (str): The `compute_cache_key` of the upload, if the caller already computed it.
+
+    Returns:
+        PipelineResult: The generated PDF or the transcript, the download filename, the per-stage timings and the profile.
+    """
+    rendered = OUTPUT_FORMATS[output_format].rendered
+    transcript = None
+    timer = StageTimer()
+    db = SessionLocal()
+    try:
+        with profile_current_thread(profile) as stacks:
+            with timer.stage("cache"):
+                if cache_key is None:
+                    cache_key = compute_cache_key(data, transcript_renderer.backend)
+                cached = rendered_pdf_cache.get(cache_key) if rendered else None
+
+            if cached is not None:
+                pdf, filename = cached.content, cached.filename
+            else:
+                # Pages are parsed as they are extracted, the time spent extracting is split out of "parse"
+                with timer.stage("parse"):
+                    pages = timer.iter_stage("extract", PdfUtilities.iter_pages_from_pdf(data))
+                    parser = TranscriptParser(db, pages)
+                    transcript = parser.parse(resolve_titles=False)
+                    transcript_history.resolve_course_titles(transcript, parser.resolve_course_titles)
+                timer.timings["parse"] -= timer.timings.get("extract", 0.0)
+
+                pdf = None
+                if rendered:
+                    with timer.stage("render"):
+                        pdf = transcript.generate_transcript_pdf(cache_key=cache_key)
+                filename = transcript.filename(OUTPUT_FORMATS[output_format].extension)
+                transcript_history.remember(transcript)
+    finally:
+        db.close()
+
+    return PipelineResult(pdf, filename, timer.timings, stacks[0] if stacks else None,
+                          None if rendered else transcript)
+
+def _init_worker_process():
+    # Pooled connections inherited from the parent must not be shared with the child.
+    engine.dispose(close=False)
+
+    # Titles are read from the shared index when there is one, otherwise each worker process warms its own cache
+    if len(course_catalog_index):
+        return
+    db = SessionLocal()
+    try:
+        course_title_cache.warm(db)
+    finally:
+        db.close()
+
+class TranscriptPipelineExecutor:
+    """
+    Runs `run_transcript_pipeline` off the event loop on a bounded worker pool.
+
+    At most `max_workers` transcripts are processed at once and at most `max_queue` more wait
+    for a free worker. Anything beyond that is rejected with `QueueFullError` instead of piling up.
+
+    Identical uploads that arrive while one of them is still being processed share its run rather than
+    each taking a worker, e.g. when a student presses the button twice or retries a slow request.
+
+    Attributes:
+        mode (str): "thread" or "process".
+        max_workers (int): The number of pool workers.
+        max_queue (int): The number of admitted requests allowed to wait for a worker.
+        retry_after (int): The Retry-After value suggested when the queue is full.
+    """
+    def __init__(self, mode: str = PIPELINE_EXECUTOR, max_workers: int = PIPELINE_MAX_WORKERS,
+                 max_queue: int = PIPELINE_MAX_QUEUE, retry_after: int = PIPELINE_RETRY_AFTER):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown pipeline executor mode: {mode}")
+
+        self.mode = mode
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        self._executor: Executor = None
+        # Only touched from the event loop thread, so plain counters are enough.
+        self._admitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._deduplicated = 0
+        self._in_flight = AsyncSingleFlight()
+        self._stage_stats = {stage: {"count": 0, "total": 0.0, "max": 0.0}
+                             for stage in PIPELINE_STAGES + ["queue_wait", "total"]}
+
+    def start(self):
+        if self._executor is not None:
+            return
+
+        if self.mode == "process":
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker_process)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="transcript")
+
+        logging.info(f"Transcript pipeline started. Mode: {self.mode} Workers: {self.max_workers} Queue: {self.max_queue}")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self._admitted - self.max_workers)
+
+    async def run(self, data: bytes, profile: bool = False, output_format: str = DEFAULT_OUTPUT_FORMAT) -> PipelineResult:
+        """
+        Admits one transcript into the pool and waits for its result.
+
+        If the same bytes are already being processed into the same format, waits for that run instead.
+        Profiled runs are never shared, so each gets its own profile.
+
+        Args:
+            data (bytes): The raw bytes of the uploaded transcript PDF.
+            profile (bool): Whether to sample the call stacks of the run.
+            output_format (str): The name of the output format.
+
+        Returns:
+            PipelineResult: The generated PDF or the transcript, the download filename, the per-stage timings and the profile.
+
+        Raises:
+            QueueFullError: If every worker is busy and the admission queue is full.
+        """
+        # Hashed off the event loop, since uploads can be megabytes. The pipeline reuses the key.
+        loop = asyncio.get_running_loop()
+        cache_key = await loop.run_in_executor(None, compute_cache_key, data, transcript_renderer.backend)
+
+        if profile:
+            result = await self._run(data, profile, output_format, cache_key)
+        else:
+            result, shared = await self._in_flight.do((cache_key, output_format),
+                                                      lambda: self._run(data, False, output_format, cache_key))
+            if shared:
+                self._deduplicated += 1
+                PIPELINE_REQUESTS.inc(outcome="deduplicated")
+                result = result._replace(timings=dict(result.timings))
+
+        # Counted here rather than in the pipeline, so counts from worker processes are not lost
+        usage_counter.increment()
+        return result
+
+    async def _run(self, data: bytes, profile: bool, output_format: str, cache_key: str) -> PipelineResult:
+        if self._admitted >= self.max_workers + self.max_queue:
+            self._rejected += 1
+            PIPELINE_REQUESTS.inc(outcome="rejected")
+            logging.warning(f"Rejected transcript request. Queue depth: {self.queue_depth}")
+            raise QueueFullError(self.retry_after)
+
+        self.start()
+        self._admitted += 1
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor, run_transcript_pipeline, data, profile,
+                                                output_format, cache_key)
+        except Exception:
+            self._failed += 1
+            PIPELINE_REQUESTS.inc(outcome="failed")
+            raise
+        finally:
+            self._admitted -= 1
+
+        total = time.perf_counter() - start
+        timings = result.timings
+        timings["total"] = total
+        timings["queue_wait"] = max(0.0, total - sum(timings.get(stage, 0.0) for stage in PIPELINE_STAGES))
+        self._record(timings)
+        self._completed += 1
+        PIPELINE_REQUESTS.inc(outcome="completed")
+
+        logging.info("Generated transcript. " + " ".join(f"{k}: {v:.3f}s" for k, v in timings.items()))
+        return result
+
+    def _record(self, timings: Dict[str, float]):
+        for stage, duration in timings.items():
+            stats = self._stage_stats.setdefault(stage, {"count": 0, "total": 0.0, "max": 0.0})
+            stats["count"] += 1
+            stats["total"] += duration
+            stats["max"] = max(stats["max"], duration)
+            PIPELINE_STAGE_SECONDS.observe(duration, stage=stage)
+
+    def stats(self) -> Dict:
+        """
+        Returns the current queue depth, request counters and per-stage timing summaries.
+        """
+        return {
+            "mode": self.mode,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": min(self._admitted, self.max_workers),
+            "queue_depth": self.queue_depth,
+            "completed": self._completed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+            "deduplicated": self._deduplicated,
+            "stages": {
+                stage: {
+                    "count": s["count"],
+                    "avg_seconds": s["total"] / s["count"] if s["count"] else 0.0,
+                    "max_seconds": s["max"],
+                }
+                for stage, s in self._stage_stats.items()
+            },
+        }
@@ -0,0 +1,330 @@
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+from types import SimpleNamespace
+from typing import Dict, List, Tuple
+from dotenv import load_dotenv
+from .course_utilities import Course
+from .html_utilities import TRANSCRIPT_STYLESHEET, create_html_string_for_transcript
+
+load_dotenv()
+
+# "weasyprint" or "direct"
+PDF_RENDER_BACKEND = os.getenv("PDF_RENDER_BACKEND", "weasyprint")
+# 0 renders in the calling thread, more than 0 renders on that many dedicated, pre-started processes
+PDF_RENDER_PROCESSES = int(os.getenv("PDF_RENDER_PROCESSES", 0))
+
+# Rendered once when a renderer is warmed up, so fonts and layout caches are loaded before real traffic
+_WARM_UP_TRANSCRIPT = SimpleNamespace(
+    student_surname="Warm", student_given_name="Up", student_number="0",
+    courses={"2020W": [Course("2020W", "101", "1", "MATH", "100", "3.0", "Warm Up", "90", "A+", "70", "1", "")]},
+)
+
+class WeasyPrintRenderer:
+    """
+    Renders transcripts with WeasyPrint.
+
+    The stylesheet is parsed once and the font configuration is shared by every render, instead of
+    both being rebuilt for each document. WeasyPrint does not document either as thread-safe, so a
+    renderer must only be used by one thread.
+    """
+    name = "weasyprint"
+    thread_safe = False
+
+    def __init__(self):
+        from weasyprint import CSS
+        from weasyprint.text.fonts import FontConfiguration
+
+        self.font_config = FontConfiguration()
+        self.stylesheet = CSS(string=TRANSCRIPT_STYLESHEET, font_config=self.font_config)
+
+    def render(self, transcript) -> bytes:
+        from weasyprint import HTML
+
+        html_str = create_html_string_for_transcript(transcript, inline_stylesheet=False)
+        return HTML(string=html_str).write_pdf(stylesheets=[self.stylesheet], font_config=self.font_config)
+
+class DirectPdfRenderer:
+    """
+    Writes the transcript table straight to PDF without an HTML layout engine.
+
+    The transcript is a single fixed table, so the PDF is laid out by hand on landscape Letter pages
+    with the standard Helvetica fonts, which PDF readers provide and which need no embedding. Text that
+    does not fit its column is truncated.
+    """
+    name = "direct"
+    # Keeps no state between renders
+    thread_safe = True
+
+    PAGE_WIDTH = 792
+    PAGE_HEIGHT = 612
+    MARGIN = 36
+    FONT_SIZE = 8
+    ROW_HEIGHT = 14
+    CELL_PADDING = 3
+    # Average Helvetica glyph width relative to the font size, used to decide where to truncate
+    AVERAGE_GLYPH_WIDTH = 0.52
+    COLUMNS: List[Tuple[str, int]] = [
+        ("Term", 32), ("Course Code", 70), ("Credit", 40), ("Title", 296), ("Numeric Grade", 66),
+        ("Letter Grade", 62), ("Average", 50), ("Year", 34), ("Standing", 70),
+    ]
+
+    def render(self, transcript) -> bytes:
+        rows: List[Tuple[str, List[str]]] = []
+        for session, course_list in transcript.courses.items():
+            rows.append(("session", [f"Session: {session}"]))
+            for course in course_list:
+                rows.append(("course", [course.term, f"{course.subject} {course.code}", course.credit, course.title,
+                                        course.num_grade, course.letter_grade, course.average, course.year,
+                                        course.standing]))
+
+        pages = []
+        top = self.PAGE_HEIGHT - self.MARGIN
+        commands = self._title(transcript, top)
+        y = top - 64
+        commands += self._header_row(y)
+        y -= self.ROW_HEIGHT
+        for kind, cells in rows:
+            if y < self.MARGIN:
+                pages.append("\n".join(commands))
+                commands = self._header_row(top)
+                y = top - self.ROW_HEIGHT
+            commands += self._session_row(y, cells[0]) if kind == "session" else self._course_row(y, cells)
+            y -= self.ROW_HEIGHT
+        pages.append("\n".join(commands))
+
+        return write_pdf(pages, self.PAGE_WIDTH, self.PAGE_HEIGHT)
+
+    @staticmethod
+    def _escape(text: str) -> str:
+        text = text.encode("cp1252", errors="replace").decode("latin-1")
+        return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    def _fit(self, text: str, width: int) -> str:
+        max_chars = int((width - 2 * self.CELL_PADDING) / (self.FONT_SIZE * self.AVERAGE_GLYPH_WIDTH))
+        return text if len(text) <= max_chars else text[:max(0, max_chars - 3)] + "..."
+
+    def _text(self, x: float, y: float, text: str, font: str = "F1", size: int = FONT_SIZE) -> str:
+        return f"BT /{font} {size} Tf {x:.2f} {y:.2f} Td ({self._escape(text)}) Tj ET"
+
+    def _title(self, transcript, top: int) -> List[str]:
+        return [
+            self._text(self.MARGIN, top - 16, "Transcript", font="F2", size=16),
+            self._text(self.MARGIN, top - 36, f"Name: {transcript.student_given_name} {transcript.student_surname}", size=10),
+            self._text(self.MARGIN, top - 50, f"ID: {transcript.student_number}", size=10),
+        ]
+
+    def _cells(self, y: float, cells: List[str], font: str) -> List[str]:
+        commands = []
+        x = self.MARGIN
+        for (_, width), cell in zip(self.COLUMNS, cells):
+            commands.append(f"{x} {y - self.ROW_HEIGHT} {width} {self.ROW_HEIGHT} re S")
+            if cell:
+                commands.append(self._text(x + self.CELL_PADDING, y - self.ROW_HEIGHT + 4, self._fit(cell, width), font=font))
+            x += width
+        return commands
+
+    def _header_row(self, y: float) -> List[str]:
+        table_width = sum(width for _, width in self.COLUMNS)
+        fill = f"0.949 g {self.MARGIN} {y - self.ROW_HEIGHT} {table_width} {self.ROW_HEIGHT} re f 0 g"
+        return [fill] + self._cells(y, [name for name, _ in self.COLUMNS], font="F2")
+
+    def _course_row(self, y: float, cells: List[str]) -> List[str]:
+        return self._cells(y, cells, font="F1")
+
+    def _session_row(self, y: float, text: str) -> List[str]:
+        table_width = sum(width for _, width in self.COLUMNS)
+        return [
+            f"{self.MARGIN} {y - self.ROW_HEIGHT} {table_width} {self.ROW_HEIGHT} re S",
+            self._text(self.MARGIN + self.CELL_PADDING, y - self.ROW_HEIGHT + 4, self._fit(text, table_width), font="F2"),
+        ]
+
+def write_pdf(pages: List[str], width: int = DirectPdfRenderer.PAGE_WIDTH, height: int = DirectPdfRenderer.PAGE_HEIGHT) -> bytes:
+    """
+    Writes a PDF whose pages are drawn by raw content stream commands.
+
+    The font resources /F1 (Helvetica) and /F2 (Helvetica-Bold) are available to every page, with
+    WinAnsi encoding.
+
+    Args:
+        pages (List[str]): The content stream of each page.
+        width (int): The page width in points.
+        height (int): The page height in points.
+
+    Returns:
+        bytes: The content of the PDF.
+    """
+    # Objects: 1 catalog, 2 page tree, 3 regular font, 4 bold font, then a page and its content per page
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+    ]
+    page_ids = []
+    for content in pages:
+        stream = content.encode("latin-1")
+        page_id = len(objects) + 1
+        page_ids.append(page_id)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width} {height}] "
+            f"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {page_id + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>".encode()
+
+    output = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(output)
+
+RENDER_BACKENDS = {
+    WeasyPrintRenderer.name: WeasyPrintRenderer,
+    DirectPdfRenderer.name: DirectPdfRenderer,
+}
+
+def create_renderer(backend: str):
+    if backend not in RENDER_BACKENDS:
+        raise ValueError(f"Unknown PDF render backend: {backend}")
+    return RENDER_BACKENDS[backend]()
+
+# The renderer of a dedicated render process
+_process_renderer = None
+
+def _init_render_process(backend: str):
+    global _process_renderer
+    _process_renderer = create_renderer(backend)
+    _process_renderer.render(_WARM_UP_TRANSCRIPT)
+
+def _render_in_process(transcript) -> bytes:
+    return _process_renderer.render(transcript)
+
+def _warm_up_process():
+    return os.getpid()
+
+class TranscriptRenderer:
+    """
+    A long-lived PDF rendering service.
+
+    The backend renderer is built once and reused for every transcript. Backends that are not
+    thread-safe get one renderer per rendering thread instead, built on the thread's first render. With
+    `processes` set, rendering runs on that many dedicated processes that are started and warmed up by
+    `start()`. This is meant for the thread pipeline mode. Worker processes of the pipeline and batch pools
+    render in-process, even if they inherited the render processes of their parent, since a forked process
+    inherits the pool but not the thread that manages it.
+
+    Attributes:
+        backend (str): "weasyprint" or "direct".
+        processes (int): The number of dedicated render processes, 0 to render in the calling thread.
+    """
+    def __init__(self, backend: str = PDF_RENDER_BACKEND, processes: int = PDF_RENDER_PROCESSES):
+        if backend not in RENDER_BACKENDS:
+            raise ValueError(f"Unknown PDF render backend: {backend}")
+
+        self.backend = backend
+        self.processes = processes
+        self._renderer = None
+        self._thread_renderers = threading.local()
+        self._executor: ProcessPoolExecutor = None
+        self._executor_pid: int = None
+        self._lock = threading.Lock()
+        self._renders = 0
+        self._total_seconds = 0.0
+        self._max_seconds = 0.0
+        self._last_seconds = 0.0
+
+    def start(self):
+        """
+        Builds and warms up the renderer, or starts and warms up the render processes. Does nothing if
+        they are already started.
+        """
+        with self._lock:
+            if self._uses_processes():
+                if self._owns_executor():
+                    return
+                self._executor = ProcessPoolExecutor(max_workers=self.processes, initializer=_init_render_process,
+                                                     initargs=(self.backend,))
+                self._executor_pid = os.getpid()
+                # Submitted together, so each one starts its own worker
+                wait([self._executor.submit(_warm_up_process) for _ in range(self.processes)])
+            else:
+                if self._renderer is not None:
+                    return
+                self._renderer = create_renderer(self.backend)
+                self._renderer.render(_WARM_UP_TRANSCRIPT)
+
+        logging.info(f"PDF renderer started. Backend: {self.backend} "
+                     f"Processes: {self.processes if self._uses_processes() else 0}")
+
+    def _uses_processes(self) -> bool:
+        # Workers of another process pool render in-process rather than starting a nested pool
+        return self.processes > 0 and multiprocessing.parent_process() is None
+
+    def _owns_executor(self) -> bool:
+        return self._executor is not None and self._executor_pid == os.getpid()
+
+    def shutdown(self):
+        with self._lock:
+            if self._owns_executor():
+                self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def render(self, transcript) -> bytes:
+        """
+        Renders a transcript into a PDF.
+
+        Args:
+            transcript (Transcript): The transcript to render.
+
+        Returns:
+            bytes: The content of the generated PDF.
+        """
+        uses_processes = self._uses_processes()
+        if not (self._owns_executor() if uses_processes else self._renderer is not None):
+            self.start()
+
+        start = time.perf_counter()
+        if uses_processes:
+            pdf = self._executor.submit(_render_in_process, transcript).result()
+        else:
+            pdf = self._thread_renderer().render(transcript)
+        self._record(time.perf_counter() - start)
+        return pdf
+
+    def _thread_renderer(self):
+        if self._renderer.thread_safe:
+            return self._renderer
+
+        renderer = getattr(self._thread_renderers, "renderer", None)
+        if renderer is None:
+            renderer = self._thread_renderers.renderer = create_renderer(self.backend)
+        return renderer
+
+    def _record(self, seconds: float):
+        with self._lock:
+            self._renders += 1
+            self._total_seconds += seconds
+            self._max_seconds = max(self._max_seconds, seconds)
+            self._last_seconds = seconds
+
+    def stats(self) -> Dict:
+        return {
+            "backend": self.backend,
+            "processes": self.processes,
+            "renders": self._renders,
+            "avg_seconds": self._total_seconds / self._renders if self._renders else 0.0,
+            "max_seconds": self._max_seconds,
+            "last_seconds": self._last_seconds,
+        }
+
+transcript_renderer = TranscriptRenderer()
@@ -0,0 +1,64 @@
+import os
+from typing import Dict
+from dotenv import load_dotenv
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+
+load_dotenv()
+
+# Room for the multipart boundaries and part headers around an uploaded file
+MULTIPART_OVERHEAD = int(os.getenv("MULTIPART_OVERHEAD", 64 * 1024))
+
+class RequestTooLargeError(HTTPException):
+    """
+    Raised while a request body is received, once it grows past the size limit of its path.
+
+    Attributes:
+        max_size (int): The maximum accepted body size in bytes.
+    """
+    def __init__(self, max_size: int):
+        super().__init__(status_code=413, detail=f"Request is larger than {max_size} bytes")
+        self.max_size = max_size
+
+class RequestSizeLimitMiddleware:
+    """
+    Limits the size of request bodies before they are parsed.
+
+    Starlette receives and parses a whole multipart body before an endpoint runs, so a limit checked in
+    the endpoint only rejects an upload after all of it has arrived. This middleware rejects a request
+    whose Content-Length is over the limit of its path without reading the body, and stops reading a body
+    sent without one as soon as it grows past the limit by raising `RequestTooLargeError`.
+
+    Attributes:
+        limits (Dict[str, int]): The body size limit in bytes of each path.
+        default_limit (int): The body size limit of the other paths.
+    """
+    def __init__(self, app, limits: Dict[str, int], default_limit: int):
+        self.app = app
+        self.limits = limits
+        self.default_limit = default_limit
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.limits.get(scope["path"], self.default_limit)
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse(content={"error": f"Request is larger than {limit} bytes"}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_limited():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise RequestTooLargeError(limit)
+            return message
+
+        await self.app(scope, receive_limited, send)
@@ -0,0 +1,34 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+class AsyncSingleFlight:
+    """
+    Lets concurrent coroutines on one event loop that need the same key share one computation.
+
+    The first caller of a key starts the computation and callers that ask for the key while it is still
+    running await the same result, or the same exception, instead of computing it again. Nothing is cached:
+    once a computation finishes, the next call for its key starts a new one.
+
+    The computation runs as its own task, so a caller that is cancelled does not cancel it for the others.
+    Only use it from the event loop thread.
+    """
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    async def do(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Runs `compute()` for the key, or waits for the run that is already in flight.
+
+        Returns:
+            Tuple[Any, bool]: The result and whether it was shared from another caller's run.
+        """
+        task = self._tasks.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(compute())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._tasks.pop(key) if self._tasks.get(key) is done else None)
+        return await asyncio.shield(task), shared
@@ -0,0 +1,186 @@
+import os
+import re
+import sys
+import time
+import signal
+import socket
+import logging
+import subprocess
+import uvicorn
+from typing import Callable, Dict, List, NamedTuple, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", os.cpu_count() or 1))
+SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", 2048))
+# A worker that exits sooner than this after starting is respawned after a delay, to avoid a crash loop
+SERVER_MIN_WORKER_UPTIME = float(os.getenv("SERVER_MIN_WORKER_UPTIME", 1))
+
+IMPORT_TIME_PATTERN = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+class PreforkServer:
+    """
+    Serves an ASGI app from several forked uvicorn workers that share one listening socket.
+
+    The app is imported and warmed up once in the parent, before the socket is bound, so every worker
+    starts with the imported modules and warmed caches already in memory (shared copy-on-write) and no
+    traffic is accepted before warm-up finishes. Each worker then runs the app's lifespan, which starts
+    its threads and process pools. Workers that exit unexpectedly are respawned. SIGINT and SIGTERM are
+    forwarded to the workers, which finish their in-flight requests before exiting.
+
+    Anything started by the warm-up is inherited by every worker, so it must not start threads or
+    processes or leave connections open.
+
+    Attributes:
+        app: The ASGI app.
+        host (str): The address to bind.
+        port (int): The port to bind.
+        workers (int): The number of worker processes.
+        warm_up (Callable[[], None]): Called once in the parent before forking, if set.
+    """
+    def __init__(self, app, host: str = "0.0.0.0", port: int = 8000, workers: int = SERVER_WORKERS,
+                 warm_up: Callable[[], None] = None, backlog: int = SERVER_BACKLOG):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = max(1, workers)
+        self.warm_up = warm_up
+        self.backlog = backlog
+        self._socket: socket.socket = None
+        self._children: Dict[int, float] = {}
+        self._stopping = False
+
+    def run(self):
+        if self.warm_up is not None:
+            start = time.perf_counter()
+            self.warm_up()
+            logging.info(f"Warmed up in {time.perf_counter() - start:.2f}s")
+
+        self._socket = self._bind()
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        logging.info(f"Serving on {self.host}:{self.port} with {self.workers} workers. Parent: {os.getpid()}")
+
+        for _ in range(self.workers):
+            self._spawn()
+
+        while self._children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+
+            started_at = self._children.pop(pid, None)
+            if started_at is None or self._stopping:
+                continue
+
+            logging.warning(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, respawning")
+            if time.monotonic() - started_at < SERVER_MIN_WORKER_UPTIME:
+                time.sleep(SERVER_MIN_WORKER_UPTIME)
+            if not self._stopping:
+                self._spawn()
+
+        self._socket.close()
+        logging.info("Server stopped")
+
+    def _bind(self) -> socket.socket:
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(self.backlog)
+        sock.set_inheritable(True)
+        return sock
+
+    def _spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker()
+        self._children[pid] = time.monotonic()
+
+    def _run_worker(self):
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        exit_code = 0
+        try:
+            server = uvicorn.Server(uvicorn.Config(self.app, lifespan="on"))
+            server.run(sockets=[self._socket])
+        except BaseException:
+            logging.exception(f"Worker {os.getpid()} failed")
+            exit_code = 1
+        finally:
+            logging.shutdown()
+            os._exit(exit_code)
+
+    def _handle_stop(self, signum, frame):
+        if self._stopping:
+            return
+
+        self._stopping = True
+        logging.info(f"Received {signal.Signals(signum).name}, stopping {len(self._children)} workers")
+        for pid in self._children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+class ImportTime(NamedTuple):
+    module: str
+    self_seconds: float
+    cumulative_seconds: float
+    depth: int
+
+def measure_import_times(module: str) -> List[ImportTime]:
+    """
+    Imports a module in a fresh interpreter with `-X importtime` and parses the report.
+
+    Args:
+        module (str): The dotted name of the module to import, e.g. 'src.main'.
+
+    Returns:
+        List[ImportTime]: One entry per imported module, in the order the imports finished.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Failed to import {module}:\n{result.stderr}")
+
+    times = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_PATTERN.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            times.append(ImportTime(name, int(self_us) / 1e6, int(cumulative_us) / 1e6, len(indent) // 2))
+    return times
+
+def import_time_report(module: str = "src.main", top: int = 20) -> Tuple[float, str]:
+    """
+    Builds a report of the slowest imports of a module.
+
+    Args:
+        module (str): The dotted name of the module to import.
+        top (int): The number of modules listed.
+
+    Returns:
+        Tuple[float, str]: The total import time of the module in seconds and the report.
+    """
+    times = measure_import_times(module)
+    end = next((index for index, entry in enumerate(times) if entry.module == module), None)
+    if end is None:
+        return 0.0, f"{module} was already imported at interpreter startup"
+
+    # The modules imported by the module are listed right before it, nested one level deeper or more
+    start = end
+    while start > 0 and times[start - 1].depth > times[end].depth:
+        start -= 1
+    total = times[end].cumulative_seconds
+
+    # Its direct imports and the modules of this repo are what a slow import can be blamed on
+    blamed = [entry for entry in times[start:end] if entry.depth == times[end].depth + 1 or entry.module.startswith("src.")]
+    blamed.sort(key=lambda entry: entry.cumulative_seconds, reverse=True)
+
+    lines = [f"Import time of {module}: {total * 1e3:.1f}ms", f"{'cumulative (ms)':>16}{'self (ms)':>12}  module"]
+    lines += [f"{entry.cumulative_seconds * 1e3:>16.1f}{entry.self_seconds * 1e3:>12.1f}  {entry.module}"
+              for entry in blamed[:top]]
+    return total, "\n".join(lines)
@@ -1,11 +1,13 @@
-import re
 import logging
-import tempfile
-from src.database.database_crud import get_course_title
-from typing import Dict, List
+from dataclasses import replace
+from src.database.database_crud import get_course_titles
+from typing import Dict, Iterable, List
+from .cache_utilities import rendered_pdf_cache
 from .course_utilities import Course
+from .metrics_utilities import span
+from .parser_utilities import STUDENT_DATA_PATTERN, split_page
+from .render_utilities import transcript_renderer
 from sqlalchemy.orm import Session
-from weasyprint import HTML
 
 class Transcript:
     """
@@ -16,17 +18,21 @@ class Transcript:
         student_given_name (str): The student's given name.
         student_number (str): The student's unique identification number.
         courses (dict): A dictionary containing the student's courses, grouped by session.
+        session_html (dict): The rendered HTML table rows of each session, filled in as they are rendered.
 
     Methods:
         __str__(): Returns a string representation of the transcript.
         add_course(session, course): Adds a course to the transcript under a given session.
         generate_transcript_pdf(): Generates a PDF version of the transcript.
+        pdf_filename: The download filename of the generated PDF.
+        filename(extension): The download filename of the transcript in another format.
     """
     def __init__(self, student_surname, student_given_name, student_number, courses):
         self.student_surname = student_surname
         self.student_given_name = student_given_name
         self.student_number = student_number
         self.courses = courses
+        self.session_html: Dict[str, str] = {}
 
     def __str__(self):
         s = "==================================================================\n"
@@ -46,56 +52,113 @@ class Transcript:
         else:
             self.courses[session] = [course]
     
-    def generate_transcript_pdf(self) -> str:
-        from .pdf_utilities import PdfUtilities
+    @property
+    def pdf_filename(self) -> str:
+        return self.filename("pdf")
 
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-        pdf_file_path = temp_file.name
+    def filename(self, extension: str) -> str:
+        return f"{self.student_given_name}_{self.student_surname}_{self.student_number}_transcript.{extension}"
 
-        html_str = PdfUtilities.create_html_string_for_transcript(self)
+    def generate_transcript_pdf(self, cache_key: str = None) -> bytes:
+        """
+        Renders the transcript into a PDF in memory.
 
-        HTML(string=html_str).write_pdf(pdf_file_path)
+        Args:
+            cache_key (str): If given, the rendered PDF is also stored in the rendered PDF cache under this key.
 
-        return pdf_file_path
+        Returns:
+            bytes: The content of the generated PDF.
+        """
+        with span("generate_transcript_pdf"):
+            pdf = transcript_renderer.render(self)
+
+        if cache_key is not None:
+            rendered_pdf_cache.put(cache_key, pdf, self.pdf_filename)
+
+        return pdf
 
 class TranscriptParser:
     """
     Parses raw student data to create a Transcript object.
 
     Attributes:
-        data (List[str]): The raw student data as a list of strings.
+        data (Iterable[str | LayoutPage]): The raw student data, one extracted page at a time.
         db (Session): A database session for additional data retrieval.
 
     Methods:
         parse(): Parses the raw data and returns a Transcript object.
         parse_student_data(): Extracts and returns student information from the raw data.
+        parse_course_data(): Extracts and returns the courses from the raw data, grouped by session.
+        resolve_course_titles(courses): Fills in the titles of the parsed courses.
     """
-    def __init__(self, db: Session, data: List[str]):
+    def __init__(self, db: Session, data: Iterable[str]):
         """
         Initializes the TranscriptParser with a database session and raw student data.
 
         Args:
             db (Session): The database session.
-            data (List[str]): The raw student data.
+            data (Iterable[str | LayoutPage]): The raw student data, one extracted page at a time.
         """
-        self.data: List[str] = data
+        self.data: Iterable = data
         self.db = db
 
-    def parse(self) -> Transcript:
+    def parse(self, resolve_titles: bool = True) -> Transcript:
         """
         Parses the raw student data to create and return a Transcript object.
 
+        The raw data is read in a single pass, so it can be a lazy iterator of pages that are still
+        being extracted.
+
+        Args:
+            resolve_titles (bool): Whether to fill in the course titles. Without it no database session is needed
+                and the titles can be resolved later with `resolve_course_titles`.
+
         Returns:
             Transcript: The parsed Transcript object.
         """
-        student_data = self.parse_student_data()
+        student_data = {}
+        courses = {}
+        with span("parse"):
+            for page in self.data:
+                text, rows = split_page(page)
+                if not student_data:
+                    student_data = self.match_student_data(text)
+                for course in rows:
+                    courses.setdefault(course.session, []).append(course)
+
+        if not any(student_data):
+            logging.error("Failed to retrieve student data.")
+            # TODO: Think about how to handle this case
+
         student_surname = student_data["student_surname"]
         student_given_name = student_data["student_given_name"]
         student_number = student_data["student_number"]
-        courses = self.parse_course_data()
+        if resolve_titles:
+            self.resolve_course_titles(courses)
 
         return Transcript(student_surname, student_given_name, student_number, courses)
 
+    @staticmethod
+    def match_student_data(page: str) -> Dict[str, str]:
+        """
+        Extracts the student's surname, given name, and student number from one page.
+
+        Args:
+            page (str): The text of a page.
+
+        Returns:
+            Dict[str, str]: The student data, or an empty dictionary if the page does not contain it.
+        """
+        match = STUDENT_DATA_PATTERN.search(page)
+        if not match:
+            return {}
+
+        return {
+            "student_surname": match.group(1).strip(),
+            "student_given_name": match.group(2).strip(),
+            "student_number": match.group(3).strip(),
+        }
+
     def parse_student_data(self) -> Dict[str, str]:
         """
         Extracts and returns the student's surname, given name, and student number
@@ -106,28 +169,9 @@ class TranscriptParser:
         """
         student_data = {}
 
-        # regex explanation
-        # Name:: This part of the pattern matches the exact string "Name:".
-        # (.*),: The (.*) part is a capturing group that matches any sequence of characters 
-        #       (. matches any character, and * means to match the preceding character zero or more times). 
-        #       The .* is followed by a comma which matches the comma separating the student's surname and given name. 
-        #       The (.*) in parentheses captures the matched surname.
-        # \s+: This part of the pattern matches one or more whitespace characters. 
-        #       \s matches any whitespace character (including spaces, tabs, and newlines), 
-        #       and + means to match the preceding character one or more times.
-        # (.*): Another capturing group, similar to the one described in surname group. 
-        #       This one captures the student's given name.
-        # \s+#:: This part matches one or more whitespace characters followed by the exact string "#:".
-        # (\d+): This part is another capturing group that matches one or more digits (0-9). 
-        #        \d matches any digit, and + means to match the preceding character one or more times. The (\d+) in parentheses captures the matched student number.
-        student_data_pattern = re.compile(r"Name:(.*),\s+(.*)\s+#:(\d+)")
-
         for d in self.data:
-            match = student_data_pattern.search(d)
-            if match:
-                student_data["student_surname"] = match.group(1).strip()
-                student_data["student_given_name"] = match.group(2).strip()
-                student_data["student_number"] = match.group(3).strip()
+            student_data = self.match_student_data(split_page(d)[0])
+            if student_data:
                 break
         
         if not any(student_data):
@@ -146,192 +190,27 @@ class TranscriptParser:
         """
         courses = {}
 
-        lines_list = self.split_extracted_data_to_lines()
-
-        # This pattern matches with a line that contains course grade info.
-        # If the lins contains course grade info, it starts with course code
-        # e.b. CPEN 221, WRDS 150B
-        course_info_line_pattern = r"^[A-Z]{4} \d{3}[A-Z]?"
-
-        for line in lines_list:
-            # TODO: Consider a better approach
-            if re.match(course_info_line_pattern, line):
-                words: List[str] = line.split()
-                word_count: int = len(words)
-
-                course: Course = None
-
-                match word_count:
-                    case 11:
-                        course = self.create_non_pass_fail_course(words)
-                    case 10:
-                        course = self.create_pass_fail_course_with_term(words)
-                    case 9:
-                        course = self.create_pass_fail_course_without_term(words)
-                    case 8:
-                        course = self.create_withdraw_course(words)
-                    case 6:
-                        course = self.create_in_progress_course(words)
-                    case _:
-                        course = None
-                        logging.error(f"Failed to parse course data. Please check transcript_utilities:parse_course_data. {line}")
-
-                if course:
-                    courses.setdefault(course.session, []).append(course)                
+        for page in self.data:
+            for course in split_page(page)[1]:
+                courses.setdefault(course.session, []).append(course)
 
         return courses
-    
-    # TODO: Refactor creater functions and make it cleaner
-    def create_non_pass_fail_course(self, words: List[str]):
-        """
-        Creates a Course object for non-pass/fail courses.
 
-        Args:
-            words (List[str]): The extracted words representing the course information.
-
-        Returns:
-            Course: The created Course object.
-        """
-        subject = words[0]
-        code = words[1] 
-        section = words[2]
-        num_grade = words[3]
-        # To log error in case PDF extractor failed to extract letter grade properly (e.g. Ac -or- A*)
-        if len(words[4]) == 2 and words[4][1] != "+" and words[4][1] != "-":
-            logging.error(f"Failed to parse course letter grade. Please check transcript_utilities:create_non_pass_fail_course. {words[4]}")
-        letter_grade = words[4]
-        session = words[5]
-        term = words[6]
-        year = words[8]
-        credit = words[9]
-        average = words[10]
-        standing = ""
-        title = get_course_title(db=self.db, subject=subject, code=code)
-        return Course(session=session, section=section, term=term, 
-                      subject=subject, code=code, credit=credit, 
-                      title=title, num_grade=num_grade, letter_grade=letter_grade, 
-                      average=average, year=year, standing=standing)
-
-    def create_pass_fail_course_with_term(self, words: List[str]):
-        """
-        Creates a Course object for pass/fail courses with term information.
-
-        Args:
-            words (List[str]): The extracted words representing the course information.
-
-        Returns:
-            Course: The created Course object.
-        """
-        subject = words[0]
-        code = words[1] 
-        section = words[2]
-        session = words[3]
-        term = words[4]
-        year = words[6]
-        credit = words[7]
-        standing = words[9]
-        average = "n/a"
-        num_grade = ""
-        letter_grade = ""
-        title = get_course_title(db=self.db, subject=subject, code=code)
-        return Course(session=session, section=section, term=term, 
-                      subject=subject, code=code, credit=credit, 
-                      title=title, num_grade=num_grade, letter_grade=letter_grade, 
-                      average=average, year=year, standing=standing)
-
-    def create_pass_fail_course_without_term(self, words: List[str]):
-        """
-        Creates a Course object for pass/fail courses without term information.
-
-        Args:
-            words (List[str]): The extracted words representing the course information.
-
-        Returns:
-            Course: The created Course object.
-        """
-        subject = words[0]
-        code = words[1] 
-        section = words[2]
-        session = words[3]
-        year = words[5]
-        credit = words[6]
-        standing = words[8]
-        average = "n/a"
-        term = ""
-        num_grade = ""
-        letter_grade = ""
-        title = get_course_title(db=self.db, subject=subject, code=code)
-        return Course(session=session, section=section, term=term, 
-                      subject=subject, code=code, credit=credit, 
-                      title=title, num_grade=num_grade, letter_grade=letter_grade, 
-                      average=average, year=year, standing=standing)
-
-    def create_in_progress_course(self, words: List[str]): 
+    def resolve_course_titles(self, courses: Dict[str, List[Course]]):
         """
-        Creates a Course object for courses that are in progress.
-
-        Args:
-            words (List[str]): The extracted words representing the course information.
+        Fills in the title of every parsed course.
 
-        Returns:
-            Course: The created Course object.
-        """
-        subject = words[0]
-        code = words[1] 
-        section = words[2]
-        session = words[3]
-        year = words[5]
-        title = get_course_title(db=self.db, subject=subject, code=code)
-        standing= "CIP"
-        credit = ""
-        average = ""
-        term= ""
-        num_grade = ""
-        letter_grade = ""
-        return Course(session=session, section=section, term=term, 
-                      subject=subject, code=code, credit=credit, 
-                      title=title, num_grade=num_grade, letter_grade=letter_grade, 
-                      average=average, year=year, standing=standing)
-
-    def create_withdraw_course(self, words: List[str]):
-        """
-        Creates a Course object for courses that have been withdrawn.
+        Titles are looked up once per distinct (subject, code) pair rather than once per course line,
+        so a course repeated across sessions costs a single lookup.
 
         Args:
-            words (List[str]): The extracted words representing the course information.
-
-        Returns:
-            Course: The created Course object.
+            courses (Dict[str, List[Course]]): The parsed courses, grouped by session.
         """
-        subject = words[0]
-        code = words[1] 
-        section = words[2]
-        session = words[3]
-        term = words[4]
-        year = words[6]
-        standing = words[7]
-        title = get_course_title(db=self.db, subject=subject, code=code)
-        credit = ""
-        num_grade = ""
-        letter_grade = ""
-        average = ""
-        return Course(session=session, section=section, term=term, 
-                      subject=subject, code=code, credit=credit, 
-                      title=title, num_grade=num_grade, letter_grade=letter_grade, 
-                      average=average, year=year, standing=standing)
-
-    def split_extracted_data_to_lines(self) -> List[str]:
-        """
-        Splits the extracted data into lines, ready for further parsing.
-
-        Returns:
-            List[str]: The list of lines extracted from the raw data.
-        """
-        lines_list: List[str] = []
-        for page in self.data:
-            lines = page.split("\n")
-            for line in lines:
-                lines_list.append(line)
+        titles = get_course_titles(db=self.db, courses={(course.subject, course.code)
+                                                         for session_courses in courses.values()
+                                                         for course in session_courses})
 
-        return lines_list
-       
+        # Courses are immutable, so each session's list is replaced with titled copies
+        for session, session_courses in courses.items():
+            courses[session] = [replace(course, title=titles.get((course.subject, course.code), ""))
+                                for course in session_courses]
@@ -0,0 +1,57 @@
+import io
+import asyncio
+import zipfile
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from src.utilities.batch_utilities import (BatchAdmission, BatchInputError, BatchItem, TranscriptBatch,
+                                           TranscriptBatchResponse, read_zip_items)
+
+def _zip(files) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+def test_pdf_files_are_read():
+    data = _zip({"a.pdf": b"%PDF a", "notes.txt": b"skipped", "nested/b.PDF": b"%PDF b"})
+    assert [(item.name, item.data) for item in read_zip_items(data)] == [("a.pdf", b"%PDF a"),
+                                                                         ("nested/b.PDF", b"%PDF b")]
+
+def test_oversized_file_is_kept_empty():
+    items = read_zip_items(_zip({"big.pdf": b"0" * 100, "small.pdf": b"0"}), max_size=10)
+    assert [(item.name, item.data) for item in items] == [("big.pdf", b""), ("small.pdf", b"0")]
+
+def test_archive_that_expands_past_the_total_limit_is_rejected():
+    # Compresses to a few KB, like a zip bomb
+    data = _zip({f"{index}.pdf": bytes(100_000) for index in range(10)})
+    with pytest.raises(BatchInputError):
+        read_zip_items(data, max_size=200_000, max_total_size=500_000)
+    assert len(read_zip_items(data, max_size=200_000, max_total_size=1_000_000)) == 10
+
+def test_too_many_files_are_rejected():
+    with pytest.raises(BatchInputError):
+        read_zip_items(_zip({f"{index}.pdf": b"%PDF" for index in range(3)}), max_files=2)
+
+def test_invalid_zip_is_rejected():
+    with pytest.raises(BatchInputError):
+        read_zip_items(b"not a zip")
+
+def test_admission_is_released_when_the_response_fails_before_the_first_chunk():
+    admission = BatchAdmission(max_batches=1)
+    admission.admit()
+    batch = TranscriptBatch([BatchItem("a.pdf", b"")], ThreadPoolExecutor(max_workers=1), admission=admission)
+
+    async def receive():
+        await asyncio.Event().wait()
+
+    async def send(message):
+        raise OSError("Client disconnected")
+
+    with pytest.raises(OSError):
+        asyncio.run(TranscriptBatchResponse(batch)({"type": "http"}, receive, send))
+    assert admission.stats()["running"] == 0
+    # Released once, even if the batch is closed again
+    batch.close()
+    assert admission.stats()["running"] == 0
+    admission.admit()
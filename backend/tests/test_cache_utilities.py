@@ -0,0 +1,53 @@
+import os
+import stat
+from src.utilities.cache_utilities import RenderedPdfCache, compute_cache_key
+
+def test_cache_key_is_stable_for_the_same_upload_and_backend():
+    assert compute_cache_key(b"%PDF-1.4", "direct") == compute_cache_key(b"%PDF-1.4", "direct")
+
+def test_cache_key_separates_uploads():
+    assert compute_cache_key(b"%PDF-1.4 a", "direct") != compute_cache_key(b"%PDF-1.4 b", "direct")
+
+def test_cache_key_separates_render_backends():
+    assert compute_cache_key(b"%PDF-1.4", "direct") != compute_cache_key(b"%PDF-1.4", "weasyprint")
+
+def test_cache_key_separates_renderer_versions(monkeypatch):
+    before = compute_cache_key(b"%PDF-1.4", "direct")
+    monkeypatch.setattr("src.utilities.cache_utilities.RENDERER_VERSION", "test")
+    assert compute_cache_key(b"%PDF-1.4", "direct") != before
+
+def test_pdf_of_one_backend_is_not_served_for_the_other(tmp_path):
+    cache = RenderedPdfCache(directory=str(tmp_path))
+    cache.put(compute_cache_key(b"%PDF-1.4", "direct"), b"direct pdf", "transcript.pdf")
+
+    assert cache.get(compute_cache_key(b"%PDF-1.4", "weasyprint")) is None
+    assert cache.get(compute_cache_key(b"%PDF-1.4", "direct")).content == b"direct pdf"
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    key = compute_cache_key(b"%PDF-1.4", "direct")
+    RenderedPdfCache(directory=str(tmp_path)).put(key, b"pdf", "transcript.pdf")
+
+    cached = RenderedPdfCache(directory=str(tmp_path)).get(key)
+    assert cached is not None and cached.filename == "transcript.pdf"
+
+def test_disk_directory_is_created_on_first_put(tmp_path):
+    directory = tmp_path / "cache"
+    cache = RenderedPdfCache(directory=str(directory))
+    assert cache.get(compute_cache_key(b"%PDF-1.4", "direct")) is None
+    assert not directory.exists()
+
+    cache.put(compute_cache_key(b"%PDF-1.4", "direct"), b"pdf", "transcript.pdf")
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+
+def test_disk_directory_that_others_can_access_is_not_used(tmp_path):
+    directory = tmp_path / "shared"
+    directory.mkdir()
+    os.chmod(directory, 0o777)
+    key = compute_cache_key(b"%PDF-1.4", "direct")
+    # An entry planted by another user
+    (directory / f"{key}.cache").write_bytes(b"planted.pdf\nplanted")
+
+    cache = RenderedPdfCache(directory=str(directory))
+    assert cache.get(key) is None
+    cache.put(compute_cache_key(b"%PDF-1.4 other", "direct"), b"pdf", "transcript.pdf")
+    assert sorted(os.listdir(directory)) == [f"{key}.cache"]
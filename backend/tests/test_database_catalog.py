@@ -0,0 +1,38 @@
+import json
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from src.database import database_models
+from src.database.database_catalog import load_catalog_file, preload_catalog
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'courses.db'}")
+    database_models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+def write_catalog(tmp_path, records) -> str:
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps(records))
+    return str(path)
+
+def test_load_json_catalog(tmp_path):
+    path = write_catalog(tmp_path, [
+        {"subject": "math", "code": 100, "title": "Differential Calculus with Applications"},
+        {"subject": "CPSC", "course": "110", "course_title": "Computation, Programs, and Programming"},
+    ])
+    assert load_catalog_file(path) == {
+        ("MATH", "100"): "Differential Calculus with Applications",
+        ("CPSC", "110"): "Computation, Programs, and Programming",
+    }
+
+@pytest.mark.parametrize("records", [{"MATH": {"100": "Differential Calculus"}}, ["MATH 100"], [None]])
+def test_json_catalog_that_is_not_a_list_of_objects_is_refused(tmp_path, records):
+    with pytest.raises(ValueError):
+        load_catalog_file(write_catalog(tmp_path, records))
+
+def test_broken_catalog_does_not_fail_startup(tmp_path, db):
+    assert preload_catalog(db, write_catalog(tmp_path, {"courses": []})) == 0
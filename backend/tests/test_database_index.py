@@ -0,0 +1,83 @@
+import os
+import stat
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from src.database import database_models
+from src.database.database_index import CourseCatalogIndex
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'courses.db'}")
+    database_models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        database_models.Courses(subject="MATH", code="100", title="Differential Calculus with Applications"),
+        database_models.Courses(subject="MATH", code="101", title="Integral Calculus with Applications"),
+        database_models.Courses(subject="CPSC", code="110", title="Computation, Programs, and Programming"),
+        database_models.Courses(subject="STAT", code="200", title=None),
+    ])
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+def test_lookup_of_built_index(tmp_path, db):
+    index = CourseCatalogIndex(path=str(tmp_path / "index" / "courses.index"), check_interval=0)
+    assert index.build(db) == 3
+    assert len(index) == 3
+    assert index.get("MATH", "101") == "Integral Calculus with Applications"
+    assert index.get("MATH", "102") is None
+    assert index.get("STAT", "200") is None
+
+    found, missing = index.get_many([("CPSC", "110"), ("MATH", "100"), ("ZZZZ", "999")])
+    assert found == {("CPSC", "110"): "Computation, Programs, and Programming",
+                     ("MATH", "100"): "Differential Calculus with Applications"}
+    assert missing == [("ZZZZ", "999")]
+
+def test_index_is_read_by_another_process(tmp_path, db):
+    path = str(tmp_path / "courses.index")
+    CourseCatalogIndex(path=path).build(db)
+    assert CourseCatalogIndex(path=path).get("MATH", "100") == "Differential Calculus with Applications"
+
+def test_index_directory_is_private(tmp_path, db):
+    directory = tmp_path / "index"
+    CourseCatalogIndex(path=str(directory / "courses.index")).build(db)
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+
+def test_file_with_bad_magic_is_ignored(tmp_path):
+    path = tmp_path / "courses.index"
+    path.write_bytes(b"JUNK" + bytes(64))
+    index = CourseCatalogIndex(path=str(path))
+    assert len(index) == 0
+    assert index.get("MATH", "100") is None
+
+def test_truncated_file_is_ignored(tmp_path, db):
+    path = tmp_path / "courses.index"
+    CourseCatalogIndex(path=str(path)).build(db)
+    path.write_bytes(path.read_bytes()[:-10])
+    assert CourseCatalogIndex(path=str(path)).get("MATH", "100") is None
+
+def test_disabled_index(db):
+    index = CourseCatalogIndex(path="")
+    assert index.build(db) is None
+    assert index.get_many([("MATH", "100")]) == ({}, [("MATH", "100")])
+
+def test_directory_that_others_can_access_is_not_used(tmp_path, db):
+    directory = tmp_path / "shared"
+    directory.mkdir(mode=0o777)
+    os.chmod(directory, 0o777)
+    index = CourseCatalogIndex(path=str(directory / "courses.index"), check_interval=0)
+    assert index.build(db) is None
+    assert not os.path.exists(directory / "courses.index")
+
+    # A file planted there is not read either
+    CourseCatalogIndex(path=str(tmp_path / "courses.index")).build(db)
+    os.replace(tmp_path / "courses.index", directory / "courses.index")
+    assert CourseCatalogIndex(path=str(directory / "courses.index")).get("MATH", "100") is None
+
+def test_symlinked_directory_is_not_used(tmp_path, db):
+    target = tmp_path / "target"
+    target.mkdir(mode=0o700)
+    os.symlink(target, tmp_path / "link")
+    assert CourseCatalogIndex(path=str(tmp_path / "link" / "courses.index")).build(db) is None
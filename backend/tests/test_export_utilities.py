@@ -0,0 +1,38 @@
+from fastapi.testclient import TestClient
+from src.main import app
+from src.utilities.export_utilities import negotiate_output_format
+
+def test_missing_accept_header_gets_pdf():
+    assert negotiate_output_format(None) == "pdf"
+    assert negotiate_output_format("") == "pdf"
+
+def test_axios_default_header_gets_pdf():
+    assert negotiate_output_format("application/json, text/plain, */*") == "pdf"
+    assert negotiate_output_format("*/*") == "pdf"
+
+def test_browser_header_gets_html():
+    assert negotiate_output_format("text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8") == "html"
+
+def test_explicit_media_type_wins():
+    assert negotiate_output_format("text/csv") == "csv"
+    assert negotiate_output_format("application/json") == "json"
+    assert negotiate_output_format("application/json;q=0.5, text/csv;q=0.9") == "csv"
+
+def test_most_specific_media_range_sets_the_quality():
+    assert negotiate_output_format("application/pdf;q=0.1, */*") == "html"
+    assert negotiate_output_format("application/pdf;q=0, text/*;q=0.5, text/csv;q=0.8") == "csv"
+
+def test_ties_go_to_the_order_of_the_formats():
+    assert negotiate_output_format("text/*") == "html"
+    assert negotiate_output_format("text/csv;q=0.5, text/html;q=0.5") == "html"
+
+def test_unacceptable_header_gets_none():
+    assert negotiate_output_format("image/png") is None
+    assert negotiate_output_format("application/pdf;q=0") is None
+    assert negotiate_output_format("text/csv;q=invalid") is None
+
+def test_unacceptable_header_is_rejected_with_406():
+    client = TestClient(app)
+    response = client.post("/generate-unofficial-transcript", headers={"Accept": "image/png"},
+                           files={"file": ("transcript.pdf", b"%PDF-1.4", "application/pdf")})
+    assert response.status_code == 406
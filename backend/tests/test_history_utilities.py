@@ -0,0 +1,37 @@
+from dataclasses import replace
+from types import SimpleNamespace
+from src.utilities.course_utilities import Course
+from src.utilities.history_utilities import TranscriptHistory
+
+def make_course(code: str, title: str = "") -> Course:
+    return Course("2022W", "001", "1", "CPSC", code, "3", title, "90", "A+", "75", "1", "")
+
+def make_transcript(courses):
+    return SimpleNamespace(student_number="12345678", courses=courses, session_html={})
+
+def resolve_titles(courses):
+    for session, session_courses in courses.items():
+        courses[session] = [replace(course, title=f"Course {course.code}") for course in session_courses]
+
+def test_unchanged_sessions_are_reused():
+    history = TranscriptHistory(ttl=60, max_size=10, salt=b"test")
+    first = make_transcript({"2022W": [make_course("110")]})
+    history.resolve_course_titles(first, resolve_titles)
+    history.remember(first)
+
+    second = make_transcript({"2022W": [make_course("110")], "2023W": [make_course("210")]})
+    resolved = []
+    assert history.resolve_course_titles(second, lambda courses: resolved.extend(courses)) == 1
+    assert resolved == ["2023W"]
+    assert second.courses["2022W"][0].title == "Course 110"
+
+def test_sessions_with_an_unresolved_title_are_resolved_again():
+    history = TranscriptHistory(ttl=60, max_size=10, salt=b"test")
+    # The title lookup failed for one course, e.g. UBCGrades was down
+    history.remember(make_transcript({"2022W": [make_course("110", "Computation"), make_course("121")],
+                                      "2023W": [make_course("210", "Software Construction")]}))
+
+    again = make_transcript({"2022W": [make_course("110"), make_course("121")], "2023W": [make_course("210")]})
+    resolved = []
+    assert history.resolve_course_titles(again, lambda courses: resolved.extend(courses)) == 1
+    assert resolved == ["2022W"]
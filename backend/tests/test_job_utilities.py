@@ -0,0 +1,69 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from src.database import database_models
+from src.database.database import engine, dispose_async_engine
+from src.database.database_results import ProfileStore
+from src.utilities.job_utilities import JobStatus, TranscriptJobQueue
+
+class _Pipeline:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+
+    async def run(self, data: bytes):
+        if self.fail:
+            raise ValueError("failed")
+        return SimpleNamespace(pdf=b"%PDF " + data, filename="transcript.pdf")
+
+@pytest.fixture(autouse=True)
+def tables():
+    database_models.Base.metadata.create_all(bind=engine)
+
+def _run(coroutine):
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await dispose_async_engine()
+    return asyncio.run(main())
+
+async def _run_job(queue: TranscriptJobQueue, data: bytes) -> str:
+    job = await queue.submit(data)
+    await queue._queue.join()
+    await queue.shutdown()
+    return job.id
+
+def test_finished_job_is_served_by_another_server_worker():
+    job_id = _run(_run_job(TranscriptJobQueue(_Pipeline()), b"upload"))
+
+    # A queue of another server process, sharing only the database
+    other = TranscriptJobQueue(_Pipeline())
+    job = _run(other.get(job_id, with_pdf=True))
+    assert job.status == JobStatus.DONE
+    assert job.pdf == b"%PDF upload"
+    assert job.filename == "transcript.pdf"
+    assert _run(other.get(job_id)).pdf is None
+
+def test_failed_job_records_its_error():
+    job_id = _run(_run_job(TranscriptJobQueue(_Pipeline(fail=True)), b"upload"))
+    job = _run(TranscriptJobQueue(_Pipeline()).get(job_id))
+    assert job.status == JobStatus.FAILED
+    assert job.error
+
+def test_expired_and_unknown_jobs_are_not_found():
+    job_id = _run(_run_job(TranscriptJobQueue(_Pipeline()), b"upload"))
+    assert _run(TranscriptJobQueue(_Pipeline(), result_ttl=0).get(job_id)) is None
+    assert _run(TranscriptJobQueue(_Pipeline()).get("unknown")) is None
+
+def test_oldest_finished_jobs_beyond_the_limit_are_deleted():
+    queue = TranscriptJobQueue(_Pipeline(), max_finished=1)
+    first = _run(_run_job(queue, b"first"))
+    second = _run(_run_job(queue, b"second"))
+    assert _run(queue.get(first)) is None
+    assert _run(queue.get(second)).status == JobStatus.DONE
+
+def test_profiles_are_kept_up_to_the_limit():
+    store = ProfileStore(max_size=2)
+    ids = [_run(store.put(f"profile {index}")) for index in range(3)]
+    assert _run(store.get(ids[0])) is None
+    assert _run(store.get(ids[2])) == "profile 2"
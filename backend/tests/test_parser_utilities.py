@@ -0,0 +1,45 @@
+import pytest
+from src.utilities.course_utilities import Course
+from src.utilities.parser_utilities import COURSE_ROW_GRAMMAR, COURSE_ROW_SHAPES, iter_course_rows
+
+# One row of each shape in COURSE_ROW_SHAPES, as extracted from a transcript, and the course it parses to
+COURSE_ROWS = {
+    "non_pass_fail": (
+        "CPSC 110 101 92 A+ 2019W 1 BASC 1 4.0 74",
+        Course(session="2019W", section="101", term="1", subject="CPSC", code="110", credit="4.0", title="",
+               num_grade="92", letter_grade="A+", average="74", year="1", standing=""),
+    ),
+    "pass_fail_with_term": (
+        "APSC 201 102 2020W 2 BASC 2 3.0 - P",
+        Course(session="2020W", section="102", term="2", subject="APSC", code="201", credit="3.0", title="",
+               num_grade="", letter_grade="", average="n/a", year="2", standing="P"),
+    ),
+    "pass_fail_without_term": (
+        "COOP 001 103 2021W BASC 3 0.0 - P",
+        Course(session="2021W", section="103", term="", subject="COOP", code="001", credit="0.0", title="",
+               num_grade="", letter_grade="", average="n/a", year="3", standing="P"),
+    ),
+    "withdraw": (
+        "MATH 221 104 2021W 1 BASC 3 W",
+        Course(session="2021W", section="104", term="1", subject="MATH", code="221", credit="", title="",
+               num_grade="", letter_grade="", average="", year="3", standing="W"),
+    ),
+    "in_progress": (
+        "WRDS 150B 105 2022W BASC 4",
+        Course(session="2022W", section="105", term="", subject="WRDS", code="150B", credit="", title="",
+               num_grade="", letter_grade="", average="", year="4", standing="CIP"),
+    ),
+}
+
+def test_every_shape_has_a_row():
+    assert set(COURSE_ROWS) == {shape.name for shape in COURSE_ROW_SHAPES}
+    assert sorted(COURSE_ROW_GRAMMAR) == sorted(len(row.split()) for row, _ in COURSE_ROWS.values())
+
+@pytest.mark.parametrize("shape", [shape.name for shape in COURSE_ROW_SHAPES])
+def test_row_of_each_shape(shape):
+    row, course = COURSE_ROWS[shape]
+    assert list(iter_course_rows([f"Name:Doe, Jane #:12345678\n{row}\n"])) == [course]
+
+def test_rows_of_unknown_shape_are_skipped():
+    rows = "\n".join(["CPSC 110 101 92", COURSE_ROWS["withdraw"][0]])
+    assert list(iter_course_rows([rows])) == [COURSE_ROWS["withdraw"][1]]
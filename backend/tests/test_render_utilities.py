@@ -0,0 +1,33 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from src.utilities.render_utilities import _WARM_UP_TRANSCRIPT, TranscriptRenderer
+
+# Inherited by the forked pipeline workers, like the module-level renderer of the app
+_renderer: TranscriptRenderer = None
+
+def _render_in_pipeline_worker(transcript) -> bytes:
+    return _renderer.render(transcript)
+
+def test_render_processes_render_in_the_calling_process():
+    renderer = TranscriptRenderer(backend="direct", processes=1)
+    try:
+        assert renderer.render(_WARM_UP_TRANSCRIPT).startswith(b"%PDF")
+        assert renderer.stats()["renders"] == 1
+    finally:
+        renderer.shutdown()
+
+def test_process_pipeline_workers_render_with_render_processes_started():
+    # The render processes are started before the pipeline workers are forked, as in the app's lifespan
+    global _renderer
+    _renderer = TranscriptRenderer(backend="direct", processes=1)
+    _renderer.start()
+    executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("fork"))
+    try:
+        pdf = executor.submit(_render_in_pipeline_worker, _WARM_UP_TRANSCRIPT).result(timeout=30)
+        assert pdf.startswith(b"%PDF")
+    finally:
+        # Killed first, so a worker that hangs cannot hang the test run
+        for process in list(executor._processes.values()):
+            process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+        _renderer.shutdown()
@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from src.utilities.singleflight_utilities import AsyncSingleFlight
+
+def test_concurrent_callers_share_one_computation():
+    flight = AsyncSingleFlight()
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", compute) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert calls == 1
+    assert [result for result, _ in results] == ["result"] * 5
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert len(flight) == 0
+
+def test_different_keys_are_computed_separately():
+    flight = AsyncSingleFlight()
+
+    async def main():
+        return await asyncio.gather(flight.do("a", lambda: asyncio.sleep(0, "a")),
+                                    flight.do("b", lambda: asyncio.sleep(0, "b")))
+
+    assert asyncio.run(main()) == [("a", False), ("b", False)]
+
+def test_finished_computation_is_not_cached():
+    flight = AsyncSingleFlight()
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    async def main():
+        first, _ = await flight.do("key", compute)
+        second, _ = await flight.do("key", compute)
+        return first, second
+
+    assert asyncio.run(main()) == (1, 2)
+
+def test_error_is_raised_in_every_caller():
+    flight = AsyncSingleFlight()
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise ValueError("failed")
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", compute) for _ in range(3)), return_exceptions=True)
+
+    errors = asyncio.run(main())
+    assert all(isinstance(error, ValueError) for error in errors)
+
+    # The failed run is forgotten, so the next call computes again
+    async def retry():
+        return await flight.do("key", lambda: asyncio.sleep(0, "ok"))
+
+    assert asyncio.run(retry()) == ("ok", False)
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    flight = AsyncSingleFlight()
+
+    async def compute():
+        await asyncio.sleep(0.02)
+        return "result"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("key", compute))
+        second = asyncio.ensure_future(flight.do("key", compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == ("result", True)